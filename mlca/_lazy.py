@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# _lazy.py
+"""
+Defer imports of heavy dependencies until first use
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from importlib import import_module
+
+
+class LazyModule:
+    """A module that is imported on first attribute access, so that
+    ``mlca --version`` and argument errors do not import NumPy or pydicom
+
+    Parameters
+    ----------
+    name : str
+        Absolute module name, e.g., 'numpy'
+
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        """Import the module"""
+        if self._module is None:
+            self._module = import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        # only called for attributes not set in __init__
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        if self._module is None:
+            return "<lazy module '%s' (not loaded)>" % self._name
+        return repr(self._module)
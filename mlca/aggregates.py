@@ -0,0 +1,492 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# aggregates.py
+"""
+Streaming summary statistics of PlanSet results by group, with constant
+memory and mergeable partial results
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import math
+import re
+
+
+# Group-by fields, each is a function of a Plan returning a label
+GROUP_BY = {
+    "tps": lambda plan: plan.tps,
+    "machine": lambda plan: plan.machine,
+    "month": lambda plan: get_month(plan.plan_date),
+    "plan_name": lambda plan: plan.plan_name,
+}
+# Default columns of PlanSet.results to summarize
+DEFAULT_VALUES = ["Complexity Score(s)", "Plan MUs", "Control Point(s)"]
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+RELATIVE_ACCURACY = 0.01
+SUMMARY_COLUMNS = (
+    ["Value", "Count", "Mean", "Std", "Min"]
+    + ["P%g" % (100 * q) for q in QUANTILES]
+    + ["Max"]
+)
+OTHER = "other"
+UNKNOWN = "UNKNOWN"
+
+
+def get_month(date):
+    """Get the month of a DICOM date
+
+    Parameters
+    ----------
+    date : str
+        A DICOM DA value, i.e., YYYYMMDD
+
+    Returns
+    -------
+    str
+        YYYY-MM, or UNKNOWN if ``date`` is not a DICOM date
+    """
+    if len(date) >= 6 and date[:6].isdigit():
+        return "%s-%s" % (date[:4], date[4:6])
+    return UNKNOWN
+
+
+class RunningStats:
+    """Count, mean, variance, min, and max with Welford's algorithm, merged
+    with Chan's parallel algorithm"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        """Add a value
+
+        Parameters
+        ----------
+        value : float
+            A new observation
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, data):
+        """Add the observations of other running stats
+
+        Parameters
+        ----------
+        data : dict
+            Output from RunningStats.to_dict
+        """
+        if not data["count"]:
+            return
+        count = self.count + data["count"]
+        delta = data["mean"] - self.mean
+        self.mean += delta * data["count"] / count
+        self.m2 += data["m2"] + delta**2 * self.count * data["count"] / count
+        self.count = count
+        self.min = min(self.min, data["min"])
+        self.max = max(self.max, data["max"])
+
+    @property
+    def variance(self):
+        """Get the sample variance
+
+        Returns
+        -------
+        float
+            Sample variance, NaN if fewer than two observations
+        """
+        if self.count < 2:
+            return math.nan
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        """Get the sample standard deviation
+
+        Returns
+        -------
+        float
+            Square root of RunningStats.variance
+        """
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        """Get the stats as a dict of numbers
+
+        Returns
+        -------
+        dict
+            'count', 'mean', 'm2', 'min', and 'max'
+        """
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class QuantileSketch:
+    """Approximate quantiles from counts of logarithmically sized buckets,
+    so any quantile is within ``relative_accuracy`` of an observed value.
+    The number of buckets grows with the log of the range of values, not
+    with the number of values. Sketches with the same accuracy merge by
+    adding bucket counts.
+
+    Parameters
+    ----------
+    relative_accuracy : float, optional
+        Maximum relative error of quantiles, between 0 and 1
+
+    """
+
+    # magnitudes below this are counted as zero
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+
+    @property
+    def count(self):
+        """Get the number of values added
+
+        Returns
+        -------
+        int
+            Sum of all bucket counts
+        """
+        return (
+            self.zero
+            + sum(self.positive.values())
+            + sum(self.negative.values())
+        )
+
+    def _get_key(self, magnitude):
+        """Get the bucket of a positive magnitude"""
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _get_value(self, key):
+        """Get the representative magnitude of a bucket"""
+        return 2.0 * self.gamma**key / (self.gamma + 1.0)
+
+    def add(self, value):
+        """Add a value
+
+        Parameters
+        ----------
+        value : float
+            A new observation
+        """
+        if value > self.MIN_VALUE:
+            key = self._get_key(value)
+            self.positive[key] = self.positive.get(key, 0) + 1
+        elif value < -self.MIN_VALUE:
+            key = self._get_key(-value)
+            self.negative[key] = self.negative.get(key, 0) + 1
+        else:
+            self.zero += 1
+
+    def merge(self, data):
+        """Add the bucket counts of another sketch
+
+        Parameters
+        ----------
+        data : dict
+            Output from QuantileSketch.to_dict
+        """
+        if data["relative_accuracy"] != self.relative_accuracy:
+            raise ValueError(
+                "Cannot merge sketches with relative accuracy %s and %s"
+                % (self.relative_accuracy, data["relative_accuracy"])
+            )
+        for buckets, other in [
+            (self.positive, data["positive"]),
+            (self.negative, data["negative"]),
+        ]:
+            for key, count in other.items():
+                key = int(key)
+                buckets[key] = buckets.get(key, 0) + count
+        self.zero += data["zero"]
+
+    def quantile(self, q):
+        """Get an approximate quantile
+
+        Parameters
+        ----------
+        q : float
+            Quantile, between 0 and 1
+
+        Returns
+        -------
+        float
+            The approximate value at ``q``, NaN if the sketch is empty
+        """
+        count = self.count
+        if not count:
+            return math.nan
+        rank = q * (count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._get_value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._get_value(key)
+        return self._get_value(max(self.positive))
+
+    def to_dict(self):
+        """Get the sketch as a JSON serializable dict
+
+        Returns
+        -------
+        dict
+            'relative_accuracy', 'zero' count, and 'positive' and
+            'negative' bucket counts keyed by str bucket index
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(k): c for k, c in self.positive.items()},
+            "negative": {str(k): c for k, c in self.negative.items()},
+            "zero": self.zero,
+        }
+
+
+class Aggregator:
+    """Running stats and quantile sketches of result columns for each group
+    of plans. Memory depends on the number of groups, not the number of
+    plans.
+
+    Parameters
+    ----------
+    group_by : list, optional
+        Keys of GROUP_BY, all plans are one group by default
+    values : list, optional
+        Columns of PlanSet.results to summarize, default is DEFAULT_VALUES
+    plan_name_pattern : str, optional
+        Regular expression, plan names are grouped by the first match (or
+        the first capture group, if any), OTHER if no match
+    relative_accuracy : float, optional
+        Relative accuracy of each QuantileSketch
+
+    """
+
+    def __init__(
+        self,
+        group_by=None,
+        values=None,
+        plan_name_pattern=None,
+        relative_accuracy=RELATIVE_ACCURACY,
+    ):
+        self.group_by = list(group_by) if group_by else []
+        unknown = [key for key in self.group_by if key not in GROUP_BY]
+        if unknown:
+            raise KeyError(
+                "Unknown group-by field(s) %s, choose from: %s"
+                % (", ".join(unknown), ", ".join(sorted(GROUP_BY)))
+            )
+        self.values = list(values) if values else list(DEFAULT_VALUES)
+        self.plan_name_pattern = plan_name_pattern
+        self._pattern = (
+            re.compile(plan_name_pattern) if plan_name_pattern else None
+        )
+        self.relative_accuracy = relative_accuracy
+        self.groups = {}
+
+    def __len__(self):
+        return len(self.groups)
+
+    @property
+    def config(self):
+        """Get the init parameters, e.g., to create an empty Aggregator in a
+        worker process
+
+        Returns
+        -------
+        dict
+            Keyword arguments of Aggregator
+        """
+        return {
+            "group_by": self.group_by,
+            "values": self.values,
+            "plan_name_pattern": self.plan_name_pattern,
+            "relative_accuracy": self.relative_accuracy,
+        }
+
+    def get_group(self, plan):
+        """Get the group of a plan
+
+        Parameters
+        ----------
+        plan : mlca.mlc_analyzer.Plan
+            An analyzed plan
+
+        Returns
+        -------
+        tuple
+            A label for each element of Aggregator.group_by
+        """
+        key = []
+        for name in self.group_by:
+            label = GROUP_BY[name](plan)
+            if name == "plan_name" and self._pattern is not None:
+                match = self._pattern.search(label)
+                if match is None:
+                    label = OTHER
+                else:
+                    label = match.group(1 if match.groups() else 0)
+            key.append(label)
+        return tuple(key)
+
+    def _get_summaries(self, group):
+        """Get the stats and sketch of each value of a group"""
+        if group not in self.groups:
+            self.groups[group] = {
+                column: (
+                    RunningStats(),
+                    QuantileSketch(self.relative_accuracy),
+                )
+                for column in self.values
+            }
+        return self.groups[group]
+
+    def add(self, group, row):
+        """Add the values of a result row to a group
+
+        Parameters
+        ----------
+        group : tuple
+            Output from Aggregator.get_group
+        row : dict
+            Typed result values keyed by column, None and NaN are ignored
+        """
+        for column, (stats, sketch) in self._get_summaries(group).items():
+            value = row.get(column)
+            if value is None or value != value:
+                continue
+            stats.add(value)
+            sketch.add(value)
+
+    def add_plan(self, plan, columns, rows):
+        """Add the result rows of a plan
+
+        Parameters
+        ----------
+        plan : mlca.mlc_analyzer.Plan
+            An analyzed plan
+        columns : list
+            Column names of ``rows``
+        rows : list
+            Typed result rows of ``plan``, e.g., from PlanSet._get_rows
+        """
+        group = self.get_group(plan)
+        for row in rows:
+            self.add(group, dict(zip(columns, row)))
+
+    def merge(self, data):
+        """Add the summaries of another Aggregator, e.g., from a worker
+
+        Parameters
+        ----------
+        data : dict
+            Output from Aggregator.to_dict with the same values
+        """
+        for item in data["groups"]:
+            summaries = self._get_summaries(tuple(item["group"]))
+            for column, summary in item["values"].items():
+                stats, sketch = summaries[column]
+                stats.merge(summary["stats"])
+                sketch.merge(summary["sketch"])
+
+    def to_dict(self):
+        """Get the summaries as a JSON serializable dict
+
+        Returns
+        -------
+        dict
+            Aggregator.config, and 'groups': a list of dicts with a 'group'
+            list and 'values', a dict of 'stats' and 'sketch' for each value
+        """
+        data = self.config
+        data["groups"] = [
+            {
+                "group": list(group),
+                "values": {
+                    column: {
+                        "stats": stats.to_dict(),
+                        "sketch": sketch.to_dict(),
+                    }
+                    for column, (stats, sketch) in summaries.items()
+                },
+            }
+            for group, summaries in self.groups.items()
+        ]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create an Aggregator from Aggregator.to_dict
+
+        Parameters
+        ----------
+        data : dict
+            Output from Aggregator.to_dict
+
+        Returns
+        -------
+        Aggregator
+            An Aggregator with the config and summaries of ``data``
+        """
+        aggregator = cls(
+            **{key: value for key, value in data.items() if key != "groups"}
+        )
+        aggregator.merge(data)
+        return aggregator
+
+    @property
+    def summary_table(self):
+        """Get the summaries for csv output
+
+        Returns
+        -------
+        list
+            A header of Aggregator.group_by and SUMMARY_COLUMNS, followed by
+            a row for each value of each group, sorted by group
+        """
+        table = [self.group_by + SUMMARY_COLUMNS]
+        for group in sorted(self.groups):
+            for column, (stats, sketch) in self.groups[group].items():
+                numbers = [stats.mean, stats.std, stats.min]
+                # bucket values may be just outside the exact min and max
+                numbers.extend(
+                    min(max(sketch.quantile(q), stats.min), stats.max)
+                    for q in QUANTILES
+                )
+                numbers.append(stats.max)
+                table.append(
+                    list(group)
+                    + [column, str(stats.count)]
+                    + ["%0.3f" % n if stats.count else "" for n in numbers]
+                )
+        return table
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# benchmark.py
+"""
+Time DICOM discovery, parsing, geometry, and PlanSet on synthetic plans
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import argparse
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+import io
+import json
+from os.path import join
+import platform
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+import numpy as np
+import pydicom
+import shapely
+from mlca._version import __version__
+from mlca.mlc_analyzer import PlanSet, Plan, ControlPoint
+from mlca.synthetic import write_corpus
+from mlca.utilities import get_file_paths, get_dicom_files
+
+
+# Keyword arguments for mlca.synthetic.write_corpus
+SIZES = {
+    "small": {"plan_count": 4, "beam_count": 2, "cp_count": 20},
+    "medium": {"plan_count": 16, "beam_count": 4, "cp_count": 60},
+    "large": {"plan_count": 64, "beam_count": 4, "cp_count": 180},
+}
+SUITES = [
+    "startup",
+    "discovery",
+    "parsing",
+    "geometry",
+    "analysis",
+    "end_to_end",
+]
+# Suites that accept a process count, others are timed with 1 process
+PARALLEL_SUITES = {"discovery", "end_to_end"}
+# Number of 'mlca --version' runs timed by the startup suite
+STARTUP_RUNS = 5
+
+
+def time_call(func, *args, **kwargs):
+    """Call a function, suppressing its console output
+
+    Parameters
+    ----------
+    func : callable
+        Function to time
+    args :
+        Positional arguments for ``func``
+    kwargs :
+        Keyword arguments for ``func``
+
+    Returns
+    -------
+    tuple
+        Return of ``func``, wall time (s), and CPU time (s) of this process
+    """
+    sink = io.StringIO()
+    wall, cpu = time.perf_counter(), time.process_time()
+    with redirect_stdout(sink), redirect_stderr(sink):
+        ans = func(*args, **kwargs)
+    return ans, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def _parse(file_paths):
+    """Read each file with pydicom"""
+    return [pydicom.read_file(f) for f in file_paths]
+
+
+def _build_control_points(datasets):
+    """Compute the aperture of every control point of every beam"""
+    count = 0
+    for ds in datasets:
+        for beam in ds.BeamSequence:
+            boundaries = None  # no MLC, e.g., jaw-only beams
+            for device in beam.BeamLimitingDeviceSequence:
+                if hasattr(device, "LeafPositionBoundaries"):
+                    boundaries = device.LeafPositionBoundaries
+            for cp in beam.ControlPointSequence:
+                ControlPoint(cp, boundaries)
+                count += 1
+    return count
+
+
+def _start_cli(runs=STARTUP_RUNS):
+    """Run 'mlca --version' in new interpreters"""
+    for _ in range(runs):
+        subprocess.run(
+            [sys.executable, "-m", "mlca.main", "-ver"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+    return runs
+
+
+def _analyze(datasets):
+    """Analyze each dataset with Plan"""
+    return [Plan(ds) for ds in datasets]
+
+
+def run_suite(suite, directory, file_paths, datasets, processes=1):
+    """Time one benchmark suite
+
+    Parameters
+    ----------
+    suite : str
+        An element of SUITES
+    directory : str
+        Directory of the synthetic corpus
+    file_paths : list
+        File paths of the RT Plans in ``directory``
+    datasets : list
+        Parsed RT Plans of ``file_paths``
+    processes : int, optional
+        Number of processes, for suites in PARALLEL_SUITES
+
+    Returns
+    -------
+    dict
+        'items' (number of CLI runs, files scanned, plans, or control
+        points), 'wall_time', and 'cpu_time' (of this process only)
+    """
+    if suite == "startup":
+        items, wall, cpu = time_call(_start_cli)
+    elif suite == "discovery":
+        ans, wall, cpu = time_call(
+            lambda: get_dicom_files(
+                get_file_paths(directory),
+                modality="RTPLAN",
+                processes=processes,
+            )
+        )
+        items = len(get_file_paths(directory))
+    elif suite == "parsing":
+        ans, wall, cpu = time_call(_parse, file_paths)
+        items = len(ans)
+    elif suite == "geometry":
+        items, wall, cpu = time_call(_build_control_points, datasets)
+    elif suite == "analysis":
+        ans, wall, cpu = time_call(_analyze, datasets)
+        items = len(ans)
+    elif suite == "end_to_end":
+        ans, wall, cpu = time_call(PlanSet, file_paths, processes=processes)
+        items = len(file_paths)
+    else:
+        raise ValueError(
+            "Unknown suite '%s', choose from: %s" % (suite, ", ".join(SUITES))
+        )
+    return {"items": items, "wall_time": wall, "cpu_time": cpu}
+
+
+def run_benchmark(
+    sizes=None,
+    processes=None,
+    suites=None,
+    repeat=1,
+    directory=None,
+    seed=0,
+    **kwargs
+):
+    """Generate synthetic corpora and time each suite
+
+    Parameters
+    ----------
+    sizes : list, optional
+        Keys of SIZES, default is ['small']
+    processes : list, optional
+        Process counts for suites in PARALLEL_SUITES, default is [1]
+    suites : list, optional
+        Elements of SUITES, default is all
+    repeat : int, optional
+        Number of timings per suite, the fastest is reported
+    directory : str, optional
+        Write corpora here instead of a temporary directory
+    seed : int, optional
+        Seed for mlca.synthetic.write_corpus
+    kwargs :
+        Over rides of SIZES values passed to mlca.synthetic.write_corpus
+        (e.g., leaf_count, leaf_type, jaws, arc)
+
+    Returns
+    -------
+    dict
+        Environment information and a list of 'results', each with
+        'suite', 'size', 'processes', 'items', 'wall_time', 'cpu_time',
+        and 'items_per_second'
+    """
+    sizes = ["small"] if sizes is None else sizes
+    processes = [1] if processes is None else processes
+    suites = SUITES if suites is None else suites
+
+    report = {
+        "mlca_version": __version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy_version": np.__version__,
+        "pydicom_version": pydicom.__version__,
+        "shapely_version": shapely.__version__,
+        "created": datetime.now().isoformat(),
+        "repeat": repeat,
+        "results": [],
+    }
+
+    with TemporaryDirectory() as temp_dir:
+        root = temp_dir if directory is None else directory
+        for size in sizes:
+            corpus = {k: v for k, v in SIZES[size].items()}
+            corpus.update(kwargs)
+            size_dir = join(root, size)
+            file_paths = write_corpus(
+                size_dir,
+                non_dicom_count=corpus["plan_count"],
+                seed=seed,
+                **corpus
+            )
+            datasets = _parse(file_paths)
+            for suite in suites:
+                counts = processes if suite in PARALLEL_SUITES else [1]
+                for process_count in counts:
+                    timings = [
+                        run_suite(
+                            suite,
+                            size_dir,
+                            file_paths,
+                            datasets,
+                            process_count,
+                        )
+                        for _ in range(max(int(repeat), 1))
+                    ]
+                    best = min(timings, key=lambda t: t["wall_time"])
+                    result = {
+                        "suite": suite,
+                        "size": size,
+                        "processes": process_count,
+                    }
+                    result.update(best)
+                    result["items_per_second"] = (
+                        best["items"] / best["wall_time"]
+                        if best["wall_time"] > 0
+                        else 0.0
+                    )
+                    report["results"].append(result)
+
+    return report
+
+
+def create_cmd_parser():
+    """Get an argument parser for mlca.benchmark.main
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        argument parser
+    """
+    cmd_parser = argparse.ArgumentParser(
+        description="DVHA MLC Analyzer benchmarks on synthetic RT Plans"
+    )
+    cmd_parser.add_argument(
+        "-of",
+        "--output-file",
+        dest="output_file",
+        help="Output will be saved as dvha_mlca_<version>_benchmark_"
+        "<time-stamp>.json by default.",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-s",
+        "--sizes",
+        dest="sizes",
+        help="Comma-separated corpus sizes: default = small. Options: %s"
+        % ", ".join(SIZES),
+        default="small",
+    )
+    cmd_parser.add_argument(
+        "-n",
+        "--processes",
+        dest="processes",
+        help="Comma-separated process counts: default = 1",
+        default="1",
+    )
+    cmd_parser.add_argument(
+        "-su",
+        "--suites",
+        dest="suites",
+        help="Comma-separated suites: default = all. Options: %s"
+        % ", ".join(SUITES),
+        default=",".join(SUITES),
+    )
+    cmd_parser.add_argument(
+        "-r",
+        "--repeat",
+        dest="repeat",
+        help="Number of timings per suite, the fastest is reported: "
+        "default = 1",
+        default=1,
+    )
+    cmd_parser.add_argument(
+        "-d",
+        "--directory",
+        dest="directory",
+        help="Keep the synthetic RT Plans in this directory",
+        default=None,
+    )
+    return cmd_parser
+
+
+def _split(value):
+    """Split a comma-separated command line arg"""
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main():
+    """Parse command-line args, run benchmarks, save results to JSON"""
+    args = create_cmd_parser().parse_args()
+    sizes, suites = _split(args.sizes), _split(args.suites)
+    for name, values, options in [
+        ("size", sizes, SIZES),
+        ("suite", suites, SUITES),
+    ]:
+        unknown = [v for v in values if v not in options]
+        if unknown:
+            print(
+                "mlca-benchmark: error: unknown %s(s): %s"
+                % (name, ", ".join(unknown))
+            )
+            return
+
+    report = run_benchmark(
+        sizes=sizes,
+        processes=[int(float(p)) for p in _split(args.processes)],
+        suites=suites,
+        repeat=int(float(args.repeat)),
+        directory=args.directory,
+    )
+
+    for result in report["results"]:
+        print(
+            "%-10s %-7s n=%-2s %9.3f s %10.1f items/s"
+            % (
+                result["suite"],
+                result["size"],
+                result["processes"],
+                result["wall_time"],
+                result["items_per_second"],
+            )
+        )
+
+    output_file = args.output_file
+    if not output_file:
+        output_file = "dvha_mlca_%s_benchmark_%s.json" % (
+            __version__,
+            datetime.now().strftime("%Y-%m-%d_%H-%M-%S"),
+        )
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Benchmark results saved to: %s" % output_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# counters.py
+"""
+Always-on counters of geometry operations and file handling
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from contextlib import contextmanager
+from os import replace
+import time
+
+
+# Descriptions of built-in counters, used as HELP in Prometheus text
+COUNTERS = {
+    "polygons_built": "Shapely polygons built for MLC apertures and jaws",
+    "buffer_repairs": "buffer(0) repairs of MLC aperture polygons",
+    "intersections": "Intersections of MLC apertures with jaws",
+    "geometry_collection_fallbacks": "GeometryCollection inputs to "
+    "get_xy_path_lengths",
+    "control_points_skipped": "Zero MU control points removed from "
+    "Beam.summary",
+    "apertures_skipped": "Zero MU control points without a calculated "
+    "aperture",
+    "machine_models_built": "Leaf geometry models built for a machine name "
+    "and MLC configuration",
+    "files_sniffed": "Files checked for DICOM by is_file_dicom",
+    "files_rejected": "Files rejected by is_file_dicom",
+}
+
+
+class Counters:
+    """Event counts and the time spent in each, by name"""
+
+    def __init__(self):
+        self.counts = {}
+        self.seconds = {}
+
+    def increment(self, name, value=1):
+        """Increment a counter
+
+        Parameters
+        ----------
+        name : str
+            Counter name, preferably a key of COUNTERS
+        value : int, optional
+            Amount to add
+        """
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name):
+        """Increment a counter and add the time spent in a block of code
+
+        Parameters
+        ----------
+        name : str
+            Counter name, preferably a key of COUNTERS
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.seconds[name] = (
+                self.seconds.get(name, 0.0) + time.perf_counter() - start
+            )
+
+    def get(self, name):
+        """Get the count of a counter
+
+        Parameters
+        ----------
+        name : str
+            Counter name
+
+        Returns
+        -------
+        int
+            The count, 0 if never incremented
+        """
+        return self.counts.get(name, 0)
+
+    def to_dict(self):
+        """Get the counts and times
+
+        Returns
+        -------
+        dict
+            'counts' and 'seconds', each keyed by counter name
+        """
+        return {"counts": dict(self.counts), "seconds": dict(self.seconds)}
+
+    def merge(self, counters):
+        """Add counts and times, e.g., from a worker process
+
+        Parameters
+        ----------
+        counters : dict
+            Output from Counters.to_dict
+        """
+        for name, value in counters["counts"].items():
+            self.counts[name] = self.counts.get(name, 0) + value
+        for name, value in counters["seconds"].items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + value
+
+    def reset(self):
+        """Set all counters to zero"""
+        self.counts = {}
+        self.seconds = {}
+
+    def to_prometheus(self, prefix="mlca"):
+        """Get the counters in the Prometheus text exposition format
+
+        Parameters
+        ----------
+        prefix : str, optional
+            Prepended to each metric name
+
+        Returns
+        -------
+        str
+            A '<prefix>_<name>_total' counter for each counter, and a
+            '<prefix>_<name>_seconds_total' counter for timed counters
+        """
+        lines = []
+        for name in sorted(set(COUNTERS) | set(self.counts)):
+            metric = "%s_%s_total" % (prefix, name)
+            lines.append("# HELP %s %s" % (metric, COUNTERS.get(name, name)))
+            lines.append("# TYPE %s counter" % metric)
+            lines.append("%s %d" % (metric, self.get(name)))
+            if name in self.seconds:
+                metric = "%s_%s_seconds_total" % (prefix, name)
+                lines.append(
+                    "# HELP %s Time spent in %s"
+                    % (metric, name.replace("_", " "))
+                )
+                lines.append("# TYPE %s counter" % metric)
+                lines.append("%s %0.6f" % (metric, self.seconds[name]))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_path, prefix="mlca"):
+        """Write Counters.to_prometheus to a file, e.g., for the node
+        exporter textfile collector. The file is replaced atomically.
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the output file
+        prefix : str, optional
+            Prepended to each metric name
+        """
+        temp_path = file_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.to_prometheus(prefix))
+        replace(temp_path, file_path)
+
+
+# Module level counters, always on
+_COUNTERS = Counters()
+
+
+def get_counters():
+    """Get the module level counters
+
+    Returns
+    -------
+    Counters
+        Counters of this process. Counters of run_multiprocessing workers
+        are merged into the counters of the parent process.
+    """
+    return _COUNTERS
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# database.py
+"""
+SQLite backend for PlanSet results, with upserts and indexed queries
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from datetime import datetime
+import re
+import sqlite3
+
+
+# Database column names of mlca.mlc_analyzer.COLUMNS, other columns (e.g.,
+# weight grid and metric columns) are named by get_column_name
+COLUMN_NAMES = {
+    "Patient Name": "patient_name",
+    "Patient MRN": "mrn",
+    "Study Instance UID": "study_instance_uid",
+    "SOP Instance UID": "sop_instance_uid",
+    "TPS": "tps",
+    "Plan name": "plan_name",
+    "# of Fx Group(s)": "fx_group_count",
+    "Fx Group #": "fx_group",
+    "Fractions": "fractions",
+    "Plan MUs": "plan_mu",
+    "Beam Count(s)": "beam_count",
+    "Control Point(s)": "cp_count",
+    "Complexity Score(s)": "complexity_score",
+    "File Name": "file_name",
+}
+SQL_TYPES = {"int": "INTEGER", "float": "REAL"}
+
+# Columns of the beams table, from PlanSet beam rows
+BEAM_COLUMNS = [
+    ("sop_instance_uid", "TEXT"),
+    ("fx_group", "INTEGER"),
+    ("beam_index", "INTEGER"),
+    ("beam_name", "TEXT"),
+    ("beam_mu", "REAL"),
+    ("cp_count", "INTEGER"),
+    ("complexity_score", "REAL"),
+]
+
+# Commonly filtered columns of the plans table
+INDEXED_COLUMNS = ["mrn", "tps", "plan_name", "analyzed_at", "plan_date"]
+FILTERS = ["mrn", "tps", "plan_name", "study_instance_uid"]
+# ISO date columns of the plans table for ResultDatabase.query
+DATE_COLUMNS = ["analyzed_at", "plan_date"]
+
+# INSERT ... ON CONFLICT DO UPDATE requires SQLite 3.24
+UPSERT_SUPPORTED = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+
+def get_column_name(column):
+    """Get the database column name of a results column
+
+    Parameters
+    ----------
+    column : str
+        A column of PlanSet.columns
+
+    Returns
+    -------
+    str
+        The COLUMN_NAMES value, or ``column`` in lower case with each run of
+        non-alphanumeric characters replaced by an underscore
+    """
+    if column in COLUMN_NAMES:
+        return COLUMN_NAMES[column]
+    return re.sub(r"[^0-9a-z]+", "_", column.lower()).strip("_")
+
+
+def get_iso_date(date):
+    """Convert a DICOM date to an ISO date
+
+    Parameters
+    ----------
+    date : str, None
+        A DICOM DA value, i.e., YYYYMMDD
+
+    Returns
+    -------
+    str, None
+        YYYY-MM-DD, or None if ``date`` is not a DICOM date
+    """
+    if date and len(date) >= 8 and date[:8].isdigit():
+        return "%s-%s-%s" % (date[:4], date[4:6], date[6:8])
+    return None
+
+
+class ResultDatabase:
+    """Write PlanSet results into a SQLite database. Rows are upserted on
+    SOP Instance UID and fraction group, in transactions of ``batch_size``
+    rows. With SQLite older than 3.24 (see UPSERT_SUPPORTED), rows are
+    written with INSERT OR REPLACE instead, which sets columns not in the
+    new rows (e.g., from another weight grid) to NULL. The beam rows of a
+    fraction group are replaced each time it is written.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the database file, created if needed, or ':memory:'
+    beams : bool, optional
+        Also write a row for each beam of each fraction group
+    batch_size : int, optional
+        Number of buffered rows that triggers a write
+
+    """
+
+    def __init__(self, file_path, beams=False, batch_size=500):
+        self.file_path = file_path
+        self.beams = beams
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(file_path)
+        self.upsert = UPSERT_SUPPORTED
+        self.columns = []
+        self._plan_rows = []
+        self._beam_rows = []
+        self._plan_sql = None
+        self._beam_sql = None
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the plans and beams tables and indices if needed"""
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "sop_instance_uid TEXT NOT NULL, "
+                "fx_group INTEGER NOT NULL, "
+                "analyzed_at TEXT, "
+                "PRIMARY KEY (sop_instance_uid, fx_group))"
+            )
+            for column in INDEXED_COLUMNS:
+                self._add_column("plans", column, "TEXT")
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_plans_%s ON plans (%s)"
+                    % (column, column)
+                )
+            if self.beams:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS beams (%s, PRIMARY KEY "
+                    "(sop_instance_uid, fx_group, beam_index))"
+                    % ", ".join("%s %s" % c for c in BEAM_COLUMNS)
+                )
+
+    def _get_table_columns(self, table):
+        """Get the column names of a table"""
+        cursor = self.connection.execute("PRAGMA table_info(%s)" % table)
+        return [row[1] for row in cursor.fetchall()]
+
+    def _add_column(self, table, column, sql_type):
+        """Add a column to a table if it does not exist"""
+        if column not in self._get_table_columns(table):
+            self.connection.execute(
+                'ALTER TABLE %s ADD COLUMN "%s" %s' % (table, column, sql_type)
+            )
+
+    def _get_upsert_sql(self, table, columns, keys):
+        """Get an INSERT statement that updates rows with existing keys"""
+        if not self.upsert:
+            return "INSERT OR REPLACE INTO %s (%s) VALUES (%s)" % (
+                table,
+                ", ".join('"%s"' % c for c in columns),
+                ", ".join("?" * len(columns)),
+            )
+        updates = [c for c in columns if c not in keys]
+        return (
+            "INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s"
+            % (
+                table,
+                ", ".join('"%s"' % c for c in columns),
+                ", ".join("?" * len(columns)),
+                ", ".join(keys),
+                ", ".join('"%s" = excluded."%s"' % (c, c) for c in updates),
+            )
+        )
+
+    def prepare(self, columns, dtypes=None):
+        """Add missing columns to the plans table, set the column order of
+        rows passed to add_rows
+
+        Parameters
+        ----------
+        columns : list
+            Results columns, e.g., PlanSet.columns
+        dtypes : dict, optional
+            An element of mlca.results.DTYPES for each column
+        """
+        dtypes = {} if dtypes is None else dtypes
+        self.flush()
+        self.columns = [get_column_name(c) for c in columns]
+        with self.connection:
+            for column, name in zip(columns, self.columns):
+                sql_type = SQL_TYPES.get(dtypes.get(column), "TEXT")
+                self._add_column("plans", name, sql_type)
+        self._plan_sql = self._get_upsert_sql(
+            "plans",
+            self.columns + DATE_COLUMNS,
+            ["sop_instance_uid", "fx_group"],
+        )
+        names = [c[0] for c in BEAM_COLUMNS]
+        self._beam_sql = self._get_upsert_sql("beams", names, names[:3])
+
+    def add_rows(self, rows, beam_rows=None, plan_date=None):
+        """Buffer result rows, write them if the buffer is full
+
+        Parameters
+        ----------
+        rows : list
+            Typed result rows in the order of the columns passed to prepare
+        beam_rows : list, optional
+            A value for each of BEAM_COLUMNS for each beam, ignored unless
+            ResultDatabase.beams
+        plan_date : str, optional
+            RTPlanDate (300A,0006) of the plan of ``rows``, e.g.,
+            Plan.plan_date
+        """
+        if self._plan_sql is None:
+            raise RuntimeError("ResultDatabase.prepare must be called first")
+        analyzed_at = datetime.now().isoformat(timespec="seconds")
+        plan_date = get_iso_date(plan_date)
+        self._plan_rows.extend(
+            list(row) + [analyzed_at, plan_date] for row in rows
+        )
+        if self.beams and beam_rows:
+            self._beam_rows.extend(beam_rows)
+        if len(self._plan_rows) + len(self._beam_rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows in one transaction"""
+        if not self._plan_rows and not self._beam_rows:
+            return
+        with self.connection:
+            if self._plan_rows:
+                self.connection.executemany(self._plan_sql, self._plan_rows)
+            if self.beams:
+                # a re-analyzed plan may have fewer beams
+                self.connection.executemany(
+                    "DELETE FROM beams WHERE sop_instance_uid = ? AND "
+                    "fx_group = ?",
+                    self._get_written_fx_groups(),
+                )
+            if self._beam_rows:
+                self.connection.executemany(self._beam_sql, self._beam_rows)
+        self._plan_rows, self._beam_rows = [], []
+
+    def _get_written_fx_groups(self):
+        """Get the (SOP Instance UID, Fx Group #) of each buffered row"""
+        keys = {tuple(row[:2]) for row in self._beam_rows}
+        uid = self.columns.index("sop_instance_uid")
+        fx_group = self.columns.index("fx_group")
+        keys.update((row[uid], row[fx_group]) for row in self._plan_rows)
+        return sorted(keys)
+
+    def query(
+        self, since=None, until=None, date_column="analyzed_at", **filters
+    ):
+        """Get plan rows
+
+        Parameters
+        ----------
+        since : str, optional
+            Only rows with ``date_column`` at or after this ISO date (e.g.,
+            '2021-02-01')
+        until : str, optional
+            Only rows with ``date_column`` before this ISO date
+        date_column : str, optional
+            An element of DATE_COLUMNS, 'analyzed_at' or 'plan_date'
+        filters :
+            Values of FILTERS columns to match (e.g., mrn, tps, plan_name)
+
+        Returns
+        -------
+        list
+            A dict for each matching row, keyed by database column name
+        """
+        unknown = [key for key in filters if key not in FILTERS]
+        if unknown:
+            raise KeyError(
+                "Unknown filter(s) %s, choose from: %s"
+                % (", ".join(unknown), ", ".join(FILTERS))
+            )
+        if date_column not in DATE_COLUMNS:
+            raise KeyError(
+                "Unknown date column %s, choose from: %s"
+                % (date_column, ", ".join(DATE_COLUMNS))
+            )
+        self.flush()
+        clauses = ["%s = ?" % key for key in filters]
+        params = list(filters.values())
+        if since is not None:
+            clauses.append("%s >= ?" % date_column)
+            params.append(since)
+        if until is not None:
+            clauses.append("%s < ?" % date_column)
+            params.append(until)
+        sql = "SELECT * FROM plans"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        cursor = self.connection.execute(
+            sql + " ORDER BY sop_instance_uid, fx_group", params
+        )
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        """Write buffered rows and close the connection"""
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# diff.py
+"""
+Compare plans, fraction groups, and beams with stacked control point arrays,
+parsed from DICOM without building aperture geometry
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset
+from mlca.geometry import (
+    get_cp_values,
+    get_device_positions,
+    get_jaw_positions,
+)
+from mlca.options import (
+    BEAM_MU_TOLERANCE,
+    CONTROL_POINT_MU_TOLERANCE,
+    CONTROL_POINT_POS_TOLERANCE,
+    CONTROL_POINT_ANGLE_TOLERANCE,
+    DEFAULT_OPTIONS,
+)
+
+
+DEFAULT_TOLERANCES = {
+    "meter_set": BEAM_MU_TOLERANCE,
+    "cum_mu": CONTROL_POINT_MU_TOLERANCE,
+    "position": CONTROL_POINT_POS_TOLERANCE,
+    "angle": CONTROL_POINT_ANGLE_TOLERANCE,
+}
+
+PLAN_HEADER = [
+    "plan_name",
+    "patient_name",
+    "patient_id",
+    "study_instance_uid",
+    "sop_instance_uid",
+    "tps",
+]
+
+
+def get_tolerances(over_rides=None):
+    """Get diff tolerances
+
+    Parameters
+    ----------
+    over_rides : dict, optional
+        Over rides, keys may be 'meter_set', 'cum_mu', 'position', or 'angle'
+
+    Returns
+    -------
+    dict
+        DEFAULT_TOLERANCES with ``over_rides`` applied
+    """
+    tolerances = {k: v for k, v in DEFAULT_TOLERANCES.items()}
+    if over_rides:
+        for key, value in over_rides.items():
+            if key in tolerances:
+                tolerances[key] = float(value)
+    return tolerances
+
+
+class PlanArrays:
+    """Header and fraction groups of a DICOM RT Plan, with the attributes of
+    Plan used by diff_plans
+
+    Parameters
+    ----------
+    rt_plan : str, Dataset
+        file path of a DICOM RT Plan file or a pydicom Dataset
+    max_field_size_x : float, optional
+        Field size (mm) used if there are no ASYMX jaws
+    max_field_size_y : float, optional
+        Field size (mm) used if there are no ASYMY jaws
+
+    """
+
+    def __init__(
+        self,
+        rt_plan,
+        max_field_size_x=DEFAULT_OPTIONS["max_field_size_x"],
+        max_field_size_y=DEFAULT_OPTIONS["max_field_size_y"],
+    ):
+        if not isinstance(rt_plan, Dataset):
+            rt_plan = pydicom.read_file(rt_plan)
+        self.plan_name = str(getattr(rt_plan, "RTPlanLabel", ""))
+        self.patient_name = str(getattr(rt_plan, "PatientName", ""))
+        self.patient_id = str(getattr(rt_plan, "PatientID", ""))
+        self.study_instance_uid = str(getattr(rt_plan, "StudyInstanceUID", ""))
+        self.sop_instance_uid = str(getattr(rt_plan, "SOPInstanceUID", ""))
+        self.tps = "%s %s" % (
+            getattr(rt_plan, "Manufacturer", ""),
+            getattr(rt_plan, "ManufacturerModelName", ""),
+        )
+        self.fx_group = [
+            FxGroupArrays(
+                fx_grp,
+                rt_plan.BeamSequence,
+                max_field_size_x,
+                max_field_size_y,
+            )
+            for fx_grp in rt_plan.FractionGroupSequence
+        ]
+
+
+class FxGroupArrays:
+    """Beams of a fraction group, with the attributes of FxGroup used by
+    diff_fx_groups
+
+    Parameters
+    ----------
+    fx_grp_seq : Dataset
+        element of FractionGroupSequence (300A,0070)
+    plan_beam_sequences : BeamSequence
+        BeamSequence (300A,00B0)
+    max_field_size_x : float, optional
+        Field size (mm) used if there are no ASYMX jaws
+    max_field_size_y : float, optional
+        Field size (mm) used if there are no ASYMY jaws
+
+    """
+
+    def __init__(
+        self,
+        fx_grp_seq,
+        plan_beam_sequences,
+        max_field_size_x=DEFAULT_OPTIONS["max_field_size_x"],
+        max_field_size_y=DEFAULT_OPTIONS["max_field_size_y"],
+    ):
+        self.fxs = str(
+            getattr(fx_grp_seq, "NumberOfFractionsPlanned", "UNKNOWN")
+        )
+        meter_set = {
+            str(ref_beam.ReferencedBeamNumber): float(ref_beam.BeamMeterset)
+            for ref_beam in fx_grp_seq.ReferencedBeamSequence
+        }
+        self.beam = [
+            BeamArrays(
+                beam,
+                meter_set[str(beam.BeamNumber)],
+                max_field_size_x,
+                max_field_size_y,
+            )
+            for beam in plan_beam_sequences
+            if str(beam.BeamNumber) in meter_set
+        ]
+        self.beam_count = len(self.beam)
+        self.beam_names = [beam.name for beam in self.beam]
+
+
+class BeamArrays:
+    """Stacked control point arrays of a beam, with the attributes of Beam
+    used by diff_beams
+
+    Parameters
+    ----------
+    beam_dataset : Dataset
+        element of a BeamSequence (300A,00B0)
+    meter_set : float, optional
+        the monitor units for ``beam_dataset``, from the
+        ReferencedBeamSequence (300C,0004) of a fraction group. If ``None``,
+        diff_beams does not compare meter sets
+    max_field_size_x : float, optional
+        Field size (mm) used if there are no ASYMX jaws
+    max_field_size_y : float, optional
+        Field size (mm) used if there are no ASYMY jaws
+
+    """
+
+    def __init__(
+        self,
+        beam_dataset,
+        meter_set=None,
+        max_field_size_x=DEFAULT_OPTIONS["max_field_size_x"],
+        max_field_size_y=DEFAULT_OPTIONS["max_field_size_y"],
+    ):
+        cp_seq = beam_dataset.ControlPointSequence
+        self.name = str(
+            getattr(
+                beam_dataset,
+                "BeamDescription",
+                getattr(beam_dataset, "BeamName", "Unknown"),
+            )
+        )
+        self.meter_set = meter_set
+        self.cp_count = len(cp_seq)
+        device_positions = get_device_positions(cp_seq)
+        self.leaf_type = next(
+            (t for t in ["mlcx", "mlcy"] if t in device_positions), None
+        )
+        self.leaf_positions = None
+        if self.leaf_type is not None:
+            self.leaf_positions = device_positions[self.leaf_type].reshape(
+                self.cp_count, 2, -1
+            )
+        self.jaw_positions = get_jaw_positions(
+            device_positions, self.cp_count, max_field_size_x, max_field_size_y
+        )
+        self.cum_mu_frac = get_cp_values(cp_seq, "CumulativeMetersetWeight")
+        self.cp_gantry_angle = get_cp_values(cp_seq, "GantryAngle")
+        self.cp_collimator_angle = get_cp_values(
+            cp_seq, "BeamLimitingDeviceAngle"
+        )
+        self.cp_couch_angle = get_cp_values(cp_seq, "PatientSupportAngle")
+
+
+def get_plan_arrays(plan):
+    """Get the input of diff_plans from a plan
+
+    Parameters
+    ----------
+    plan : str, Dataset, Plan, PlanArrays
+        file path of a DICOM RT Plan file, a pydicom Dataset, or a parsed
+        plan
+
+    Returns
+    -------
+    Plan, PlanArrays
+        ``plan`` if already parsed, otherwise a PlanArrays
+    """
+    if isinstance(plan, (str, Dataset)):
+        return PlanArrays(plan)
+    return plan
+
+
+def get_angle_deviation(a, b):
+    """Absolute difference between angles, accounting for wrap-around
+
+    Parameters
+    ----------
+    a : np.ndarray
+        Angles (degrees)
+    b : np.ndarray
+        Angles (degrees)
+
+    Returns
+    -------
+    np.ndarray
+        Smallest absolute difference between ``a`` and ``b`` (degrees)
+    """
+    diff = np.abs(np.subtract(a, b)) % 360.0
+    return np.minimum(diff, 360.0 - diff)
+
+
+def diff_beams(a, b, tolerances=None):
+    """Compare two beams with stacked control point arrays
+
+    Parameters
+    ----------
+    a : Beam, BeamArrays, Dataset
+        A Beam, or an element of a BeamSequence (300A,00B0), whose meter set
+        is then not compared
+    b : Beam, BeamArrays, Dataset
+        Another Beam
+    tolerances : dict, optional
+        Over rides of DEFAULT_TOLERANCES
+
+    Returns
+    -------
+    dict
+        'equal': True if no header mismatches or control point deviations
+        beyond tolerance, 'header': dict of mismatched properties with
+        (a, b) values, 'max_deviation': dict of the largest absolute
+        deviation of meter_set, cum_mu, leaf, jaw, gantry, collimator, and
+        couch, 'control_points': indices of control points that differ
+    """
+    tol = get_tolerances(tolerances)
+    if isinstance(a, Dataset):
+        a = BeamArrays(a)
+    if isinstance(b, Dataset):
+        b = BeamArrays(b)
+    report = {
+        "name": a.name,
+        "equal": True,
+        "header": {},
+        "max_deviation": {},
+        "control_points": [],
+    }
+
+    if a.meter_set is not None and b.meter_set is not None:
+        meter_set_dev = abs(a.meter_set - b.meter_set)
+        report["max_deviation"]["meter_set"] = meter_set_dev
+        if meter_set_dev > tol["meter_set"]:
+            report["header"]["meter_set"] = (a.meter_set, b.meter_set)
+
+    a_positions, b_positions = a.leaf_positions, b.leaf_positions
+    for key, a_value, b_value in [
+        ("cp_count", a.cp_count, b.cp_count),
+        ("leaf_type", a.leaf_type, b.leaf_type),
+        (
+            "leaf_count",
+            None if a_positions is None else a_positions.shape[2],
+            None if b_positions is None else b_positions.shape[2],
+        ),
+    ]:
+        if a_value != b_value:
+            report["header"][key] = (a_value, b_value)
+
+    if any(k in report["header"] for k in ["cp_count", "leaf_count"]):
+        # control points cannot be paired
+        report["equal"] = False
+        return report
+
+    # deviation of each control point, compared to its tolerance
+    deviations = {
+        "cum_mu": (
+            np.abs(np.subtract(a.cum_mu_frac, b.cum_mu_frac)),
+            tol["cum_mu"],
+        ),
+        "jaw": (
+            np.max(np.abs(a.jaw_positions - b.jaw_positions), axis=1),
+            tol["position"],
+        ),
+    }
+    if a_positions is not None and b_positions is not None:
+        deviations["leaf"] = (
+            np.max(np.abs(a_positions - b_positions), axis=(1, 2)),
+            tol["position"],
+        )
+    for angle in ["gantry", "collimator", "couch"]:
+        key = "cp_%s_angle" % angle
+        deviations[angle] = (
+            get_angle_deviation(getattr(a, key), getattr(b, key)),
+            tol["angle"],
+        )
+
+    differs = np.zeros(a.cp_count, dtype=bool)
+    for key, (deviation, tolerance) in deviations.items():
+        report["max_deviation"][key] = (
+            float(np.max(deviation)) if len(deviation) else 0.0
+        )
+        differs = np.logical_or(differs, deviation > tolerance)
+    report["control_points"] = np.flatnonzero(differs).tolist()
+
+    report["equal"] = not report["header"] and not report["control_points"]
+    return report
+
+
+def diff_fx_groups(a, b, tolerances=None):
+    """Compare two fraction groups, beams are paired by order
+
+    Parameters
+    ----------
+    a : FxGroup, FxGroupArrays
+        A FxGroup
+    b : FxGroup, FxGroupArrays
+        Another FxGroup
+    tolerances : dict, optional
+        Over rides of DEFAULT_TOLERANCES
+
+    Returns
+    -------
+    dict
+        'equal': True if no header mismatches and all beams are equal,
+        'header': dict of mismatched properties with (a, b) values,
+        'beams': diff_beams report for each beam pair
+    """
+    report = {"equal": True, "header": {}, "beams": []}
+    for key in ["fxs", "beam_count", "beam_names"]:
+        a_value, b_value = getattr(a, key), getattr(b, key)
+        if a_value != b_value:
+            report["header"][key] = (a_value, b_value)
+
+    report["beams"] = [
+        diff_beams(a_beam, b_beam, tolerances)
+        for a_beam, b_beam in zip(a.beam, b.beam)
+    ]
+    report["equal"] = not report["header"] and all(
+        beam["equal"] for beam in report["beams"]
+    )
+    return report
+
+
+def diff_plans(a, b, tolerances=None):
+    """Compare two plans, fraction groups are paired by order
+
+    Parameters
+    ----------
+    a : str, Dataset, Plan, PlanArrays
+        A Plan, or a file path or pydicom Dataset of a DICOM RT Plan, which
+        is parsed with PlanArrays (i.e., no aperture geometry)
+    b : str, Dataset, Plan, PlanArrays
+        Another Plan
+    tolerances : dict, optional
+        Over rides of DEFAULT_TOLERANCES, keys may be 'meter_set', 'cum_mu',
+        'position', or 'angle'
+
+    Returns
+    -------
+    dict
+        'equal': True if no header mismatches and all fraction groups are
+        equal, 'header': dict of mismatched properties with (a, b) values,
+        'fx_groups': diff_fx_groups report for each fraction group pair
+    """
+    a, b = get_plan_arrays(a), get_plan_arrays(b)
+    report = {"equal": True, "header": {}, "fx_groups": []}
+    for key in PLAN_HEADER:
+        a_value, b_value = getattr(a, key), getattr(b, key)
+        if a_value != b_value:
+            report["header"][key] = (a_value, b_value)
+    if len(a.fx_group) != len(b.fx_group):
+        report["header"]["fx_group_count"] = (
+            len(a.fx_group),
+            len(b.fx_group),
+        )
+
+    report["fx_groups"] = [
+        diff_fx_groups(a_fx_grp, b_fx_grp, tolerances)
+        for a_fx_grp, b_fx_grp in zip(a.fx_group, b.fx_group)
+    ]
+    report["equal"] = not report["header"] and all(
+        fx_grp["equal"] for fx_grp in report["fx_groups"]
+    )
+    return report
+
+
+def get_diff_summary(report):
+    """Flatten a diff_plans report into one row per beam
+
+    Parameters
+    ----------
+    report : dict
+        Output from diff_plans
+
+    Returns
+    -------
+    list
+        A list of dicts with keys 'fx_group', 'beam', 'equal', 'header',
+        'control_points', and a key for each max_deviation
+    """
+    rows = []
+    for f, fx_grp in enumerate(report["fx_groups"]):
+        for beam in fx_grp["beams"]:
+            row = {
+                "fx_group": f + 1,
+                "beam": beam["name"],
+                "equal": beam["equal"],
+                "header": ", ".join(sorted(beam["header"])),
+                "control_points": " ".join(
+                    str(i + 1) for i in beam["control_points"]
+                ),
+            }
+            row.update(beam["max_deviation"])
+            rows.append(row)
+    return rows
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# events.py
+"""
+Progress events of PlanSet, get_dicom_files, and run_multiprocessing, with a
+rate-limited console reporter
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import sys
+import time
+
+
+# Event names and the keys of their data
+EVENTS = {
+    "plan_started": ["file_path", "index", "total"],
+    "plan_finished": [
+        "file_path",
+        "index",
+        "total",
+        "wall_time",
+        "stages",
+        "plan",
+    ],
+    "plan_skipped": ["file_path", "index", "total", "original"],
+    "plan_failed": ["file_path", "index", "total", "error"],
+    "plans_halted": ["total"],
+    "file_sniffed": ["file_path", "is_dicom", "modality", "error"],
+    "progress": ["done", "total"],
+}
+
+
+class EventEmitter:
+    """Call subscribed callbacks with events, silent without subscribers"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def subscribe(self, callback):
+        """Add a callback
+
+        Parameters
+        ----------
+        callback : callable
+            Called with the event name and a dict of event data, see EVENTS
+
+        Returns
+        -------
+        callable
+            ``callback``, so this can be used as a decorator
+        """
+        self.callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """Remove a callback
+
+        Parameters
+        ----------
+        callback : callable
+            A subscribed callback
+        """
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def emit(self, name, **data):
+        """Call each callback with an event
+
+        Parameters
+        ----------
+        name : str
+            Event name, preferably a key of EVENTS
+        data :
+            Event data
+        """
+        for callback in self.callbacks:
+            callback(name, data)
+
+
+class ConsoleReporter:
+    """Print events, with at most one plan_started or plan_skipped line per
+    interval. Failures and verbose events are always printed, progress is
+    shown with a tqdm bar.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Minimum time (s) between plan_started or plan_skipped lines
+    stream : file, optional
+        Output stream, default is sys.stdout
+
+    """
+
+    def __init__(self, interval=0.5, stream=None):
+        self.interval = interval
+        self.stream = stream
+        self.counts = {}
+        self._last = None
+        self._progress = None
+
+    def _print(self, msg):
+        """Print to the output stream"""
+        print(msg, file=self.stream or sys.stdout)
+
+    def _is_due(self, data):
+        """Check the rate limit, the first and last plans are always due"""
+        now = time.monotonic()
+        if (
+            self._last is None
+            or now - self._last >= self.interval
+            or data.get("index") == data.get("total")
+        ):
+            self._last = now
+            return True
+        return False
+
+    def __call__(self, name, data):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if name == "plan_started":
+            if self._is_due(data):
+                self._print(
+                    "Analyzing (%s of %s): %s"
+                    % (data["index"], data["total"], data["file_path"])
+                )
+        elif name == "plan_skipped":
+            if self._is_due(data):
+                self._print(
+                    "Skipping %s, duplicate of %s"
+                    % (data["file_path"], data["original"])
+                )
+        elif name == "plan_finished":
+            if data.get("plan") is not None:
+                self._print("%s\n" % data["plan"])
+        elif name == "plan_failed":
+            self._print(
+                "Analysis failed: %s\n%s\n"
+                % (data["file_path"], data["error"])
+            )
+        elif name == "plans_halted":
+            self._print("Plan analyzer halted!")
+        elif name == "file_sniffed":
+            if data["is_dicom"]:
+                self._print(
+                    "DICOM %sFile Found: %s"
+                    % (
+                        "%s " % data["modality"] if data["modality"] else "",
+                        data["file_path"],
+                    )
+                )
+            else:
+                self._print("Non-DICOM File Found: %s" % data["file_path"])
+                if data.get("error"):
+                    self._print(data["error"])
+        elif name == "progress":
+            self._update_progress(data)
+
+    def _update_progress(self, data):
+        """Render progress events with tqdm"""
+        if self._progress is None:
+            from tqdm import tqdm
+
+            self._progress = tqdm(
+                total=data["total"],
+                file=self.stream,
+                bar_format="{desc:<5.5}{percentage:3.0f}%|{bar:30}{r_bar}",
+            )
+        self._progress.update(data["done"] - self._progress.n)
+        if data["done"] >= data["total"]:
+            self._progress.close()
+            self._progress = None
+
+
+# Module level emitter, silent until a callback is subscribed
+_EMITTER = EventEmitter()
+
+
+def get_emitter():
+    """Get the event emitter used by PlanSet, get_dicom_files, and
+    run_multiprocessing
+
+    Returns
+    -------
+    EventEmitter
+        The current module level event emitter
+    """
+    return _EMITTER
+
+
+def set_emitter(emitter):
+    """Set the event emitter used by PlanSet, get_dicom_files, and
+    run_multiprocessing
+
+    Parameters
+    ----------
+    emitter : EventEmitter
+        The new module level event emitter
+
+    Returns
+    -------
+    EventEmitter
+        The previous module level event emitter
+    """
+    global _EMITTER
+    previous, _EMITTER = _EMITTER, emitter
+    return previous
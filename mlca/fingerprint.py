@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# fingerprint.py
+"""
+Compact plan fingerprints for duplicate and near-duplicate detection
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import hashlib
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset
+from mlca.options import FINGERPRINT_RESOLUTION
+
+
+INDEX_COLUMNS = [
+    "File Name",
+    "SOP Instance UID",
+    "Fingerprint",
+    "Duplicate Of",
+    "Near-Duplicate Cluster",
+]
+
+
+def _get_plan_arrays(rt_plan):
+    """Get the delivery arrays of a plan, in DICOM order
+
+    Parameters
+    ----------
+    rt_plan : Dataset
+        A DICOM RT Plan dataset
+
+    Returns
+    -------
+    list
+        (label, values, scale) for each array, where label is a str, values
+        is a list of floats, and scale multiplies the quantization
+        resolution (cumulative MU fractions use 1/100 of the resolution)
+    """
+    arrays = []
+    for fx_grp in getattr(rt_plan, "FractionGroupSequence", []):
+        arrays.append(
+            ("fx", [float(getattr(fx_grp, "NumberOfFractionsPlanned", 0))], 1)
+        )
+        arrays.append(
+            (
+                "mu",
+                [
+                    float(getattr(ref_beam, "BeamMeterset", 0))
+                    for ref_beam in getattr(
+                        fx_grp, "ReferencedBeamSequence", []
+                    )
+                ],
+                1,
+            )
+        )
+
+    for beam in getattr(rt_plan, "BeamSequence", []):
+        cp_seq = getattr(beam, "ControlPointSequence", [])
+        cum_mu = [
+            float(getattr(cp, "CumulativeMetersetWeight", 0)) for cp in cp_seq
+        ]
+        final_mu = cum_mu[-1] if cum_mu and cum_mu[-1] else 1.0
+        arrays.append(("beam", np.divide(cum_mu, final_mu).tolist(), 0.01))
+        for cp in cp_seq:
+            if "GantryAngle" in cp:
+                arrays.append(("gantry", [float(cp.GantryAngle)], 1))
+            for device in getattr(
+                cp, "BeamLimitingDevicePositionSequence", []
+            ):
+                arrays.append(
+                    (
+                        str(device.RTBeamLimitingDeviceType).upper(),
+                        [float(p) for p in device.LeafJawPositions],
+                        1,
+                    )
+                )
+    return arrays
+
+
+def get_hash(arrays, resolution):
+    """Hash plan arrays quantized to a resolution
+
+    Parameters
+    ----------
+    arrays : list
+        Output from _get_plan_arrays
+    resolution : float
+        Values are rounded to a multiple of this value before hashing
+
+    Returns
+    -------
+    str
+        16 character hexadecimal digest
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for label, values, scale in arrays:
+        quantized = np.round(np.divide(values, resolution * scale))
+        digest.update(label.encode())
+        digest.update(quantized.astype(np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def get_fingerprint(rt_plan, resolution=None):
+    """Get the fingerprint of a plan
+
+    Parameters
+    ----------
+    rt_plan : str, Dataset
+        file path of a DICOM RT Plan file or a pydicom Dataset
+    resolution : dict, optional
+        Over rides of FINGERPRINT_RESOLUTION, keys may be 'exact' or
+        'coarse'
+
+    Returns
+    -------
+    dict
+        'sop_instance_uid', 'patient_id', 'exact' (hash of arrays quantized
+        to the exact resolution), and 'coarse' (hash of arrays quantized to
+        the coarse resolution)
+    """
+    if not isinstance(rt_plan, Dataset):
+        rt_plan = pydicom.read_file(rt_plan)
+    res = {k: v for k, v in FINGERPRINT_RESOLUTION.items()}
+    if resolution:
+        res.update(resolution)
+
+    arrays = _get_plan_arrays(rt_plan)
+    return {
+        "sop_instance_uid": str(getattr(rt_plan, "SOPInstanceUID", "")),
+        "patient_id": str(getattr(rt_plan, "PatientID", "")),
+        "exact": get_hash(arrays, res["exact"]),
+        "coarse": get_hash(arrays, res["coarse"]),
+    }
+
+
+class PlanIndex:
+    """Index of plan fingerprints. Plans with the same exact fingerprint are
+    duplicates if they also have the same PatientID or (non-empty)
+    SOPInstanceUID, plans with the same coarse fingerprint are
+    near-duplicates. Identical plans of different patients (e.g., from a
+    template or class solution) are near-duplicates, not duplicates.
+
+    Near-duplicates with values within the coarse resolution of each other
+    may still be split by rounding, so clusters are conservative.
+    """
+
+    def __init__(self):
+        self.fingerprints = {}
+        # first plan of each PatientID and SOPInstanceUID, by exact hash
+        self._exact = {}
+        self._coarse = {}
+        # duplicate_of and insertion order of each plan, set when added
+        self._originals = {}
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, file_path):
+        return file_path in self.fingerprints
+
+    def add(self, file_path, fingerprint):
+        """Add a plan fingerprint to the index
+
+        Parameters
+        ----------
+        file_path : str
+            File path of the plan
+        fingerprint : dict
+            Output from get_fingerprint
+
+        Returns
+        -------
+        str, None
+            File path of the first indexed plan that this plan duplicates,
+            or None if the plan is not a duplicate
+        """
+        if file_path not in self.fingerprints:
+            self._positions[file_path] = len(self._positions)
+            self._originals[file_path] = self._find_original(
+                file_path, fingerprint
+            )
+            self.fingerprints[file_path] = fingerprint
+            self._coarse.setdefault(fingerprint["coarse"], []).append(
+                file_path
+            )
+        return self._originals[file_path]
+
+    def _find_original(self, file_path, fingerprint):
+        """Register a new plan under its exact hash, get the first indexed
+        plan with the same PatientID or SOPInstanceUID"""
+        firsts = self._exact.setdefault(
+            fingerprint["exact"], {"patient_id": {}, "sop_instance_uid": {}}
+        )
+        candidates = [
+            firsts["patient_id"].setdefault(
+                fingerprint.get("patient_id"), file_path
+            )
+        ]
+        if fingerprint["sop_instance_uid"]:
+            candidates.append(
+                firsts["sop_instance_uid"].setdefault(
+                    fingerprint["sop_instance_uid"], file_path
+                )
+            )
+        candidates = [c for c in candidates if c != file_path]
+        if not candidates:
+            return None
+        return min(candidates, key=self._positions.get)
+
+    def get_duplicate_of(self, file_path):
+        """Get the first indexed plan with the same exact fingerprint, and
+        the same PatientID or SOPInstanceUID
+
+        Parameters
+        ----------
+        file_path : str
+            File path of an indexed plan
+
+        Returns
+        -------
+        str, None
+            File path of the original plan, or None if not a duplicate
+        """
+        return self._originals[file_path]
+
+    @property
+    def duplicates(self):
+        """Get the duplicate plans
+
+        Returns
+        -------
+        dict
+            File path of the original plan, keyed by duplicate file path
+        """
+        return {
+            file_path: original
+            for file_path, original in self._originals.items()
+            if original is not None
+        }
+
+    @property
+    def near_duplicate_clusters(self):
+        """Get the clusters of plans with the same coarse fingerprint
+
+        Returns
+        -------
+        list
+            A list of file path lists, for clusters with more than one plan
+            that is not a duplicate
+        """
+        return [
+            file_paths
+            for file_paths in self._coarse.values()
+            if len({self.get_duplicate_of(f) or f for f in file_paths}) > 1
+        ]
+
+    @property
+    def summary_table(self):
+        """Get a table of the index for CSV output
+
+        Returns
+        -------
+        list
+            Rows of INDEX_COLUMNS, with a header row
+        """
+        clusters = {}
+        for c, file_paths in enumerate(self.near_duplicate_clusters):
+            for file_path in file_paths:
+                clusters[file_path] = str(c + 1)
+
+        table = [INDEX_COLUMNS]
+        for file_path, fingerprint in self.fingerprints.items():
+            table.append(
+                [
+                    file_path,
+                    fingerprint["sop_instance_uid"],
+                    fingerprint["exact"],
+                    self.get_duplicate_of(file_path) or "",
+                    clusters.get(file_path, ""),
+                ]
+            )
+        return table
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# fluence.py
+"""
+MU-weighted fluence maps from MLC and jaw positions
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import numpy as np
+
+
+def get_pixel_edges(field_size, resolution):
+    """Get pixel edges of a fluence grid centered on the isocenter
+
+    Parameters
+    ----------
+    field_size : float
+        Width of the grid (mm)
+    resolution : float
+        Pixel width (mm), the grid is extended to a whole number of pixels
+
+    Returns
+    -------
+    np.ndarray
+        Pixel edges (mm), length is pixel count + 1
+    """
+    pixel_count = int(np.ceil(float(field_size) / resolution))
+    half = pixel_count * resolution / 2.0
+    return np.linspace(-half, half, pixel_count + 1)
+
+
+def get_interval_coverage(starts, ends, edges):
+    """Get the fraction of each pixel covered by each interval
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        Lower bound of each interval
+    ends : np.ndarray
+        Upper bound of each interval, same shape as ``starts``
+    edges : np.ndarray
+        Pixel edges, from get_pixel_edges
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape starts.shape + (pixel count,) with values from 0 to 1
+    """
+    starts = np.asarray(starts, dtype=float)[..., np.newaxis]
+    ends = np.asarray(ends, dtype=float)[..., np.newaxis]
+    overlap = np.minimum(ends, edges[1:]) - np.maximum(starts, edges[:-1])
+    return np.maximum(overlap, 0.0) / np.diff(edges)
+
+
+def get_fluence(
+    leaf_boundaries, leaf_positions, jaws, leaf_type, mu, x_edges, y_edges
+):
+    """Accumulate MU-weighted open leaf pair segments into a 2D grid
+
+    Parameters
+    ----------
+    leaf_boundaries : array-like
+        LeafPositionBoundaries (300A,00BE), length is leaf pair count + 1
+    leaf_positions : np.ndarray, None
+        Leaf positions of shape (aperture count, 2, leaf pair count), where
+        the second axis is the bank. Ignored if ``leaf_type`` is ``None``
+    jaws : np.ndarray
+        Jaw positions of shape (aperture count, 4), columns are x_min,
+        x_max, y_min, y_max
+    leaf_type : str, None
+        'mlcx', 'mlcy' or ``None`` (jaws only)
+    mu : np.ndarray
+        MU delivered through each aperture
+    x_edges : np.ndarray
+        Pixel edges along x, from get_pixel_edges
+    y_edges : np.ndarray
+        Pixel edges along y, from get_pixel_edges
+
+    Returns
+    -------
+    np.ndarray
+        Fluence (MU) of shape (y pixel count, x pixel count)
+    """
+    jaws = np.asarray(jaws, dtype=float).reshape(-1, 4)
+    mu = np.asarray(mu, dtype=float)
+
+    # apertures without MU do not contribute
+    delivered = mu != 0
+    jaws, mu = jaws[delivered], mu[delivered]
+
+    if leaf_type not in {"mlcx", "mlcy"}:
+        x_cover = get_interval_coverage(jaws[:, 0], jaws[:, 1], x_edges)
+        y_cover = get_interval_coverage(jaws[:, 2], jaws[:, 3], y_edges)
+        return np.dot((y_cover * mu[:, np.newaxis]).T, x_cover)
+
+    positions = np.asarray(leaf_positions, dtype=float)[delivered]
+    boundaries = np.asarray(leaf_boundaries, dtype=float)
+    leaf_count = positions.shape[2]
+
+    # leaf travel is along x for mlcx, along y for mlcy
+    travel_jaws, boundary_jaws = (jaws[:, 0:2], jaws[:, 2:4])
+    travel_edges, boundary_edges = (x_edges, y_edges)
+    if leaf_type == "mlcy":
+        travel_jaws, boundary_jaws = (jaws[:, 2:4], jaws[:, 0:2])
+        travel_edges, boundary_edges = (y_edges, x_edges)
+
+    # one interval per leaf pair per aperture, in both dimensions
+    travel_cover = get_interval_coverage(
+        np.maximum(positions[:, 0], travel_jaws[:, 0:1]),
+        np.minimum(positions[:, 1], travel_jaws[:, 1:2]),
+        travel_edges,
+    ).reshape(-1, len(travel_edges) - 1)
+    boundary_cover = get_interval_coverage(
+        np.maximum(boundaries[:-1], boundary_jaws[:, 0:1]),
+        np.minimum(boundaries[1:], boundary_jaws[:, 1:2]),
+        boundary_edges,
+    ).reshape(-1, len(boundary_edges) - 1)
+
+    boundary_cover *= np.repeat(mu, leaf_count)[:, np.newaxis]
+    fluence = np.dot(boundary_cover.T, travel_cover)
+    return fluence if leaf_type == "mlcx" else fluence.T
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# geometry.py
+"""
+Vectorized aperture geometry for many MLC/jaw configurations at once, and
+the control point arrays it is built from
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import numpy as np
+
+
+def get_aperture_metrics(leaf_boundaries, leaf_positions, jaws, leaf_type):
+    """Get the area and x/y perimeter of many MLC apertures within jaws.
+    Equivalent to ControlPoint.aperture with get_xy_path_lengths, but each
+    leaf pair is treated as a rectangle, so no polygons are built.
+
+    Parameters
+    ----------
+    leaf_boundaries : array-like
+        LeafPositionBoundaries (300A,00BE), length is leaf pair count + 1
+    leaf_positions : np.ndarray, None
+        Leaf positions of shape (aperture count, 2, leaf pair count), where
+        the second axis is the bank. Ignored if ``leaf_type`` is ``None``
+    jaws : np.ndarray
+        Jaw positions of shape (aperture count, 4), columns are x_min,
+        x_max, y_min, y_max
+    leaf_type : str, None
+        'mlcx', 'mlcy' or ``None`` (jaws only)
+
+    Returns
+    -------
+    dict
+        'area', 'perimeter_x', and 'perimeter_y', each an np.ndarray with
+        a value for each aperture
+    """
+    jaws = np.asarray(jaws, dtype=float).reshape(-1, 4)
+    width_x = np.maximum(jaws[:, 1] - jaws[:, 0], 0.0)
+    width_y = np.maximum(jaws[:, 3] - jaws[:, 2], 0.0)
+
+    if leaf_type not in {"mlcx", "mlcy"}:
+        is_open = np.logical_and(width_x > 0, width_y > 0)
+        return {
+            "area": width_x * width_y,
+            "perimeter_x": 2.0 * width_x * is_open,
+            "perimeter_y": 2.0 * width_y * is_open,
+        }
+
+    boundaries = np.asarray(leaf_boundaries, dtype=float)
+    positions = np.asarray(leaf_positions, dtype=float)
+
+    # leaf travel is along x for mlcx, along y for mlcy
+    travel_jaws, boundary_jaws = (jaws[:, 0:2], jaws[:, 2:4])
+    if leaf_type == "mlcy":
+        travel_jaws, boundary_jaws = (jaws[:, 2:4], jaws[:, 0:2])
+
+    # open interval of each leaf pair along leaf travel, clipped by jaws
+    lo = np.maximum(positions[:, 0], travel_jaws[:, 0:1])
+    hi = np.minimum(positions[:, 1], travel_jaws[:, 1:2])
+
+    # extent of each leaf pair perpendicular to leaf travel, clipped by jaws
+    height = np.minimum(boundaries[1:], boundary_jaws[:, 1:2]) - np.maximum(
+        boundaries[:-1], boundary_jaws[:, 0:1]
+    )
+
+    is_open = np.logical_and(hi > lo, height > 0)
+    width = np.where(is_open, hi - lo, 0.0)
+    height = np.where(is_open, height, 0.0)
+
+    # Edges parallel to leaf travel: between adjacent leaf pairs, the length
+    # is that of the symmetric difference of their open intervals.
+    # Pad with closed leaf pairs to include the outer edges.
+    closed = np.zeros((len(width), 1))
+    width_pad = np.hstack([closed, width, closed])
+    lo_pad = np.hstack([closed, np.where(is_open, lo, 0.0), closed])
+    hi_pad = np.hstack([closed, np.where(is_open, hi, 0.0), closed])
+    overlap = np.minimum(hi_pad[:, 1:], hi_pad[:, :-1]) - np.maximum(
+        lo_pad[:, 1:], lo_pad[:, :-1]
+    )
+    both_open = np.logical_and(width_pad[:, 1:] > 0, width_pad[:, :-1] > 0)
+    overlap = np.where(both_open, np.maximum(overlap, 0.0), 0.0)
+    parallel = np.sum(
+        width_pad[:, 1:] + width_pad[:, :-1] - 2.0 * overlap, axis=1
+    )
+
+    # Edges perpendicular to leaf travel: the leaf tips of each open pair
+    perpendicular = 2.0 * np.sum(height, axis=1)
+
+    if leaf_type == "mlcx":
+        perimeter_x, perimeter_y = parallel, perpendicular
+    else:
+        perimeter_x, perimeter_y = perpendicular, parallel
+
+    return {
+        "area": np.sum(width * height, axis=1),
+        "perimeter_x": perimeter_x,
+        "perimeter_y": perimeter_y,
+    }
+
+
+def interpolate_control_points(values, steps):
+    """Linearly interpolate values between consecutive control points
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array with control points along the first axis
+    steps : int
+        Number of sub-samples per control point interval. Sub-sample k of
+        control point i is at i + k / steps, so steps=1 returns ``values``
+
+    Returns
+    -------
+    np.ndarray
+        Array with (control point count * steps) elements along the first
+        axis. The final control point is repeated.
+    """
+    values = np.asarray(values, dtype=float)
+    fraction = np.arange(steps, dtype=float) / steps
+    fraction = fraction.reshape((1, steps) + (1,) * (values.ndim - 1))
+    delta = np.diff(values, axis=0)
+    delta = np.concatenate([delta, np.zeros_like(values[:1])], axis=0)
+    interpolated = values[:, np.newaxis] + fraction * delta[:, np.newaxis]
+    return interpolated.reshape((len(values) * steps,) + values.shape[1:])
+
+
+def forward_fill(values):
+    """Replace missing values with the most recent value specified in a
+    previous control point, as for device positions omitted from a
+    control point when unchanged. Values missing before the first
+    specified value use the first specified value.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array with control points along the first axis, missing values are
+        NaN
+
+    Returns
+    -------
+    np.ndarray
+        A copy of ``values`` with each element carried forward along the
+        first axis. Still NaN if never specified.
+    """
+    values = np.array(values, dtype=float)
+    filled = _forward_fill(values)
+    return _forward_fill(filled[::-1])[::-1]
+
+
+def _forward_fill(values):
+    """Carry forward the last non-NaN value along the first axis"""
+    shape = (-1,) + (1,) * (values.ndim - 1)
+    index = np.where(
+        np.isnan(values), 0, np.arange(len(values)).reshape(shape)
+    )
+    np.maximum.accumulate(index, axis=0, out=index)
+    return np.take_along_axis(values, index, axis=0)
+
+
+def get_device_positions(cp_seq):
+    """Parse the LeafJawPositions (300A,011C) of every control point. Per
+    DICOM, a device omitted from a control point keeps the positions of the
+    previous control point.
+
+    Parameters
+    ----------
+    cp_seq : Sequence
+        ControlPointSequence (300A,0111)
+
+    Returns
+    -------
+    dict
+        Array of shape (control point count, position count) for each
+        RTBeamLimitingDeviceType (300A,00B8), in lower case
+    """
+    positions = {}
+    for i, cp in enumerate(cp_seq):
+        for device_position_seq in getattr(
+            cp, "BeamLimitingDevicePositionSequence", []
+        ):
+            if hasattr(
+                device_position_seq, "RTBeamLimitingDeviceType"
+            ) and hasattr(device_position_seq, "LeafJawPositions"):
+                device_type = str(
+                    device_position_seq.RTBeamLimitingDeviceType
+                ).lower()
+                values = list(map(float, device_position_seq.LeafJawPositions))
+                if device_type not in positions:
+                    positions[device_type] = np.full(
+                        (len(cp_seq), len(values)), np.nan
+                    )
+                positions[device_type][i] = values
+    return {
+        device_type: forward_fill(values)
+        for device_type, values in positions.items()
+    }
+
+
+def get_jaw_positions(
+    device_positions, cp_count, max_field_size_x, max_field_size_y
+):
+    """Get the jaw positions of every control point
+
+    Parameters
+    ----------
+    device_positions : dict
+        Output from get_device_positions
+    cp_count : int
+        Number of control points
+    max_field_size_x : float
+        Field size (mm) used if there are no ASYMX jaws
+    max_field_size_y : float
+        Field size (mm) used if there are no ASYMY jaws
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (control point count, 4), columns are x_min, x_max,
+        y_min, y_max
+    """
+    jaws = np.empty((cp_count, 4))
+    for i, (dim, size) in enumerate(
+        [("x", max_field_size_x), ("y", max_field_size_y)]
+    ):
+        values = device_positions.get("asym%s" % dim)
+        if values is None:
+            jaws[:, 2 * i : 2 * i + 2] = [-size / 2.0, size / 2.0]
+        else:
+            jaws[:, 2 * i] = np.min(values, axis=1)
+            jaws[:, 2 * i + 1] = np.max(values, axis=1)
+    return jaws
+
+
+def get_cp_values(cp_seq, keyword):
+    """Get a numeric value from every control point, a value not specified
+    in a control point is carried forward from the previous control point
+
+    Parameters
+    ----------
+    cp_seq : Sequence
+        ControlPointSequence (300A,0111)
+    keyword : str
+        DICOM keyword of a control point attribute (e.g., GantryAngle)
+
+    Returns
+    -------
+    np.ndarray
+        Value for each control point, 0 if never specified
+    """
+    values, value = [], None
+    for cp in cp_seq:
+        if hasattr(cp, keyword):
+            value = float(getattr(cp, keyword))
+        values.append(value)
+    first = next((v for v in values if v is not None), 0.0)
+    return np.array([first if v is None else v for v in values])
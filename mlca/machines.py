@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# machines.py
+"""
+Leaf geometry of each treatment machine and MLC configuration, computed
+once per process and shared by every beam
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import numpy as np
+from mlca.counters import get_counters
+
+
+class MachineModel:
+    """Leaf geometry of an MLC, with the index arrays used to build
+    aperture polygons and MLC borders
+
+    Parameters
+    ----------
+    leaf_boundaries : array-like
+        LeafPositionBoundaries (300A,00BE), length is leaf pair count + 1
+    machine_name : str, optional
+        TreatmentMachineName (300A,00B2)
+    leaf_type : str, optional
+        'mlcx', 'mlcy', or ``None``
+
+    """
+
+    def __init__(self, leaf_boundaries, machine_name=None, leaf_type=None):
+        self.machine_name = machine_name
+        self.leaf_type = leaf_type
+        self.boundaries = np.array(leaf_boundaries, dtype=float)
+        self.widths = np.diff(self.boundaries)
+        self.centers = self.boundaries[:-1] + self.widths / 2.0
+        self.leaf_pair_count = len(self.widths)
+
+        # Each leaf tip is an edge between its lower and upper boundary, so
+        # polygon vertex k is at leaf polygon_leaf[k] and boundary
+        # polygon_boundary[k]
+        self.polygon_leaf = np.repeat(np.arange(self.leaf_pair_count), 2)
+        self.polygon_boundary = np.column_stack(
+            [self.boundaries[:-1], self.boundaries[1:]]
+        ).ravel()
+
+        # ControlPoint.mlc_borders, one quad per leaf of both banks
+        self.border_top = np.tile(self.boundaries[:-1], 2).tolist()
+        self.border_bottom = np.tile(self.boundaries[1:], 2).tolist()
+
+    def get_bank_vertices(self, positions):
+        """Get the polygon vertices of a leaf bank
+
+        Parameters
+        ----------
+        positions : np.ndarray
+            Leaf positions of one bank, length is leaf pair count
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (2 * leaf pair count, 2) of (x, y) points along
+            the leaf tips, in order of the leaf boundaries
+        """
+        tips = np.asarray(positions, dtype=float)[self.polygon_leaf]
+        if self.leaf_type == "mlcy":
+            return np.column_stack([self.polygon_boundary, tips])
+        return np.column_stack([tips, self.polygon_boundary])
+
+
+def _get_key(leaf_boundaries, machine_name, leaf_type):
+    """Registry key of a machine name and MLC configuration"""
+    return (
+        machine_name,
+        leaf_type,
+        tuple(float(boundary) for boundary in leaf_boundaries),
+    )
+
+
+# Module level registry of MachineModel, keyed by _get_key
+_MODELS = {}
+
+
+def get_machine_model(leaf_boundaries, machine_name=None, leaf_type=None):
+    """Get the MachineModel of a machine name and MLC configuration, built
+    on first use and shared within this process
+
+    Parameters
+    ----------
+    leaf_boundaries : array-like, None
+        LeafPositionBoundaries (300A,00BE)
+    machine_name : str, optional
+        TreatmentMachineName (300A,00B2)
+    leaf_type : str, optional
+        'mlcx', 'mlcy', or ``None``
+
+    Returns
+    -------
+    MachineModel, None
+        ``None`` if ``leaf_boundaries`` is ``None`` (i.e., no MLC)
+    """
+    if leaf_boundaries is None:
+        return None
+    key = _get_key(leaf_boundaries, machine_name, leaf_type)
+    model = _MODELS.get(key)
+    if model is None:
+        get_counters().increment("machine_models_built")
+        model = MachineModel(key[2], machine_name, leaf_type)
+        _MODELS[key] = model
+    return model
+
+
+def get_machine_models():
+    """Get the machine models of this process
+
+    Returns
+    -------
+    list
+        Each MachineModel built by get_machine_model
+    """
+    return list(_MODELS.values())
+
+
+def clear_machine_models():
+    """Remove all machine models from the registry"""
+    _MODELS.clear()
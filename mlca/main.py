@@ -10,14 +10,24 @@ Collect DICOM-RT Plan Files, save summary to .csv
 #    See the file LICENSE included with this distribution, also
 #    available at https://github.com/cutright/DVHA-MLCA
 
-from mlca.mlc_analyzer import PlanSet
+# mlca.mlc_analyzer, mlca.similarity, and mlca.verify import NumPy, pydicom,
+# and Shapely, so they are imported when needed to keep startup fast
+import sys
 from mlca._version import __version__
+from mlca.metrics import METRICS
+from mlca.aggregates import Aggregator, GROUP_BY
+from mlca.ranking import TopK, get_beam_detail_table
+from mlca.profiling import Profiler, set_profiler
+from mlca.counters import get_counters
+from mlca.memory import MemoryTracker, set_memory_tracker
+from mlca.events import ConsoleReporter, get_emitter
 from mlca.utilities import (
     get_file_paths,
     get_dicom_files,
     create_cmd_parser,
     get_default_output_filename,
     write_csv,
+    read_weight_grid,
 )
 
 
@@ -27,6 +37,26 @@ def process(
     print_version=False,
     verbose=False,
     processes=1,
+    weight_grid=None,
+    metrics=None,
+    duplicates_file=None,
+    feature_index=None,
+    similar_to=None,
+    neighbors=20,
+    profile=False,
+    profile_file=None,
+    counters_file=None,
+    memory_report=None,
+    database=None,
+    beam_summaries=False,
+    aggregates=None,
+    group_by="tps",
+    plan_name_pattern=None,
+    aggregate_only=False,
+    top_k=None,
+    rank_by="complexity",
+    beam_details=None,
+    quiet=False,
     **kwargs
 ):
     """Process command line args, call mlc_analyzer.PlanSet
@@ -44,6 +74,58 @@ def process(
         Print more detailed information as the script runs
     processes : int
         Number of processes used for multiprocessing
+    weight_grid : str, optional
+        Path to a csv file of complexity weight pairs (x, y). A complexity
+        score column will be added for each pair
+    metrics : str, optional
+        Comma-separated keys of mlca.metrics.METRICS, a column will be added
+        for each metric
+    duplicates_file : str, optional
+        Save the plan fingerprint index (see mlca.fingerprint.PlanIndex)
+        to this csv file
+    feature_index : str, optional
+        Path to a .npz file (see mlca.similarity.FeatureIndex). Analyzed
+        plans are added to the index
+    similar_to : str, optional
+        Path to a DICOM-RT Plan file, print the most similar plans in
+        ``feature_index``
+    neighbors : int, optional
+        Number of similar plans to print
+    profile : bool, optional
+        Print wall and CPU time of each stage (see mlca.profiling)
+    profile_file : str, optional
+        Save stage and per-plan timings to this JSON file
+    counters_file : str, optional
+        Write mlca.counters.get_counters to this file in the Prometheus
+        text format
+    memory_report : str, optional
+        Track the memory used by each plan with mlca.memory.MemoryTracker,
+        save MemoryTracker.summary_table to this file
+    database : str, optional
+        Also write results to this SQLite database, see
+        mlca.database.ResultDatabase
+    beam_summaries : bool, optional
+        Also write a row for each beam to ``database``
+    aggregates : str, optional
+        Save mlca.aggregates.Aggregator.summary_table to this file
+    group_by : str, optional
+        Comma-separated keys of mlca.aggregates.GROUP_BY for ``aggregates``
+    plan_name_pattern : str, optional
+        Regular expression to group plan names by, see
+        mlca.aggregates.Aggregator
+    aggregate_only : bool, optional
+        Do not keep or save result rows, only ``aggregates``
+    top_k : int, optional
+        Only keep and save the ``top_k`` fraction groups ranked highest by
+        ``rank_by``, see mlca.ranking.TopK
+    rank_by : str, optional
+        A key of mlca.ranking.RANK_BY
+    beam_details : str, optional
+        Save mlca.ranking.get_beam_detail_table of the ``top_k`` fraction
+        groups to this file
+    quiet : bool, optional
+        Do not subscribe mlca.events.ConsoleReporter, i.e., do not print
+        progress of each plan or progress bars
     """
 
     if print_version:
@@ -57,17 +139,63 @@ def process(
         except Exception:
             processes = 1
 
+        if metrics:
+            metrics = [m.strip() for m in metrics.split(",") if m.strip()]
+            unknown = [m for m in metrics if m not in METRICS]
+            if unknown:
+                print(
+                    "mlca: error: unknown metric(s): %s\n"
+                    "Choose from: %s"
+                    % (", ".join(unknown), ", ".join(sorted(METRICS)))
+                )
+                return
+            kwargs["metrics"] = metrics
+
+        if aggregate_only and not aggregates:
+            print("mlca: error: --aggregate-only requires --aggregates")
+            return
+        if beam_details and not top_k:
+            print("mlca: error: --beam-details requires --top-k")
+            return
+        if top_k:
+            kwargs["top_k"] = TopK(int(float(top_k)), rank_by)
+            kwargs["keep_results"] = False
+        if aggregates:
+            group_by = [g.strip() for g in group_by.split(",") if g.strip()]
+            unknown = [g for g in group_by if g not in GROUP_BY]
+            if unknown:
+                print(
+                    "mlca: error: unknown group-by field(s): %s\n"
+                    "Choose from: %s"
+                    % (", ".join(unknown), ", ".join(sorted(GROUP_BY)))
+                )
+                return
+            kwargs["aggregator"] = Aggregator(
+                group_by, plan_name_pattern=plan_name_pattern
+            )
+            kwargs["keep_results"] = not (aggregate_only or top_k)
+
+        profiler = Profiler(enabled=bool(profile or profile_file))
+        previous_profiler = set_profiler(profiler)
+        tracker = MemoryTracker(enabled=memory_report is not None)
+        previous_tracker = set_memory_tracker(tracker)
+        reporter = (
+            None if quiet else get_emitter().subscribe(ConsoleReporter())
+        )
+
         print("Directory: %s\n" "Begin file tree scan ..." % init_dir)
-        file_paths = get_file_paths(init_dir)
+        with profiler.stage("tree_walk"):
+            file_paths = get_file_paths(init_dir)
         print(
             "File tree scan complete\n" "Searching for DICOM-RT Plan files ..."
         )
-        dicom_plan_files = get_dicom_files(
-            file_paths,
-            modality="RTPLAN",
-            verbose=verbose,
-            processes=processes,
-        )
+        with profiler.stage("sniffing"):
+            dicom_plan_files = get_dicom_files(
+                file_paths,
+                modality="RTPLAN",
+                verbose=verbose,
+                processes=processes,
+            )
         print("%s DICOM-RT Plan file(s) found" % len(dicom_plan_files))
 
         if not output_file:
@@ -75,9 +203,34 @@ def process(
 
         kwargs["verbose"] = verbose
         kwargs["processes"] = processes
+        kwargs["features"] = feature_index is not None
+        kwargs["index_fingerprints"] = duplicates_file is not None
+        if weight_grid:
+            try:
+                kwargs["weight_grid"] = read_weight_grid(weight_grid)
+            except ValueError as e:
+                print("mlca: error: %s" % e)
+                return
+        if database:
+            from mlca.database import ResultDatabase
+
+            kwargs["database"] = ResultDatabase(database, beams=beam_summaries)
         print("Analyzing %s file(s) ..." % len(dicom_plan_files))
+        from mlca.mlc_analyzer import PlanSet
+
         plan_analyzer = PlanSet(dicom_plan_files, **kwargs)
         print("Analysis Complete")
+        if database:
+            print("Results written to: %s" % database)
+            kwargs.pop("database").close()
+        if top_k:
+            # PlanSet.results only has the winners
+            ranking = kwargs.pop("top_k")
+            plan_analyzer.results.extend(ranking.rows)
+            print(
+                "Kept top %s of %s fraction group(s) by %s"
+                % (len(ranking), ranking.count, rank_by)
+            )
 
         if kwargs["verbose"]:
             to_print = "\n".join(
@@ -85,15 +238,131 @@ def process(
             )
             print(to_print.replace(",", "\t"))
 
-        print("Printing summary to: %s" % output_file)
-        write_csv(output_file, plan_analyzer.summary_table)
+        if aggregates:
+            aggregator = kwargs.pop("aggregator")
+            print(
+                "Printing aggregates of %s group(s) to: %s"
+                % (len(aggregator), aggregates)
+            )
+            write_csv(aggregates, aggregator.summary_table)
+
+        if top_k or not aggregate_only:
+            print("Printing summary to: %s" % output_file)
+            with profiler.stage("output"):
+                write_csv(output_file, plan_analyzer.summary_table)
+
+        if beam_details:
+            print("Printing beam details to: %s" % beam_details)
+            with profiler.stage("output"):
+                write_csv(
+                    beam_details,
+                    get_beam_detail_table(
+                        plan_analyzer.results.rows,
+                        plan_analyzer.columns,
+                        **kwargs
+                    ),
+                )
+
+        index = plan_analyzer.index
+        if plan_analyzer.index_fingerprints:
+            print(
+                "%s duplicate plan(s) %s, %s near-duplicate cluster(s) found"
+                % (
+                    len(index.duplicates),
+                    "skipped" if kwargs.get("skip_duplicates") else "found",
+                    len(index.near_duplicate_clusters),
+                )
+            )
+        if duplicates_file:
+            print("Printing plan fingerprints to: %s" % duplicates_file)
+            write_csv(duplicates_file, index.summary_table)
+
+        if feature_index:
+            from mlca.similarity import FeatureIndex
 
-    elif not print_version:
+            index = FeatureIndex(feature_index)
+            for key, label, features in plan_analyzer.features:
+                index.add(key, features, label)
+            print(
+                "Saving %s feature vector(s) to: %s"
+                % (len(index), feature_index)
+            )
+            index.save(feature_index)
+
+        set_profiler(previous_profiler)
+        set_memory_tracker(previous_tracker)
+        if reporter is not None:
+            get_emitter().unsubscribe(reporter)
+        if profile:
+            print("\nProfile\n%s" % profiler)
+        if profile_file:
+            print("Printing profile to: %s" % profile_file)
+            profiler.save(profile_file)
+        if counters_file:
+            print("Printing counters to: %s" % counters_file)
+            get_counters().write_prometheus(counters_file)
+        if memory_report:
+            print("\nMemory\n%s" % tracker)
+            print("Printing memory report to: %s" % memory_report)
+            write_csv(memory_report, tracker.summary_table)
+
+    if similar_to is not None:
+        if feature_index is None:
+            print("mlca: error: --similar-to requires --feature-index")
+            return
+        print_similar_plans(feature_index, similar_to, neighbors, **kwargs)
+
+    elif init_dir is None and not print_version:
         print("mlca: error: the following arguments are required: init_dir")
 
 
+def print_similar_plans(feature_index, file_path, neighbors=20, **kwargs):
+    """Print the most similar plans in a feature index for each fraction
+    group of a plan
+
+    Parameters
+    ----------
+    feature_index : str
+        Path to a .npz file (see mlca.similarity.FeatureIndex)
+    file_path : str
+        Path to a DICOM-RT Plan file
+    neighbors : int, optional
+        Number of similar plans to print for each fraction group
+    """
+    from mlca.mlc_analyzer import Plan
+    from mlca.similarity import FeatureIndex, get_plan_features
+
+    index = FeatureIndex(feature_index)
+    plan = Plan(file_path, **kwargs)
+    for key, label, features in get_plan_features(plan):
+        print("\nPlans most similar to: %s" % key)
+        for result in index.query(features, int(float(neighbors))):
+            print(
+                "%0.3f\t%s\t%s"
+                % (result["distance"], result["key"], result["label"])
+            )
+
+
 def main():
-    """Parse command-line args, pass into process"""
+    """Parse command-line args, pass into process, or into the main of
+    mlca.verify, mlca.server, mlca.watch, or mlca.scp if the first arg is
+    'verify', 'serve', 'watch', or 'scp'"""
+    if sys.argv[1:2] == ["verify"]:
+        from mlca import verify
+
+        sys.exit(verify.main(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        from mlca import server
+
+        sys.exit(server.main(sys.argv[2:]))
+    if sys.argv[1:2] == ["watch"]:
+        from mlca import watch
+
+        sys.exit(watch.main(sys.argv[2:]))
+    if sys.argv[1:2] == ["scp"]:
+        from mlca import scp
+
+        sys.exit(scp.main(sys.argv[2:]))
     cmd_parser = create_cmd_parser()
     kwargs = vars(cmd_parser.parse_args())
     process(**kwargs)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# memory.py
+"""
+Peak memory and allocation growth of each plan, to size --processes
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from contextlib import contextmanager
+from os import getpid
+import sys
+import tracemalloc
+
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MEMORY_COLUMNS = [
+    "File Path",
+    "PID",
+    "CP Count",
+    "Traced Peak (MB)",
+    "Traced Growth (MB)",
+    "Peak RSS (MB)",
+    "Peak RSS Growth (MB)",
+]
+
+
+def get_peak_rss():
+    """Get the peak resident set size of this process
+
+    Returns
+    -------
+    float, None
+        Peak RSS (MB), None if the resource module is unavailable
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class MemoryTracker:
+    """Record the memory used to process each plan with tracemalloc and the
+    peak RSS of the process
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        If False, plan is a no-op. tracemalloc slows down allocations, so
+        this is disabled by default, see get_memory_tracker
+
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.plans = []
+
+    @contextmanager
+    def plan(self, file_path):
+        """Record the memory used while processing one plan
+
+        Parameters
+        ----------
+        file_path : str
+            File path of the plan
+
+        Yields
+        ------
+        dict
+            The record of this plan, the caller may set 'cp_count'
+        """
+        record = {
+            "file_path": file_path,
+            "pid": getpid(),
+            "cp_count": 0,
+            "traced_peak": 0.0,
+            "traced_growth": 0.0,
+            "peak_rss": None,
+            "peak_rss_growth": None,
+        }
+        if not self.enabled:
+            yield record
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if hasattr(tracemalloc, "reset_peak"):
+            # Python < 3.9 reports the peak since tracing started, which is
+            # only exact if tracing was started here
+            tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        rss_before = get_peak_rss()
+        try:
+            yield record
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            record["traced_peak"] = (peak - before) / 1e6
+            record["traced_growth"] = (current - before) / 1e6
+            record["peak_rss"] = get_peak_rss()
+            if rss_before is not None:
+                record["peak_rss_growth"] = record["peak_rss"] - rss_before
+            self.plans.append(record)
+
+    def to_dict(self):
+        """Get the plan records as a dict that can be pickled or saved as
+        JSON
+
+        Returns
+        -------
+        dict
+            'plans'
+        """
+        return {"plans": [dict(p) for p in self.plans]}
+
+    def merge(self, memory):
+        """Add plan records, e.g., from a worker process
+
+        Parameters
+        ----------
+        memory : dict
+            Output from MemoryTracker.to_dict
+        """
+        self.plans.extend(memory["plans"])
+
+    def reset(self):
+        """Clear all plan records"""
+        self.plans = []
+
+    @property
+    def sorted_plans(self):
+        """Get plan records sorted by traced peak, then control point count,
+        largest first
+
+        Returns
+        -------
+        list
+            Plan records
+        """
+        return sorted(
+            self.plans,
+            key=lambda p: (p["traced_peak"], p["cp_count"]),
+            reverse=True,
+        )
+
+    @property
+    def peak_rss(self):
+        """Get the peak RSS of each process
+
+        Returns
+        -------
+        dict
+            Peak RSS (MB) keyed by process ID
+        """
+        peaks = {}
+        for p in self.plans:
+            if p["peak_rss"] is not None:
+                peaks[p["pid"]] = max(peaks.get(p["pid"], 0.0), p["peak_rss"])
+        return peaks
+
+    @property
+    def summary_table(self):
+        """Get MemoryTracker.sorted_plans prepped for CSV output
+
+        Returns
+        -------
+        list
+            MEMORY_COLUMNS followed by a row for each plan
+        """
+        table = [MEMORY_COLUMNS]
+        for p in self.sorted_plans:
+            table.append(
+                [
+                    p["file_path"],
+                    p["pid"],
+                    p["cp_count"],
+                    "%0.3f" % p["traced_peak"],
+                    "%0.3f" % p["traced_growth"],
+                    "" if p["peak_rss"] is None else "%0.1f" % p["peak_rss"],
+                    (
+                        ""
+                        if p["peak_rss_growth"] is None
+                        else "%0.1f" % p["peak_rss_growth"]
+                    ),
+                ]
+            )
+        return table
+
+    def __str__(self):
+        lines = [
+            "%12s %10s %8s  %s"
+            % ("Peak (MB)", "Kept (MB)", "CPs", "File Path")
+        ]
+        for p in self.sorted_plans[:5]:
+            lines.append(
+                "%12.2f %10.2f %8d  %s"
+                % (
+                    p["traced_peak"],
+                    p["traced_growth"],
+                    p["cp_count"],
+                    p["file_path"],
+                )
+            )
+        peaks = self.peak_rss
+        if peaks:
+            lines.append(
+                "\nPeak RSS of %s process(es): max %0.1f MB, total %0.1f MB"
+                % (len(peaks), max(peaks.values()), sum(peaks.values()))
+            )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+# Module level memory tracker, disabled unless enabled with
+# set_memory_tracker
+_MEMORY_TRACKER = MemoryTracker(enabled=False)
+
+
+def get_memory_tracker():
+    """Get the memory tracker used by PlanSet
+
+    Returns
+    -------
+    MemoryTracker
+        The current module level memory tracker
+    """
+    return _MEMORY_TRACKER
+
+
+def set_memory_tracker(tracker):
+    """Set the memory tracker used by PlanSet
+
+    Parameters
+    ----------
+    tracker : MemoryTracker
+        The new module level memory tracker
+
+    Returns
+    -------
+    MemoryTracker
+        The previous module level memory tracker
+    """
+    global _MEMORY_TRACKER
+    previous, _MEMORY_TRACKER = _MEMORY_TRACKER, tracker
+    return previous
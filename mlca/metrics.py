@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# metrics.py
+"""
+Registry of beam complexity metrics for dvha-mlca
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from mlca._lazy import LazyModule
+
+
+# imported on first use, see mlca._lazy
+np = LazyModule("numpy")
+
+# Each metric is a dict with keys:
+#   'func': callable that accepts a Beam and returns a float
+#   'column': column name used in PlanSet.summary_table
+#   'aggregate': how beam values are combined into a FxGroup value,
+#                'sum', 'mu_weighted' (mean weighted by beam MU), or 'max'
+#   'format': string format used in PlanSet.summary_table
+METRICS = {}
+
+
+def register_metric(name, column, aggregate="sum", fmt="%0.3f"):
+    """Decorator to add a beam metric to METRICS
+
+    Parameters
+    ----------
+    name : str
+        Key for METRICS
+    column : str
+        Column name used in PlanSet.summary_table
+    aggregate : str, optional
+        Method to combine beam values for a fraction group: 'sum',
+        'mu_weighted', or 'max'
+    fmt : str, optional
+        String format used in PlanSet.summary_table
+
+    Returns
+    -------
+    callable
+        Decorator that registers a function accepting a Beam
+    """
+
+    def decorator(func):
+        METRICS[name] = {
+            "func": func,
+            "column": column,
+            "aggregate": aggregate,
+            "format": fmt,
+        }
+        return func
+
+    return decorator
+
+
+def get_metric(name):
+    """Get a metric from METRICS
+
+    Parameters
+    ----------
+    name : str
+        Key of METRICS
+
+    Returns
+    -------
+    dict
+        Metric with keys 'func', 'column', 'aggregate', 'format'
+    """
+    if name not in METRICS:
+        raise KeyError(
+            "Unknown metric '%s', choose from: %s"
+            % (name, ", ".join(sorted(METRICS)))
+        )
+    return METRICS[name]
+
+
+def aggregate_metric(values, beam_mu, method):
+    """Combine beam metric values into one fraction group value
+
+    Parameters
+    ----------
+    values : list
+        Metric value for each beam
+    beam_mu : list
+        Monitor units for each beam
+    method : str
+        'sum', 'mu_weighted', or 'max'
+
+    Returns
+    -------
+    float
+        Combined metric value
+    """
+    if not len(values):
+        return 0.0
+    if method == "sum":
+        return float(np.sum(values))
+    if method == "max":
+        return float(np.max(values))
+    if method == "mu_weighted":
+        total = np.sum(beam_mu)
+        if total > 0:
+            return float(np.sum(np.multiply(values, beam_mu)) / total)
+        return 0.0
+    raise ValueError("Unknown aggregate method '%s'" % method)
+
+
+def get_open_leaves(beam):
+    """Get the leaf gaps of a beam and which leaf pairs are open in the jaws
+
+    Parameters
+    ----------
+    beam : Beam
+        A Beam with an MLC
+
+    Returns
+    -------
+    tuple
+        leaf gaps and open leaf pair mask, each of shape
+        (control point count, leaf pair count)
+    """
+    positions = beam.leaf_positions
+    boundaries = np.array(beam.leaf_boundaries, dtype=float)
+    jaws = beam.jaw_positions
+    # jaws perpendicular to leaf travel
+    lo, hi = (jaws[:, 2], jaws[:, 3])
+    if beam.leaf_type == "mlcy":
+        lo, hi = (jaws[:, 0], jaws[:, 1])
+
+    gaps = positions[:, 1] - positions[:, 0]
+    in_jaws = np.minimum(boundaries[1:], hi[:, np.newaxis]) > np.maximum(
+        boundaries[:-1], lo[:, np.newaxis]
+    )
+    return gaps, np.logical_and(in_jaws, gaps > 0)
+
+
+def _get_leaf_sequence_variability(positions, is_open):
+    """Leaf sequence variability of one MLC bank (McNiven et al)
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        Leaf positions of one bank, (control point count, leaf pair count)
+    is_open : np.ndarray
+        Open leaf pair mask from get_open_leaves
+
+    Returns
+    -------
+    np.ndarray
+        LSV for each control point, 1 if fewer than 2 adjacent open leaves
+    """
+    pos_max = np.where(is_open, positions, -np.inf).max(axis=1) - np.where(
+        is_open, positions, np.inf
+    ).min(axis=1)
+    pairs = np.logical_and(is_open[:, 1:], is_open[:, :-1])
+    pair_count = pairs.sum(axis=1)
+    diffs = np.abs(np.diff(positions, axis=1))
+    valid = np.logical_and(pair_count > 0, np.isfinite(pos_max))
+    valid = np.logical_and(valid, pos_max > 0)
+
+    lsv = np.ones(len(positions))
+    numerator = np.sum((pos_max[:, np.newaxis] - diffs) * pairs, axis=1)
+    lsv[valid] = numerator[valid] / (pair_count[valid] * pos_max[valid])
+    return lsv
+
+
+@register_metric("younge", "Younge Complexity")
+def younge_complexity(beam):
+    """Complexity score based on Younge et al (2012), see
+    Beam.younge_complexity_scores"""
+    return np.sum(beam.younge_complexity_scores)
+
+
+@register_metric("edge", "Edge Metric")
+def edge_metric(beam):
+    """Younge complexity counting only leaf-end edges, i.e., the aperture
+    perimeter perpendicular to leaf travel (Younge et al, 2016)"""
+    x_term, y_term = beam.younge_complexity_terms
+    if beam.leaf_type == "mlcx":
+        return y_term
+    if beam.leaf_type == "mlcy":
+        return x_term
+    return 0.0
+
+
+@register_metric("mcs", "Modulation Complexity Score", "mu_weighted")
+def modulation_complexity_score(beam):
+    """Modulation complexity score (McNiven et al, 2010), MU-weighted sum of
+    aperture area variability times leaf sequence variability"""
+    mu = np.array(beam.cp_mu, dtype=float)
+    if beam.leaf_type is None or np.sum(mu) <= 0:
+        return 0.0
+    gaps, is_open = get_open_leaves(beam)
+    positions = beam.leaf_positions
+    if not is_open.any():
+        return 0.0
+
+    # aperture area variability
+    bank_a, bank_b = positions[:, 0], positions[:, 1]
+    a_min = np.where(is_open, bank_a, np.inf).min(axis=0)
+    b_max = np.where(is_open, bank_b, -np.inf).max(axis=0)
+    used = is_open.any(axis=0)
+    aav = np.sum(np.where(is_open, gaps, 0), axis=1) / np.sum(
+        (b_max - a_min)[used]
+    )
+
+    lsv = _get_leaf_sequence_variability(
+        bank_a, is_open
+    ) * _get_leaf_sequence_variability(bank_b, is_open)
+
+    return np.sum(aav * lsv * mu) / np.sum(mu)
+
+
+def _small_aperture_score(threshold):
+    """Get a small aperture score function for a gap threshold"""
+
+    def small_aperture_score(beam):
+        """Fraction of open leaf pairs with a gap less than threshold (mm),
+        MU-weighted over control points (Crowe et al, 2014)"""
+        mu = np.array(beam.cp_mu, dtype=float)
+        if beam.leaf_type is None or np.sum(mu) <= 0:
+            return 0.0
+        gaps, is_open = get_open_leaves(beam)
+        open_count = is_open.sum(axis=1)
+        small_count = np.logical_and(is_open, gaps < threshold).sum(axis=1)
+        fraction = np.zeros(len(mu))
+        has_open = open_count > 0
+        fraction[has_open] = small_count[has_open] / open_count[has_open]
+        return np.sum(fraction * mu) / np.sum(mu)
+
+    return small_aperture_score
+
+
+for _threshold in [5, 10, 20]:
+    register_metric(
+        "sas_%s" % _threshold,
+        "Small Aperture Score (%s mm)" % _threshold,
+        "mu_weighted",
+    )(_small_aperture_score(_threshold))
+
+
+@register_metric("leaf_travel", "Leaf Travel (mm)", fmt="%0.1f")
+def leaf_travel(beam):
+    """Total distance travelled by all leaves"""
+    return np.sum(beam.leaf_travel)
+
+
+@register_metric("max_leaf_speed", "Max Leaf Speed (mm/s)", "max", "%0.1f")
+def max_leaf_speed(beam):
+    """Highest leaf speed of any segment with delivery time"""
+    speed = beam.max_leaf_speed
+    speed = speed[~np.isnan(speed)]
+    return np.max(speed) if len(speed) else 0.0
+
+
+@register_metric(
+    "mean_leaf_speed", "Mean Leaf Speed (mm/s)", "mu_weighted", "%0.2f"
+)
+def mean_leaf_speed(beam):
+    """Mean speed of all leaves over segments with delivery time"""
+    speed = beam.leaf_speed
+    speed = speed[~np.isnan(speed)]
+    return np.mean(speed) if len(speed) else 0.0
+
+
+@register_metric("leaf_speed_violations", "Leaf Speed Violations", fmt="%d")
+def leaf_speed_violations(beam):
+    """Number of segments exceeding the max_leaf_speed option"""
+    return beam.leaf_speed_violations
+
+
+@register_metric(
+    "mean_area", "Mean Aperture Area (mm^2)", "mu_weighted", fmt="%0.1f"
+)
+def mean_aperture_area(beam):
+    """Aperture area, MU-weighted over control points"""
+    mu = np.array(beam.cp_mu, dtype=float)
+    if np.sum(mu) <= 0:
+        return 0.0
+    return np.sum(np.multiply(beam.area, mu)) / np.sum(mu)
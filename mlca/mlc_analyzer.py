@@ -16,13 +16,28 @@ from pydicom.dataset import Dataset
 import numpy as np
 from shapely.geometry import Polygon
 from shapely import speedups
-from mlca.utilities import (
-    flatten_list_of_lists as flatten,
-    get_xy_path_lengths,
-    run_multiprocessing,
+from mlca.utilities import get_xy_path_lengths, run_multiprocessing
+from mlca.metrics import get_metric, aggregate_metric
+from mlca.geometry import (
+    get_aperture_metrics,
+    get_cp_values,
+    get_device_positions,
+    get_jaw_positions,
+    interpolate_control_points,
 )
+from mlca.fluence import get_fluence, get_pixel_edges
+from mlca.diff import diff_plans, diff_fx_groups, diff_beams
+from mlca.fingerprint import get_fingerprint, PlanIndex
+from mlca.similarity import get_plan_features
+from mlca.profiling import Profiler, get_profiler, set_profiler
+from mlca.memory import MemoryTracker, get_memory_tracker
+from mlca.counters import get_counters
+from mlca.events import get_emitter
+from mlca.results import ResultTable
+from mlca.aggregates import Aggregator
+from mlca.machines import get_machine_model
+import time
 from mlca.options import (
-    BEAM_MU_TOLERANCE,
     CONTROL_POINT_MU_TOLERANCE,
     CONTROL_POINT_POS_TOLERANCE,
     DEFAULT_OPTIONS,
@@ -46,6 +61,18 @@ COLUMNS = [
     "Complexity Score(s)",
     "File Name",
 ]
+# Types and CSV formats of COLUMNS, see mlca.results.ResultTable
+COLUMN_DTYPES = {
+    "TPS": "category",
+    "# of Fx Group(s)": "int",
+    "Fx Group #": "int",
+    "Fractions": "int",
+    "Plan MUs": "float",
+    "Beam Count(s)": "int",
+    "Control Point(s)": "int",
+    "Complexity Score(s)": "float",
+}
+COLUMN_FORMATS = {"Plan MUs": "%0.1f", "Complexity Score(s)": "%0.3f"}
 
 
 def get_options(over_rides):
@@ -67,7 +94,8 @@ def get_options(over_rides):
     options = {k: v for k, v in DEFAULT_OPTIONS.items()}
     for key, value in over_rides.items():
         if key in list(options):
-            options[key] = value
+            # command line args are strings
+            options[key] = type(options[key])(float(value))
     return options
 
 
@@ -84,50 +112,263 @@ class PlanSet:
     file_paths : list
         A list of file paths to DICOM-RT Plan files
     verbose : bool, optional
-        Set to true to print detailed information (ignored if
-        multiprocessing enabled)
+        Include the Plan in 'plan_finished' events, which
+        mlca.events.ConsoleReporter prints (ignored if multiprocessing
+        enabled)
     processes : int
-        Number of parallel processes allowed
+        Number of parallel processes allowed. Events (see mlca.events) of
+        each plan are emitted as its analysis completes.
+    weight_grid : list, optional
+        A list of (complexity_weight_x, complexity_weight_y) pairs. If
+        provided, a complexity score column is added for each pair
+    metrics : list, optional
+        Keys of mlca.metrics.METRICS, a column is added for each metric
+    skip_duplicates : bool, optional
+        Do not analyze plans with the same exact fingerprint as a previously
+        indexed plan, see PlanSet.index. With multiprocessing, every plan is
+        fingerprinted before analysis, so each analyzed plan is read from
+        disk twice
+    index_fingerprints : bool, optional
+        Add the fingerprint of each plan to PlanSet.index, e.g., to report
+        duplicates. Always True if ``skip_duplicates``, otherwise plans are
+        not fingerprinted and PlanSet.index stays empty
+    features : bool, optional
+        Collect mlca.similarity.get_plan_features for each plan in
+        PlanSet.features
+    database : mlca.database.ResultDatabase, optional
+        Also write result rows (and beam rows if database.beams) to this
+        database as each plan is analyzed
+    aggregator : mlca.aggregates.Aggregator, optional
+        Add the result rows of each plan to this aggregator
+    top_k : mlca.ranking.TopK, optional
+        Add the result rows of each plan to this ranking
+    keep_results : bool, optional
+        Keep result rows in PlanSet.results, set to False to keep memory
+        constant when only ``aggregator``, ``top_k``, or ``database`` is
+        needed
 
     """
 
-    def __init__(self, file_paths, verbose=False, processes=1, **kwargs):
+    def __init__(
+        self,
+        file_paths,
+        verbose=False,
+        processes=1,
+        weight_grid=None,
+        metrics=None,
+        skip_duplicates=False,
+        index_fingerprints=False,
+        features=False,
+        database=None,
+        aggregator=None,
+        top_k=None,
+        keep_results=True,
+        **kwargs
+    ):
         self.file_paths = file_paths
         self.verbose = verbose
         self.processes = processes
+        self.weight_grid = weight_grid
+        self.metrics = metrics if metrics is not None else []
+        self.skip_duplicates = skip_duplicates
+        # the index grows with each plan, only built if needed
+        self.index_fingerprints = skip_duplicates or index_fingerprints
+        self.collect_features = features
         self.kwargs = kwargs
-        self.summary_table = [COLUMNS]
-
+        self.index = PlanIndex()
+        self.features = []
+        self.results = self._get_result_table()
+        self.database = database
+        self.collect_beams = database is not None and database.beams
+        if database is not None:
+            database.prepare(self.columns, self.results.dtypes)
+        self.aggregator = aggregator
+        # workers aggregate into an empty Aggregator, merged by the parent
+        self.aggregate_config = (
+            aggregator.config if aggregator is not None else None
+        )
+        self.top_k = top_k
+        self.keep_results = keep_results
+        # workers have their own profiler and memory tracker, see
+        # PlanSet._index_worker
+        self.profile = get_profiler().enabled
+        self.track_memory = get_memory_tracker().enabled
+
+        emitter = get_emitter()
         if processes == 1:
             try:
                 self._run()
             except KeyboardInterrupt:
-                print("Plan analyzer halted!")
+                emitter.emit("plans_halted", total=len(self.file_paths))
+        else:
+            file_paths = self.file_paths
+            if skip_duplicates:
+                # workers cannot see each other's fingerprints, so index
+                # all plans before analysis, at the cost of reading each
+                # file again in PlanSet._index_worker
+                with get_profiler().stage("fingerprint"):
+                    data = run_multiprocessing(
+                        self._fingerprint_worker, file_paths, self.processes
+                    )
+                order = {f: i for i, f in enumerate(file_paths)}
+                for file_path, fingerprint in sorted(
+                    data, key=lambda d: order[d[0]]
+                ):
+                    if fingerprint is not None:
+                        self.index.add(file_path, fingerprint)
+                file_paths = []
+                for i, file_path in enumerate(self.file_paths):
+                    event = {
+                        "file_path": file_path,
+                        "index": i + 1,
+                        "total": len(self.file_paths),
+                    }
+                    original = self.index.get_duplicate_of(file_path)
+                    if file_path not in self.index:
+                        emitter.emit(
+                            "plan_failed", error="Could not be read", **event
+                        )
+                    elif original:
+                        emitter.emit(
+                            "plan_skipped", original=original, **event
+                        )
+                    else:
+                        file_paths.append(file_path)
+            run_multiprocessing(
+                self._index_worker,
+                file_paths,
+                self.processes,
+                on_result=self._add_result,
+            )
+        if database is not None:
+            database.flush()
+
+    def __getstate__(self):
+        # Bound worker methods are pickled for each task, workers only need
+        # the analysis options, not the accumulated results
+        state = self.__dict__.copy()
+        for key in [
+            "results",
+            "index",
+            "features",
+            "database",
+            "aggregator",
+            "top_k",
+        ]:
+            state.pop(key, None)
+        return state
+
+    def _add_rows(self, rows, beam_rows=None, plan_date=None):
+        """Add typed result rows to PlanSet.results, PlanSet.top_k, and
+        PlanSet.database"""
+        if self.keep_results:
+            self.results.extend(rows)
+        if self.top_k is not None:
+            self.top_k.add_rows(self.columns, rows)
+        if self.database is not None:
+            self.database.add_rows(rows, beam_rows, plan_date)
+
+    def _add_result(self, result, index, total):
+        """Accumulate a return of PlanSet._index_worker, emit its event
+
+        Parameters
+        ----------
+        result : dict
+            Output from PlanSet._index_worker
+        index : int
+            Number of completed plans, including this one
+        total : int
+            Number of plans being analyzed
+        """
+        emitter = get_emitter()
+        event = {
+            "file_path": result["file_path"],
+            "index": index,
+            "total": total,
+        }
+        if result["error"] is not None:
+            emitter.emit("plan_failed", error=result["error"], **event)
         else:
-            data = run_multiprocessing(
-                self._worker, self.file_paths, self.processes
+            emitter.emit(
+                "plan_finished",
+                wall_time=result["wall_time"],
+                stages=(
+                    result["profile"]["plans"][-1]["stages"]
+                    if result["profile"] is not None
+                    else None
+                ),
+                plan=None,
+                **event
             )
-            for row in data:
-                self.summary_table.extend(row)
+        if result["fingerprint"] is not None:
+            self.index.add(result["file_path"], result["fingerprint"])
+        self._add_rows(result["rows"], result["beams"], result["plan_date"])
+        self.features.extend(result["features"])
+        if result["aggregates"] is not None:
+            self.aggregator.merge(result["aggregates"])
+        if result["profile"] is not None:
+            get_profiler().merge(result["profile"])
+        if result["memory"] is not None:
+            get_memory_tracker().merge(result["memory"])
 
     def _run(self):
-        """Process files, accumulate data in self.summary_table"""
+        """Process files, accumulate data in self.results"""
         plan_count = len(self.file_paths)
+        profiler = get_profiler()
+        tracker = get_memory_tracker()
+        emitter = get_emitter()
         for i, file_path in enumerate(self.file_paths):
-            print("Analyzing (%s of %s): %s" % (i + 1, plan_count, file_path))
+            event = {
+                "file_path": file_path,
+                "index": i + 1,
+                "total": plan_count,
+            }
+            emitter.emit("plan_started", **event)
+            start = time.perf_counter()
             try:
-                plan = Plan(file_path, **self.kwargs)
-                for fx_grp_row in plan.summary:
-                    row = [fx_grp_row[key] for key in COLUMNS]
-                    self.summary_table.append(row)
-
-                if self.verbose:
-                    print(plan, "\n")
+                with profiler.plan(file_path), tracker.plan(
+                    file_path
+                ) as record:
+                    with profiler.stage("parse"):
+                        rt_plan = pydicom.read_file(file_path)
+                    original = None
+                    if self.index_fingerprints:
+                        with profiler.stage("fingerprint"):
+                            fingerprint = get_fingerprint(rt_plan)
+                        original = self.index.add(file_path, fingerprint)
+                    if original is not None and self.skip_duplicates:
+                        emitter.emit(
+                            "plan_skipped", original=original, **event
+                        )
+                        continue
+                    plan = Plan(rt_plan, **self.kwargs)
+                    record["cp_count"] = plan.cp_count
+                    rows = self._get_rows(plan)
+                    beam_rows = (
+                        self._get_beam_rows(plan)
+                        if self.collect_beams
+                        else None
+                    )
+                    self._add_rows(rows, beam_rows, plan.plan_date)
+                    if self.aggregator is not None:
+                        self.aggregator.add_plan(plan, self.columns, rows)
+                    if self.collect_features:
+                        self.features.extend(get_plan_features(plan))
             except Exception as e:
-                print("Analysis failed\n%s\n" % e)
+                emitter.emit("plan_failed", error=str(e), **event)
+                continue
+            emitter.emit(
+                "plan_finished",
+                wall_time=time.perf_counter() - start,
+                stages=(
+                    profiler.plans[-1]["stages"] if profiler.enabled else None
+                ),
+                plan=plan if self.verbose else None,
+                **event
+            )
 
-    def _worker(self, file_path):
-        """Multiprocessing worker
+    def _index_worker(self, file_path):
+        """Multiprocessing worker that also fingerprints the plan
 
         Parameters
         ----------
@@ -136,19 +377,225 @@ class PlanSet:
 
         Returns
         -------
-        list
-            Results from Plan.summary prepped for CSV output
+        dict
+            'file_path', 'fingerprint' (output from get_fingerprint, None if
+            the file could not be read, unless PlanSet.index_fingerprints,
+            or if PlanSet.skip_duplicates), 'rows' (typed result rows from
+            PlanSet._get_rows), 'beams' (rows from PlanSet._get_beam_rows,
+            empty unless PlanSet.collect_beams), 'plan_date'
+            (Plan.plan_date), 'features' (output from
+            get_plan_features, empty unless PlanSet.collect_features),
+            'aggregates' (Aggregator.to_dict of this plan, None unless
+            PlanSet.aggregator),
+            'error' (None unless the analysis failed), 'wall_time' (s),
+            'profile' (Profiler.to_dict, None unless PlanSet.profile), and
+            'memory' (MemoryTracker.to_dict, None unless
+            PlanSet.track_memory)
+        """
+        result = {
+            "file_path": file_path,
+            "fingerprint": None,
+            "rows": [],
+            "beams": [],
+            "plan_date": None,
+            "features": [],
+            "aggregates": None,
+            "profile": None,
+            "memory": None,
+            "error": None,
+            "wall_time": 0.0,
+        }
+        start = time.perf_counter()
+        profiler = Profiler(enabled=self.profile)
+        previous = set_profiler(profiler)
+        tracker = MemoryTracker(enabled=self.track_memory)
+        try:
+            with warnings.catch_warnings(), profiler.plan(
+                file_path
+            ), tracker.plan(file_path) as record:
+                warnings.simplefilter("ignore")
+                with profiler.stage("parse"):
+                    rt_plan = pydicom.read_file(file_path)
+                # already indexed by the skip_duplicates pre-pass
+                if self.index_fingerprints and not self.skip_duplicates:
+                    with profiler.stage("fingerprint"):
+                        result["fingerprint"] = get_fingerprint(rt_plan)
+                plan = Plan(rt_plan, **self.kwargs)
+                record["cp_count"] = plan.cp_count
+                result["rows"] = self._get_rows(plan)
+                result["plan_date"] = plan.plan_date
+                if self.collect_beams:
+                    result["beams"] = self._get_beam_rows(plan)
+                if self.aggregate_config is not None:
+                    aggregator = Aggregator(**self.aggregate_config)
+                    aggregator.add_plan(plan, self.columns, result["rows"])
+                    result["aggregates"] = aggregator.to_dict()
+                if self.collect_features:
+                    result["features"] = get_plan_features(plan)
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            set_profiler(previous)
+        result["wall_time"] = time.perf_counter() - start
+        if self.profile:
+            result["profile"] = profiler.to_dict()
+        if self.track_memory:
+            result["memory"] = tracker.to_dict()
+        return result
+
+    @staticmethod
+    def _fingerprint_worker(file_path):
+        """Multiprocessing worker for the fingerprint pre-pass
+
+        Parameters
+        ----------
+        file_path : str
+            file path of a DICOM-RT Plan file
+
+        Returns
+        -------
+        tuple
+            file_path, output from get_fingerprint (None if the file could
+            not be read)
         """
-        data = []
         try:
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                plan = Plan(file_path, **self.kwargs)
-            for fx_grp_row in plan.summary:
-                data.append([fx_grp_row[key] for key in COLUMNS])
+                return file_path, get_fingerprint(file_path)
         except Exception:
-            pass
-        return data
+            return file_path, None
+
+    def _get_rows(self, plan):
+        """Get the result rows of a plan
+
+        Parameters
+        ----------
+        plan : Plan
+            An analyzed plan
+
+        Returns
+        -------
+        list
+            Typed values from Plan.results for each fraction group, with a
+            score for each element of PlanSet.weight_grid and a value for
+            each element of PlanSet.metrics appended
+        """
+        rows = [
+            [fx_grp_row[key] for key in COLUMNS] for fx_grp_row in plan.results
+        ]
+        with get_profiler().stage("scoring"):
+            if self.weight_grid:
+                scores = plan.get_younge_complexity_scores(self.weight_grid)
+                for row, fx_grp_scores in zip(rows, scores):
+                    row.extend([float(score) for score in fx_grp_scores])
+            for name in self.metrics:
+                for row, value in zip(rows, plan.get_metric(name)):
+                    row.append(float(value))
+        return rows
+
+    @staticmethod
+    def _get_beam_rows(plan):
+        """Get the beam rows of a plan
+
+        Parameters
+        ----------
+        plan : Plan
+            An analyzed plan
+
+        Returns
+        -------
+        list
+            A value for each of mlca.database.BEAM_COLUMNS for each beam of
+            each fraction group
+        """
+        rows = []
+        for f, fx_grp in enumerate(plan.fx_group):
+            for b, beam in enumerate(fx_grp.beam):
+                rows.append(
+                    [
+                        plan.sop_instance_uid,
+                        f + 1,
+                        b + 1,
+                        beam.name,
+                        float(beam.meter_set),
+                        int(beam.cp_count),
+                        float(np.sum(beam.younge_complexity_scores)),
+                    ]
+                )
+        return rows
+
+    def _get_result_table(self):
+        """Get an empty result table with PlanSet.columns"""
+        dtypes = dict(COLUMN_DTYPES)
+        formats = dict(COLUMN_FORMATS)
+        for column in self.weight_grid_columns:
+            dtypes[column], formats[column] = "float", "%0.3f"
+        for name in self.metrics:
+            metric = get_metric(name)
+            dtypes[metric["column"]] = "float"
+            formats[metric["column"]] = metric["format"]
+        return ResultTable(self.columns, dtypes, formats)
+
+    @property
+    def columns(self):
+        """Get the column names of PlanSet.results
+
+        Returns
+        -------
+        list
+            COLUMNS, PlanSet.weight_grid_columns, and PlanSet.metric_columns
+        """
+        return COLUMNS + self.weight_grid_columns + self.metric_columns
+
+    @property
+    def summary_table(self):
+        """Get the results formatted for CSV output
+
+        Returns
+        -------
+        list
+            PlanSet.columns followed by a list of str for each fraction
+            group, see mlca.results.ResultTable.to_rows
+        """
+        return self.results.to_rows()
+
+    def get_results(self):
+        """Get the typed results as columns
+
+        Returns
+        -------
+        dict
+            A NumPy array (float64 MU and scores, int64 counts) or
+            mlca.results.Categorical (TPS) for each of PlanSet.columns
+        """
+        return self.results.to_columns()
+
+    @property
+    def weight_grid_columns(self):
+        """Get the column names for each element of PlanSet.weight_grid
+
+        Returns
+        -------
+        list
+            Column names of the form 'Complexity Score (x=c1, y=c2)'
+        """
+        if not self.weight_grid:
+            return []
+        return [
+            "Complexity Score (x=%g, y=%g)" % (float(c1), float(c2))
+            for c1, c2 in self.weight_grid
+        ]
+
+    @property
+    def metric_columns(self):
+        """Get the column names for each element of PlanSet.metrics
+
+        Returns
+        -------
+        list
+            The 'column' of each metric in mlca.metrics.METRICS
+        """
+        return [get_metric(name)["column"] for name in self.metrics]
 
 
 class Plan:
@@ -164,20 +611,28 @@ class Plan:
 
     def __init__(self, rt_plan, **kwargs):
 
+        profiler = get_profiler()
         if isinstance(rt_plan, Dataset):
-            self.rt_plan_file = "Unknown"
+            self.rt_plan_file = getattr(rt_plan, "filename", None)
+            if not isinstance(self.rt_plan_file, str):
+                self.rt_plan_file = "Unknown"
         else:
             self.rt_plan_file = rt_plan
-            rt_plan = pydicom.read_file(rt_plan)
+            with profiler.stage("parse"):
+                rt_plan = pydicom.read_file(rt_plan)
         self.rt_plan = rt_plan
 
         self.options = get_options(kwargs)
 
         beam_seq = rt_plan.BeamSequence
         fx_grp_seq = rt_plan.FractionGroupSequence
-        self.fx_group = [FxGroup(fx_grp, beam_seq) for fx_grp in fx_grp_seq]
+        self.fx_group = [
+            FxGroup(fx_grp, beam_seq, **self.options) for fx_grp in fx_grp_seq
+        ]
 
-        self.summary = [
+        with profiler.stage("scoring"):
+            scores = self.younge_complexity_scores
+        self.results = [
             {
                 "Patient Name": self.patient_name,
                 "Patient MRN": self.patient_id,
@@ -185,19 +640,33 @@ class Plan:
                 "SOP Instance UID": self.sop_instance_uid,
                 "TPS": self.tps,
                 "Plan name": self.plan_name,
-                "# of Fx Group(s)": str(len(self.fx_group)),
-                "Fx Group #": str(f + 1),
-                "Fractions": str(fx_grp.fxs),
-                "Plan MUs": "%0.1f" % fx_grp.fx_mu,
-                "Beam Count(s)": str(fx_grp.beam_count),
-                "Control Point(s)": str(sum(fx_grp.cp_counts)),
-                "Complexity Score(s)": "%0.3f"
-                % self.younge_complexity_scores[f],
+                "# of Fx Group(s)": len(self.fx_group),
+                "Fx Group #": f + 1,
+                "Fractions": int(fx_grp.fxs) if fx_grp.fxs.isdigit() else None,
+                "Plan MUs": float(fx_grp.fx_mu),
+                "Beam Count(s)": int(fx_grp.beam_count),
+                "Control Point(s)": int(sum(fx_grp.cp_counts)),
+                "Complexity Score(s)": float(scores[f]),
                 "File Name": self.rt_plan_file,
             }
             for f, fx_grp in enumerate(self.fx_group)
         ]
 
+    @property
+    def summary(self):
+        """Get Plan.results formatted for CSV output
+
+        Returns
+        -------
+        list
+            A dict of str for each fraction group, keyed by COLUMNS
+        """
+        table = ResultTable(COLUMNS, COLUMN_DTYPES, COLUMN_FORMATS)
+        return [
+            {c: table.format_value(c, row[c]) for c in COLUMNS}
+            for row in self.results
+        ]
+
     def __str__(self):
         summary = [
             "Patient Name:        %s" % self.patient_name,
@@ -235,25 +704,11 @@ class Plan:
         Returns
         -------
         bool
-            True if all properties and FxGrp comparisons are true
+            True if all properties and FxGrp comparisons are true, see
+            mlca.diff.diff_plans for a detailed report
 
         """
-
-        attr = [
-            "plan_name",
-            "patient_name",
-            "patient_id",
-            "study_instance_uid",
-            "sop_instance_uid",
-            "tps",
-        ]
-        if not all([getattr(self, a) == getattr(other, a) for a in attr]):
-            return False
-
-        for i, fx_group in enumerate(self.fx_group):
-            if not fx_group == other.fx_group[i]:
-                return False
-        return True
+        return diff_plans(self, other)["equal"]
 
     @property
     def plan_name(self):
@@ -324,6 +779,45 @@ class Plan:
             getattr(self.rt_plan, "ManufacturerModelName", ""),
         )
 
+    @property
+    def machine(self):
+        """Get the treatment machine name(s)
+
+        Returns
+        -------
+        str
+            Unique TreatmentMachineName (300A,00B2) of each beam, in order
+            of BeamSequence and joined by '/'
+        """
+        names = []
+        for beam in self.rt_plan.BeamSequence:
+            name = str(getattr(beam, "TreatmentMachineName", ""))
+            if name not in names:
+                names.append(name)
+        return "/".join(names)
+
+    @property
+    def plan_date(self):
+        """Get the plan date
+
+        Returns
+        -------
+        str
+            RTPlanDate (300A,0006)
+        """
+        return str(getattr(self.rt_plan, "RTPlanDate", ""))
+
+    @property
+    def cp_count(self):
+        """Get the number of control points of all fraction groups
+
+        Returns
+        -------
+        int
+            The sum of FxGroup.cp_counts for each fraction group
+        """
+        return int(sum(sum(fx_grp.cp_counts) for fx_grp in self.fx_group))
+
     @property
     def younge_complexity_scores(self):
         """Get the Younge complexity scores for each FxGroup
@@ -337,6 +831,41 @@ class Plan:
             float(fx_grp.younge_complexity_score) for fx_grp in self.fx_group
         ]
 
+    def get_metric(self, name):
+        """Calculate a complexity metric from mlca.metrics.METRICS
+
+        Parameters
+        ----------
+        name : str
+            A key of mlca.metrics.METRICS
+
+        Returns
+        -------
+        list
+            FxGroup.get_metric for each fraction group
+        """
+        return [fx_grp.get_metric(name) for fx_grp in self.fx_group]
+
+    def get_younge_complexity_scores(self, weights):
+        """Get the Younge complexity scores for many weight combinations
+
+        Parameters
+        ----------
+        weights : list
+            A list of (complexity_weight_x, complexity_weight_y) pairs
+
+        Returns
+        -------
+        np.ndarray
+            Score matrix of shape (number of FxGroups, number of weights)
+        """
+        return np.array(
+            [
+                fx_grp.get_younge_complexity_scores(weights)
+                for fx_grp in self.fx_group
+            ]
+        ).reshape(len(self.fx_group), -1)
+
 
 class FxGroup:
     """Collect fraction group information from fraction group and beam
@@ -368,8 +897,9 @@ class FxGroup:
         for beam in plan_beam_sequences:
             beam_num = str(beam.BeamNumber)
             if beam_num in meter_set:
-                self.beam.append(Beam(beam, meter_set[beam_num]))
-        self.update_missing_jaws()
+                self.beam.append(
+                    Beam(beam, meter_set[beam_num], **self.options)
+                )
 
     def __eq__(self, other):
         """Comparison of two FxGroup by comparing each beam
@@ -382,31 +912,10 @@ class FxGroup:
         Returns
         -------
         bool
-            True if all properties and Beam comparisons are true
+            True if all properties and Beam comparisons are true, see
+            mlca.diff.diff_fx_groups for a detailed report
         """
-
-        attr = [
-            "beam_count",
-            "beam_names",
-            "beam_mu",
-            "fx_mu",
-            "cp_counts",
-            "younge_complexity_score",
-        ]
-        if not all([getattr(self, a) == getattr(other, a) for a in attr]):
-            return False
-
-        for i, beam in enumerate(self.beam):
-            status_str = "beam %s\n\t%%s with other beam %s" % (
-                self.beam_names[i],
-                other.beam_names[i],
-            )
-            if not beam == other.beam[i]:
-                print(status_str % "failed")
-                return False
-            else:
-                print(status_str % "passed")
-        return True
+        return diff_fx_groups(self, other)["equal"]
 
     @property
     def beam_count(self):
@@ -478,18 +987,76 @@ class FxGroup:
             )
         )
 
-    def update_missing_jaws(self):
-        """In plans with static jaws, jaw positions may
-        not be found in each control point"""
-        for i, beam in enumerate(self.beam):
-            for j, cp in enumerate(beam.jaws):
-                if (
-                    cp["x_min"] == -self.options["max_field_size_x"] / 2
-                    and cp["x_max"] == self.options["max_field_size_x"] / 2
-                    and cp["y_min"] == -self.options["max_field_size_y"] / 2
-                    and cp["y_max"] == self.options["max_field_size_y"] / 2
-                ):
-                    beam.jaws[j] = beam.jaws[0]
+    @property
+    def younge_complexity_terms(self):
+        """Get the weight-independent x and y terms of the Younge complexity
+        score for this fraction
+
+        Returns
+        -------
+        np.ndarray
+            The sum of Beam.younge_complexity_terms for all beams
+        """
+        terms = np.array([0.0, 0.0])
+        for beam in self.beam:
+            terms = np.add(terms, beam.younge_complexity_terms)
+        return terms
+
+    def get_metric(self, name):
+        """Calculate a complexity metric from mlca.metrics.METRICS
+
+        Parameters
+        ----------
+        name : str
+            A key of mlca.metrics.METRICS
+
+        Returns
+        -------
+        float
+            Beam.get_metric for all beams, combined by the 'aggregate'
+            method of the metric (e.g., sum, MU-weighted mean)
+        """
+        metric = get_metric(name)
+        values = [beam.get_metric(name) for beam in self.beam]
+        return aggregate_metric(values, self.beam_mu, metric["aggregate"])
+
+    def get_younge_complexity_scores(self, weights):
+        """Get the Younge complexity score for many weight combinations
+        without recalculating aperture geometry
+
+        Parameters
+        ----------
+        weights : list
+            A list of (complexity_weight_x, complexity_weight_y) pairs
+
+        Returns
+        -------
+        np.ndarray
+            Complexity score for each pair in ``weights``
+        """
+        weights = np.array(weights, dtype=float).reshape(-1, 2)
+        return np.dot(weights, self.younge_complexity_terms)
+
+    def get_fluence(self, resolution=1.0):
+        """Get the MU-weighted fluence map of this fraction
+
+        Parameters
+        ----------
+        resolution : float, optional
+            Pixel width (mm)
+
+        Returns
+        -------
+        np.ndarray
+            The sum of Beam.get_fluence for all beams, in the beam's eye
+            view coordinates of each beam
+        """
+        x_edges = get_pixel_edges(self.options["max_field_size_x"], resolution)
+        y_edges = get_pixel_edges(self.options["max_field_size_y"], resolution)
+        fluence = np.zeros((len(y_edges) - 1, len(x_edges) - 1))
+        for beam in self.beam:
+            fluence += beam.get_fluence(resolution)
+        return fluence
 
 
 class Beam:
@@ -505,7 +1072,8 @@ class Beam:
         the monitor units for ``beam_dataset``
     ignore_zero_mu_cp : bool
         If True, skip over zero MU control points
-        (e.g., as in Step-N-Shoot beams)
+        (e.g., as in Step-N-Shoot beams). Apertures of these control points
+        are not calculated.
 
     """
 
@@ -517,28 +1085,69 @@ class Beam:
         self.ignore_zero_mu_cp = ignore_zero_mu_cp
         self.options = get_options(kwargs)
 
-        self.control_point = [
-            ControlPoint(cp, self.leaf_boundaries) for cp in self.cp_seq
-        ]
+        profiler = get_profiler()
+        with profiler.stage("geometry"):
+            self._set_device_positions()
+            self.machine_model = get_machine_model(
+                self._get_leaf_boundaries(),
+                machine_name=self.machine_name,
+                leaf_type=self.leaf_type,
+            )
+            geometry_mask = self._get_geometry_mask()
+            self.control_point = [
+                ControlPoint(
+                    cp,
+                    self.leaf_boundaries,
+                    geometry=geometry,
+                    machine_model=self.machine_model,
+                    positions={
+                        device_type: values[i]
+                        for device_type, values in self.device_positions.items()
+                    },
+                    **self.options
+                )
+                for i, (cp, geometry) in enumerate(
+                    zip(self.cp_seq, geometry_mask)
+                )
+            ]
+            get_counters().increment(
+                "apertures_skipped", int(np.sum(~geometry_mask))
+            )
 
-        self.summary = {
-            "cp": list(range(1, len(self.control_point) + 1)),
-            "cum_mu_frac": [cp.cum_mu for cp in self.control_point],
-            "cum_mu": self.cum_mu,
-            "cp_mu": self.cp_mu,
-            "gantry": self.gantry_angle,
-            "collimator": self.collimator_angle,
-            "couch": self.couch_angle,
-            "jaw_x1": [j["x_min"] for j in self.jaws],
-            "jaw_x2": [j["x_max"] for j in self.jaws],
-            "jaw_y1": [j["y_min"] for j in self.jaws],
-            "jaw_y2": [j["y_max"] for j in self.jaws],
-            "area": self.area,
-            "x_perim": self.perimeter_x,
-            "y_perim": self.perimeter_y,
-            "perim": self.perimeter,
-            "cmp_score": self.younge_complexity_scores.tolist(),
-        }
+        with profiler.stage("scoring"):
+            self.summary = {
+                "cp": list(range(1, len(self.control_point) + 1)),
+                "cum_mu_frac": [cp.cum_mu for cp in self.control_point],
+                "cum_mu": self.cum_mu,
+                "cp_mu": self.cp_mu,
+                "gantry": self.gantry_angle,
+                "collimator": self.collimator_angle,
+                "couch": self.couch_angle,
+                "jaw_x1": [j["x_min"] for j in self.jaws],
+                "jaw_x2": [j["x_max"] for j in self.jaws],
+                "jaw_y1": [j["y_min"] for j in self.jaws],
+                "jaw_y2": [j["y_max"] for j in self.jaws],
+                "area": self.area,
+                "x_perim": self.perimeter_x,
+                "y_perim": self.perimeter_y,
+                "perim": self.perimeter,
+                "cmp_score": self.younge_complexity_scores.tolist(),
+                "leaf_travel": self.max_leaf_travel.tolist(),
+                # None if the segment has no delivery time, for strict JSON
+                "leaf_speed": [
+                    None if np.isnan(speed) else speed
+                    for speed in self.max_leaf_speed.tolist()
+                ],
+            }
+            # None if the aperture was not calculated, not a closed aperture
+            if not np.all(geometry_mask):
+                for key in ["area", "x_perim", "y_perim", "perim"]:
+                    self.summary[key] = [
+                        value if has_geometry else None
+                        for value, has_geometry in zip(
+                            self.summary[key], geometry_mask
+                        )
+                    ]
 
         for key in self.summary:
             if len(self.summary[key]) == 1:
@@ -554,6 +1163,10 @@ class Beam:
                 self.summary[key] = [
                     self.summary[key][i] for i in non_zero_indices
                 ]
+            get_counters().increment(
+                "control_points_skipped",
+                len(self.summary["cp_mu"]) - len(non_zero_indices),
+            )
 
     def __eq__(self, other):
         """Compare ControlPoint classes in two beams
@@ -566,30 +1179,150 @@ class Beam:
         Returns
         -------
         bool
-            True if same meter_set values and each paired ControlPoint elements
-            evaluate as equal
+            True if same meter_set values and each paired control point has
+            the same MU, leaf, jaw, and angle values within tolerance, see
+            mlca.diff.diff_beams for a detailed report
         """
-        if (self.meter_set - other.meter_set) > BEAM_MU_TOLERANCE:
-            return False
-        for i, cp in enumerate(self.control_point):
-            if not cp == other.control_point[i]:
-                print("cp %s failed" % i)
-                return False
-        return True
+        return diff_beams(self, other)["equal"]
+
+    def _set_device_positions(self):
+        """Parse the LeafJawPositions (300A,011C) of every control point into
+        Beam.device_positions. Per DICOM, a device omitted from a control
+        point keeps the positions of the previous control point."""
+        self.device_positions = get_device_positions(self.cp_seq)
+
+    def _get_geometry_mask(self):
+        """Find the control points needing an aperture from the
+        CumulativeMetersetWeight (300A,0134) values alone, before any
+        geometry is built. Zero MU control points (e.g., the last control
+        point of every beam, beam-off leaf motion in Step-N-Shoot beams) do
+        not contribute to Beam.younge_complexity_scores.
+
+        Returns
+        -------
+        np.ndarray
+            True for each control point whose aperture is calculated. All
+            True unless ignore_zero_mu_cp or the 'skip_zero_mu_geometry'
+            option is set
+        """
+        if not (
+            self.ignore_zero_mu_cp or self.options["skip_zero_mu_geometry"]
+        ):
+            return np.ones(self.cp_count, dtype=bool)
+        weights = np.array(
+            [float(cp.CumulativeMetersetWeight) for cp in self.cp_seq]
+        )
+        return np.append(np.diff(weights), 0) != 0
 
     @property
-    def leaf_boundaries(self):
-        """Get the leaf boundaries
+    def geometry_mask(self):
+        """Control points with a calculated aperture
 
         Returns
         -------
-        DataSet
-            LeafPositionBoundaries (300A,00BE)
+        np.ndarray
+            ControlPoint.has_geometry for each control point
         """
+        return np.array([cp.has_geometry for cp in self.control_point])
+
+    def _get_leaf_boundaries(self):
+        """Search BeamLimitingDeviceSequence (300A,00B6) for
+        LeafPositionBoundaries (300A,00BE), used to get
+        Beam.machine_model"""
         for bld_seq in self.beam_dataset.BeamLimitingDeviceSequence:
             if hasattr(bld_seq, "LeafPositionBoundaries"):
                 return bld_seq.LeafPositionBoundaries
 
+    @property
+    def leaf_boundaries(self):
+        """Get the leaf boundaries
+
+        Returns
+        -------
+        np.ndarray, None
+            LeafPositionBoundaries (300A,00BE) of Beam.machine_model,
+            ``None`` if this beam has no MLC
+        """
+        if self.machine_model is not None:
+            return self.machine_model.boundaries
+
+    @property
+    def machine_name(self):
+        """Get the treatment machine name
+
+        Returns
+        -------
+        str, None
+            TreatmentMachineName (300A,00B2)
+        """
+        name = getattr(self.beam_dataset, "TreatmentMachineName", None)
+        return None if name is None else str(name)
+
+    @property
+    def leaf_type(self):
+        """Get the MLC orientation
+
+        Returns
+        -------
+        str, None
+            Returns 'mlcx', 'mlcy' or ``None``
+        """
+        for leaf_type in ["mlcx", "mlcy"]:
+            if leaf_type in self.device_positions:
+                return leaf_type
+
+    @property
+    def leaf_positions(self):
+        """Get the MLC positions of every control point
+
+        Returns
+        -------
+        np.ndarray, None
+            Array of shape (control point count, 2, leaf pair count), where
+            the second axis is the bank. Control points without leaf
+            positions use those of the previous control point. ``None`` if
+            this beam has no MLC
+        """
+        if self.leaf_type is None:
+            return None
+        return self.device_positions[self.leaf_type].reshape(
+            self.cp_count, 2, -1
+        )
+
+    @property
+    def jaw_positions(self):
+        """Get the jaw positions of every control point
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (control point count, 4), columns are x_min,
+            x_max, y_min, y_max. Control points without jaw positions use
+            those of the previous control point, or the max field size if
+            this beam has no jaws
+        """
+        return get_jaw_positions(
+            self.device_positions,
+            self.cp_count,
+            self.options["max_field_size_x"],
+            self.options["max_field_size_y"],
+        )
+
+    def get_metric(self, name):
+        """Calculate a complexity metric from mlca.metrics.METRICS
+
+        Parameters
+        ----------
+        name : str
+            A key of mlca.metrics.METRICS
+
+        Returns
+        -------
+        float
+            The metric value for this beam
+        """
+        return float(get_metric(name)["func"](self))
+
     @property
     def aperture(self):
         """Get aperture shapely object for every control point
@@ -666,7 +1399,7 @@ class Beam:
             ControlPoint.area for each control point
 
         """
-        return [cp.area for cp in self.aperture]
+        return [cp.area for cp in self.control_point]
 
     @property
     def cp_seq(self):
@@ -741,6 +1474,177 @@ class Beam:
             if hasattr(cp, "GantryAngle")
         ]
 
+    def _get_cp_values(self, keyword):
+        """Get a numeric value from every control point, a value not
+        specified in a control point is carried forward from the previous
+        control point
+
+        Parameters
+        ----------
+        keyword : str
+            DICOM keyword of a control point attribute (e.g., GantryAngle)
+
+        Returns
+        -------
+        np.ndarray
+            Value for each control point, 0 if never specified
+        """
+        return get_cp_values(self.cp_seq, keyword)
+
+    @property
+    def cp_gantry_angle(self):
+        """Gantry angle of every control point, an angle not specified in a
+        control point is carried forward from the previous control point
+
+        Returns
+        -------
+        np.ndarray
+            Gantry angle for each control point
+        """
+        return self._get_cp_values("GantryAngle")
+
+    @property
+    def cp_collimator_angle(self):
+        """Collimator angle of every control point, an angle not specified in
+        a control point is carried forward from the previous control point
+
+        Returns
+        -------
+        np.ndarray
+            BeamLimitingDeviceAngle for each control point
+        """
+        return self._get_cp_values("BeamLimitingDeviceAngle")
+
+    @property
+    def cp_couch_angle(self):
+        """Couch angle of every control point, an angle not specified in a
+        control point is carried forward from the previous control point
+
+        Returns
+        -------
+        np.ndarray
+            PatientSupportAngle for each control point
+        """
+        return self._get_cp_values("PatientSupportAngle")
+
+    @property
+    def cum_mu_frac(self):
+        """Cumulative meterset weight for each control point
+
+        Returns
+        -------
+        np.ndarray
+            ControlPoint.cum_mu for each control point
+        """
+        return np.array([cp.cum_mu for cp in self.control_point])
+
+    @property
+    def leaf_travel(self):
+        """Distance travelled by each leaf from the previous control point
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (control point count, leaf count), where leaf
+            count includes both banks. The first row is zero
+        """
+        positions = self.leaf_positions
+        if positions is None:
+            return np.zeros((self.cp_count, 0))
+        positions = positions.reshape(len(positions), -1)
+        travel = np.abs(np.diff(positions, axis=0))
+        return np.vstack([np.zeros((1, positions.shape[1])), travel])
+
+    @property
+    def max_leaf_travel(self):
+        """Maximum distance travelled by any leaf from the previous control
+        point
+
+        Returns
+        -------
+        np.ndarray
+            Maximum leaf travel (mm) for each control point
+        """
+        travel = self.leaf_travel
+        if not travel.shape[1]:
+            return np.zeros(len(travel))
+        return np.max(travel, axis=1)
+
+    @property
+    def segment_time(self):
+        """Estimated time to deliver the segment from the previous control
+        point, limited by the gantry speed and the dose rate
+
+        Returns
+        -------
+        np.ndarray
+            Time (s) for each control point, the first element is zero
+        """
+        gantry_travel = np.abs(np.diff(self.cp_gantry_angle))
+        gantry_travel = np.minimum(gantry_travel, 360.0 - gantry_travel)
+        gantry_time = gantry_travel / self.options["max_gantry_speed"]
+        mu_time = np.array(self.cp_mu[:-1]) / (
+            self.options["max_dose_rate"] / 60.0
+        )
+        return np.concatenate([[0.0], np.maximum(gantry_time, mu_time)])
+
+    @property
+    def leaf_speed(self):
+        """Speed of each leaf from the previous control point
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (control point count, leaf count) in mm/s. NaN
+            if the segment has no delivery time (e.g., beam-off leaf motion
+            in Step-N-Shoot beams)
+        """
+        travel = self.leaf_travel
+        time = self.segment_time[:, np.newaxis]
+        speed = np.full(travel.shape, np.nan)
+        np.divide(travel, time, out=speed, where=time > 0)
+        return speed
+
+    @property
+    def max_leaf_speed(self):
+        """Maximum speed of any leaf from the previous control point
+
+        Returns
+        -------
+        np.ndarray
+            Maximum leaf speed (mm/s) for each control point. NaN if the
+            segment has no delivery time
+        """
+        time = self.segment_time
+        speed = np.full(len(time), np.nan)
+        np.divide(self.max_leaf_travel, time, out=speed, where=time > 0)
+        return speed
+
+    @property
+    def leaf_speed_violations(self):
+        """Number of segments requiring a leaf speed above max_leaf_speed
+        with the gantry speed and dose rate limits
+
+        Returns
+        -------
+        int
+            Count of segments exceeding the leaf speed limit
+        """
+        speed = self.max_leaf_speed
+        limit = self.options["max_leaf_speed"] + CONTROL_POINT_POS_TOLERANCE
+        return int(np.sum(speed[~np.isnan(speed)] > limit))
+
+    @property
+    def is_deliverable(self):
+        """Check that leaf speeds are within max_leaf_speed
+
+        Returns
+        -------
+        bool
+            True if Beam.leaf_speed_violations is zero
+        """
+        return self.leaf_speed_violations == 0
+
     @property
     def collimator_angle(self):
         """Collimator angles for each control point
@@ -804,18 +1708,183 @@ class Beam:
             self.options["complexity_weight_y"],
         )
         if self.meter_set and self.meter_set > 0:
-            return (
-                np.divide(
-                    np.multiply(
-                        np.add(c1 * self.perimeter_x, c2 * self.perimeter_y),
-                        self.cp_mu,
-                    ),
-                    self.area,
-                )
-                / self.meter_set
+            if self.interpolation_steps > 1:
+                x_terms, y_terms = self._get_interpolated_complexity_terms()
+                return c1 * x_terms + c2 * y_terms
+            # control points without an aperture have no MU
+            scores = np.zeros(self.cp_count)
+            np.divide(
+                np.multiply(
+                    np.add(c1 * self.perimeter_x, c2 * self.perimeter_y),
+                    self.cp_mu,
+                ),
+                self.area,
+                out=scores,
+                where=self.geometry_mask,
             )
+            return scores / self.meter_set
         return np.array([0])
 
+    @property
+    def younge_complexity_terms(self):
+        """Weight-independent x and y terms of the Younge complexity score,
+        such that the sum of Beam.younge_complexity_scores is
+        c1 * x_term + c2 * y_term
+
+        Returns
+        -------
+        np.ndarray
+            Array of [x_term, y_term]
+        """
+        if self.meter_set and self.meter_set > 0:
+            if self.interpolation_steps > 1:
+                x_terms, y_terms = self._get_interpolated_complexity_terms()
+                return np.array([np.sum(x_terms), np.sum(y_terms)])
+            mu_per_area = np.zeros(self.cp_count)
+            np.divide(
+                self.cp_mu,
+                self.area,
+                out=mu_per_area,
+                where=self.geometry_mask,
+            )
+            mu_per_area = mu_per_area / self.meter_set
+            return np.array(
+                [
+                    np.sum(np.multiply(self.perimeter_x, mu_per_area)),
+                    np.sum(np.multiply(self.perimeter_y, mu_per_area)),
+                ]
+            )
+        return np.array([0.0, 0.0])
+
+    @property
+    def interpolation_steps(self):
+        """Number of apertures evaluated per control point interval
+
+        Returns
+        -------
+        int
+            The 'interpolation_steps' option, at least 1
+        """
+        return max(int(self.options["interpolation_steps"]), 1)
+
+    def get_interpolated_apertures(self, steps):
+        """Linearly interpolate leaf and jaw positions between control
+        points and calculate all aperture metrics in one batch
+
+        Parameters
+        ----------
+        steps : int
+            Number of sub-samples per control point interval
+
+        Returns
+        -------
+        dict
+            'mu', 'area', 'perimeter_x', and 'perimeter_y', each an
+            np.ndarray of length (control point count * steps). The MU of
+            a control point is split equally between its sub-samples
+        """
+        leaf_positions, jaw_positions, mu = self.get_interpolated_positions(
+            steps
+        )
+        apertures = get_aperture_metrics(
+            self.leaf_boundaries, leaf_positions, jaw_positions, self.leaf_type
+        )
+        apertures["mu"] = mu
+        return apertures
+
+    def get_interpolated_positions(self, steps):
+        """Linearly interpolate leaf and jaw positions between control points
+
+        Parameters
+        ----------
+        steps : int
+            Number of sub-samples per control point interval
+
+        Returns
+        -------
+        tuple
+            Beam.leaf_positions, Beam.jaw_positions, and Beam.cp_mu with
+            (control point count * steps) elements along the first axis.
+            The MU of a control point is split equally between its
+            sub-samples
+        """
+        leaf_positions = self.leaf_positions
+        if leaf_positions is not None:
+            leaf_positions = interpolate_control_points(leaf_positions, steps)
+        jaw_positions = interpolate_control_points(self.jaw_positions, steps)
+        mu = np.repeat(np.array(self.cp_mu) / steps, steps)
+        return leaf_positions, jaw_positions, mu
+
+    def get_fluence_edges(self, resolution=1.0):
+        """Get the pixel edges of the fluence grid
+
+        Parameters
+        ----------
+        resolution : float, optional
+            Pixel width (mm)
+
+        Returns
+        -------
+        tuple
+            x and y pixel edges (mm), spanning the max field size options
+        """
+        return (
+            get_pixel_edges(self.options["max_field_size_x"], resolution),
+            get_pixel_edges(self.options["max_field_size_y"], resolution),
+        )
+
+    def get_fluence(self, resolution=1.0):
+        """Get the MU-weighted fluence map of this beam, leaf and jaw
+        positions are interpolated if the 'interpolation_steps' option is
+        greater than 1
+
+        Parameters
+        ----------
+        resolution : float, optional
+            Pixel width (mm)
+
+        Returns
+        -------
+        np.ndarray
+            Fluence (MU) of shape (y pixel count, x pixel count), see
+            Beam.get_fluence_edges for pixel locations
+        """
+        leaf_positions, jaw_positions, mu = self.get_interpolated_positions(
+            self.interpolation_steps
+        )
+        x_edges, y_edges = self.get_fluence_edges(resolution)
+        return get_fluence(
+            self.leaf_boundaries,
+            leaf_positions,
+            jaw_positions,
+            self.leaf_type,
+            mu,
+            x_edges,
+            y_edges,
+        )
+
+    def _get_interpolated_complexity_terms(self):
+        """Get the x and y terms of the Younge complexity score for each
+        control point using Beam.get_interpolated_apertures"""
+        steps = self.interpolation_steps
+        apertures = self.get_interpolated_apertures(steps)
+        # sub-samples may have no area (e.g., leaves closing in transit),
+        # these have no perimeter and contribute nothing
+        mu_per_area = np.zeros(len(apertures["mu"]))
+        np.divide(
+            apertures["mu"],
+            apertures["area"],
+            out=mu_per_area,
+            where=np.logical_and(apertures["mu"] != 0, apertures["area"] > 0),
+        )
+        mu_per_area = mu_per_area / self.meter_set
+        x_terms = np.multiply(apertures["perimeter_x"], mu_per_area)
+        y_terms = np.multiply(apertures["perimeter_y"], mu_per_area)
+        return (
+            x_terms.reshape(-1, steps).sum(axis=1),
+            y_terms.reshape(-1, steps).sum(axis=1),
+        )
+
 
 class ControlPoint:
     """Collect control point information from a ControlPointSequence in a beam
@@ -827,18 +1896,56 @@ class ControlPoint:
         element of a ControlPointSequence (300A,0111)
     leaf_boundaries : Dataset
         LeafPositionBoundaries (300A,00BE)
+    geometry : bool, optional
+        If False, the aperture is not calculated (e.g., for zero MU control
+        points), the area and perimeter are zero so that they contribute
+        nothing to complexity scores, and Beam.summary reports them as
+        ``None``
+    positions : dict, optional
+        LeafJawPositions (300A,011C) of each RTBeamLimitingDeviceType
+        (300A,00B8) in lower case, used instead of those in ``cp_elem``,
+        e.g., carried forward from previous control points by Beam
+    machine_model : MachineModel, optional
+        Leaf geometry from mlca.machines.get_machine_model, e.g., shared by
+        every control point of a Beam. By default, it is looked up from
+        ``leaf_boundaries``
 
     """
 
-    def __init__(self, cp_elem, leaf_boundaries, **kwargs):
+    def __init__(
+        self,
+        cp_elem,
+        leaf_boundaries,
+        geometry=True,
+        positions=None,
+        machine_model=None,
+        **kwargs
+    ):
 
         self.cp_elem = cp_elem
         self.leaf_boundaries = leaf_boundaries
         self.options = get_options(kwargs)
+        self.has_geometry = geometry
 
-        self._set_leaf_jaw_type()
+        if positions is None:
+            self._set_leaf_jaw_type()
+        else:
+            for leaf_jaw_type, values in positions.items():
+                self._set_positions(leaf_jaw_type, values)
+
+        self.machine_model = machine_model
+        if machine_model is None:
+            self.machine_model = get_machine_model(
+                leaf_boundaries, leaf_type=self.leaf_type
+            )
 
-        self.path_lengths = get_xy_path_lengths(self.aperture)
+        if geometry:
+            aperture = self.aperture
+            self.path_lengths = get_xy_path_lengths(aperture)
+            self.area = aperture.area
+        else:
+            self.path_lengths = np.array([0.0, 0.0])
+            self.area = 0.0
 
     def _set_leaf_jaw_type(self):
         """Search for LeafJawPositions (300A,011C) assign
@@ -859,12 +1966,15 @@ class ControlPoint:
                     positions = np.array(
                         list(map(float, device_position_seq.LeafJawPositions))
                     )
-                    mid_index = int(len(positions) / 2)
-                    setattr(
-                        self,
-                        leaf_jaw_type,
-                        [positions[:mid_index], positions[mid_index:]],
-                    )
+                    self._set_positions(leaf_jaw_type, positions)
+
+    def _set_positions(self, leaf_jaw_type, positions):
+        """Assign ControlPoint.<leaf_jaw_type> as the two banks of an
+        np.ndarray of LeafJawPositions (300A,011C)"""
+        mid_index = int(len(positions) / 2)
+        setattr(
+            self, leaf_jaw_type, [positions[:mid_index], positions[mid_index:]]
+        )
 
     @property
     def cum_mu(self):
@@ -952,11 +2062,14 @@ class ControlPoint:
 
         if abs(self.cum_mu - other.cum_mu) > CONTROL_POINT_MU_TOLERANCE:
             return False
-        for side in [0, 1]:
-            for i, pos in enumerate(self.mlc[side]):
-                if abs(pos - other.mlc[side][i]) > CONTROL_POINT_POS_TOLERANCE:
-                    print(abs(pos - other.mlc[side][i]))
-        return True
+        if self.mlc is None or other.mlc is None:
+            return self.mlc is None and other.mlc is None
+        mlc, other_mlc = np.array(self.mlc), np.array(other.mlc)
+        if mlc.shape != other_mlc.shape:
+            return False
+        return bool(
+            np.all(np.abs(mlc - other_mlc) <= CONTROL_POINT_POS_TOLERANCE)
+        )
 
     @property
     def mlc_borders(self):
@@ -971,10 +2084,8 @@ class ControlPoint:
 
         """
         if self.mlc is not None:
-            top = self.leaf_boundaries[0:-1] + self.leaf_boundaries[0:-1]
-            top = [float(i) for i in top]
-            bottom = self.leaf_boundaries[1::] + self.leaf_boundaries[1::]
-            bottom = [float(i) for i in bottom]
+            top = list(self.machine_model.border_top)
+            bottom = list(self.machine_model.border_bottom)
             left = [-self.options["max_field_size_x"] / 2] * len(self.mlc[0])
             left.extend(self.mlc[1])
             right = self.mlc[0].tolist()
@@ -995,7 +2106,6 @@ class ControlPoint:
             (including MLC overlap)
 
         """
-        lb = self.leaf_boundaries
         mlc = self.mlc
 
         jaws = self.jaws
@@ -1005,31 +2115,25 @@ class ControlPoint:
             (jaws["x_max"], jaws["y_max"]),
             (jaws["x_max"], jaws["y_min"]),
         ]
-        jaw_shapely = Polygon(jaw_points)
+        counters = get_counters()
+        with counters.timer("polygons_built"):
+            jaw_shapely = Polygon(jaw_points)
 
-        if self.leaf_type == "mlcx":
-            a = flatten(
-                [[(m, lb[i]), (m, lb[i + 1])] for i, m in enumerate(mlc[0])]
-            )
-            b = flatten(
-                [[(m, lb[i]), (m, lb[i + 1])] for i, m in enumerate(mlc[1])]
-            )
-        elif self.leaf_type == "mlcy":
-            a = flatten(
-                [[(lb[i], m), (lb[i + 1], m)] for i, m in enumerate(mlc[0])]
-            )
-            b = flatten(
-                [[(lb[i], m), (lb[i + 1], m)] for i, m in enumerate(mlc[1])]
-            )
-        else:
+        if self.leaf_type not in {"mlcx", "mlcy"}:
             return jaw_shapely
 
-        mlc_points = a + b[::-1]  # concatenate a and reverse(b)
-        mlc_aperture = Polygon(mlc_points).buffer(0)
+        a = self.machine_model.get_bank_vertices(mlc[0])
+        b = self.machine_model.get_bank_vertices(mlc[1])
+        mlc_points = np.vstack([a, b[::-1]])  # concatenate a and reverse(b)
+        with counters.timer("polygons_built"):
+            mlc_aperture = Polygon(mlc_points)
+        with counters.timer("buffer_repairs"):
+            mlc_aperture = mlc_aperture.buffer(0)
 
         # This function is very slow, since jaws are rectangular, perhaps
         # there's a more efficient method?
-        aperture = mlc_aperture.intersection(jaw_shapely)
+        with counters.timer("intersections"):
+            aperture = mlc_aperture.intersection(jaw_shapely)
 
         return aperture
 
@@ -1050,7 +2154,7 @@ class ControlPoint:
         for dim in ["x", "y"]:
             half = self.options["max_field_size_%s" % dim] / 2.0
             values = getattr(self, "asym%s" % dim, [-half, half])
-            jaws["%s_min" % dim] = float(min(values))
-            jaws["%s_max" % dim] = float(max(values))
+            jaws["%s_min" % dim] = float(np.min(values))
+            jaws["%s_max" % dim] = float(np.max(values))
 
         return jaws
@@ -14,10 +14,25 @@ Misc options for dvha-mlca
 BEAM_MU_TOLERANCE = 0.001
 CONTROL_POINT_MU_TOLERANCE = 0.00001
 CONTROL_POINT_POS_TOLERANCE = 0.0001
+CONTROL_POINT_ANGLE_TOLERANCE = 0.01
+COMPLEXITY_SCORE_TOLERANCE = 0.001
+
+# Allowed fractional increase in the time per plan of a stage, see
+# mlca.verify
+STAGE_TIME_THRESHOLD = 0.25
+
+# Quantization of positions (mm), angles (deg), and MU for plan fingerprints
+FINGERPRINT_RESOLUTION = {"exact": 0.01, "coarse": 1.0}
 
 DEFAULT_OPTIONS = {
     "max_field_size_x": 400.0,
     "max_field_size_y": 400.0,
     "complexity_weight_x": 1.0,
     "complexity_weight_y": 1.0,
+    "max_leaf_speed": 25.0,  # mm/s
+    "max_gantry_speed": 6.0,  # deg/s
+    "max_dose_rate": 600.0,  # MU/min
+    "interpolation_steps": 1,
+    # build apertures only for control points delivering MU
+    "skip_zero_mu_geometry": False,
 }
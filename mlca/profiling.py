@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# profiling.py
+"""
+Wall and CPU time of each processing stage, with per-plan timings
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from contextlib import contextmanager
+import json
+from os.path import getsize
+import time
+
+
+# Stages in processing order, used to sort reports. pydicom decodes element
+# values on first access, so decoding is counted in the first stage that
+# reads them (usually fingerprint), not in parse.
+STAGES = [
+    "tree_walk",
+    "sniffing",
+    "parse",
+    "fingerprint",
+    "geometry",
+    "scoring",
+    "output",
+]
+
+
+class Profiler:
+    """Accumulate the wall and CPU time of named stages and of each plan.
+    Stages may be nested in a plan, but should not be nested in each other.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        If False, stage and plan are no-ops
+
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.plans = []
+
+    def _add(self, name, wall, cpu, count=1):
+        """Add time to a stage"""
+        stage = self.stages.setdefault(
+            name, {"count": 0, "wall_time": 0.0, "cpu_time": 0.0}
+        )
+        stage["count"] += count
+        stage["wall_time"] += wall
+        stage["cpu_time"] += cpu
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of code as a stage
+
+        Parameters
+        ----------
+        name : str
+            Stage name, preferably an element of STAGES
+        """
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self._add(
+                name,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+            )
+
+    @contextmanager
+    def plan(self, file_path):
+        """Time the processing of one plan, including its stages
+
+        Parameters
+        ----------
+        file_path : str
+            File path of the plan, its size is recorded as bytes read
+        """
+        if not self.enabled:
+            yield
+            return
+        before = {k: v["wall_time"] for k, v in self.stages.items()}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            try:
+                bytes_read = getsize(file_path)
+            except (OSError, TypeError):
+                bytes_read = 0
+            self.plans.append(
+                {
+                    "file_path": file_path,
+                    "bytes_read": bytes_read,
+                    "wall_time": wall,
+                    "cpu_time": cpu,
+                    "stages": {
+                        k: v["wall_time"] - before.get(k, 0.0)
+                        for k, v in self.stages.items()
+                        if v["wall_time"] != before.get(k, 0.0)
+                    },
+                }
+            )
+
+    def to_dict(self):
+        """Get the profile as a dict that can be saved as JSON
+
+        Returns
+        -------
+        dict
+            'stages' and 'plans'
+        """
+        return {
+            "stages": {k: dict(v) for k, v in self.stages.items()},
+            "plans": list(self.plans),
+        }
+
+    def merge(self, profile):
+        """Add a profile, e.g., from a worker process
+
+        Parameters
+        ----------
+        profile : dict
+            Output from Profiler.to_dict
+        """
+        for name, stage in profile["stages"].items():
+            self._add(
+                name, stage["wall_time"], stage["cpu_time"], stage["count"]
+            )
+        self.plans.extend(profile["plans"])
+
+    def reset(self):
+        """Clear all timings"""
+        self.stages = {}
+        self.plans = []
+
+    @property
+    def report(self):
+        """Get the profile summary with stages in STAGES order and
+        throughput
+
+        Returns
+        -------
+        dict
+            'stages', 'plan_count', 'bytes_read', 'plan_wall_time',
+            'plans_per_second', 'megabytes_per_second', and 'slowest_plans'
+        """
+        order = {name: i for i, name in enumerate(STAGES)}
+        names = sorted(
+            self.stages, key=lambda n: (order.get(n, len(STAGES)), n)
+        )
+        wall = sum(p["wall_time"] for p in self.plans)
+        bytes_read = sum(p["bytes_read"] for p in self.plans)
+        return {
+            "stages": {name: dict(self.stages[name]) for name in names},
+            "plan_count": len(self.plans),
+            "bytes_read": bytes_read,
+            "plan_wall_time": wall,
+            "plans_per_second": len(self.plans) / wall if wall else 0.0,
+            "megabytes_per_second": bytes_read / 1e6 / wall if wall else 0.0,
+            "slowest_plans": sorted(
+                self.plans, key=lambda p: p["wall_time"], reverse=True
+            )[:5],
+        }
+
+    def __str__(self):
+        report = self.report
+        total = sum(s["wall_time"] for s in report["stages"].values())
+        lines = [
+            "%-12s %8s %10s %10s %7s"
+            % ("Stage", "Count", "Wall (s)", "CPU (s)", "Wall %"),
+        ]
+        for name, stage in report["stages"].items():
+            lines.append(
+                "%-12s %8d %10.3f %10.3f %6.1f%%"
+                % (
+                    name,
+                    stage["count"],
+                    stage["wall_time"],
+                    stage["cpu_time"],
+                    100.0 * stage["wall_time"] / total if total else 0.0,
+                )
+            )
+        lines.append(
+            "\n%s plan(s), %0.1f MB read, %0.2f plans/s, %0.2f MB/s "
+            "(summed over processes)"
+            % (
+                report["plan_count"],
+                report["bytes_read"] / 1e6,
+                report["plans_per_second"],
+                report["megabytes_per_second"],
+            )
+        )
+        if report["slowest_plans"]:
+            lines.append("\nSlowest plan(s):")
+        for plan in report["slowest_plans"]:
+            slowest_stage = max(
+                plan["stages"], key=plan["stages"].get, default=""
+            )
+            lines.append(
+                "%8.3f s  %8.1f kB  %-9s %s"
+                % (
+                    plan["wall_time"],
+                    plan["bytes_read"] / 1e3,
+                    slowest_stage,
+                    plan["file_path"],
+                )
+            )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def save(self, file_path):
+        """Save Profiler.report and all plan timings to a JSON file
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the JSON file
+        """
+        data = self.report
+        data["plans"] = self.plans
+        with open(file_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+# Module level profiler, disabled unless enabled with set_profiler
+_PROFILER = Profiler(enabled=False)
+
+
+def get_profiler():
+    """Get the profiler used by mlca.main, PlanSet, Plan, and Beam
+
+    Returns
+    -------
+    Profiler
+        The current module level profiler
+    """
+    return _PROFILER
+
+
+def set_profiler(profiler):
+    """Set the profiler used by mlca.main, PlanSet, Plan, and Beam
+
+    Parameters
+    ----------
+    profiler : Profiler
+        The new module level profiler
+
+    Returns
+    -------
+    Profiler
+        The previous module level profiler
+    """
+    global _PROFILER
+    previous, _PROFILER = _PROFILER, profiler
+    return previous
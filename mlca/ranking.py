@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# ranking.py
+"""
+Keep only the most complex fraction groups of a PlanSet with a bounded heap
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import heapq
+
+
+# Ranking keys and their columns of PlanSet.results
+RANK_BY = {
+    "complexity": "Complexity Score(s)",
+    "mu": "Plan MUs",
+    "cp-count": "Control Point(s)",
+}
+# Columns of get_beam_detail_table preceding the Beam.summary keys
+BEAM_DETAIL_COLUMNS = [
+    "File Name",
+    "SOP Instance UID",
+    "Fx Group #",
+    "Beam #",
+    "Beam Name",
+]
+
+
+class TopK:
+    """The ``k`` result rows with the largest value of a column, in a
+    min-heap so each row is compared to the smallest winner only. Ties are
+    broken by file name and fraction group, so the winners do not depend on
+    the order rows are added.
+
+    Parameters
+    ----------
+    k : int
+        Number of rows to keep
+    by : str, optional
+        A key of RANK_BY
+
+    """
+
+    def __init__(self, k, by="complexity"):
+        if by not in RANK_BY:
+            raise KeyError(
+                "Unknown ranking '%s', choose from: %s"
+                % (by, ", ".join(RANK_BY))
+            )
+        self.k = int(k)
+        self.by = by
+        self.column = RANK_BY[by]
+        self.columns = None
+        self.heap = []
+        self.count = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _push(self, entry):
+        """Add a heap entry, drop the smallest if more than k"""
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif self.k and entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def add_rows(self, columns, rows):
+        """Add result rows
+
+        Parameters
+        ----------
+        columns : list
+            Column names of ``rows``, e.g., PlanSet.columns
+        rows : list
+            Typed result rows, e.g., from PlanSet._get_rows
+        """
+        if self.columns is None:
+            self.columns = list(columns)
+        index = columns.index(self.column)
+        file_index = columns.index("File Name")
+        fx_index = columns.index("Fx Group #")
+        for row in rows:
+            self.count += 1
+            self._push(
+                (
+                    row[index],
+                    str(row[file_index]),
+                    row[fx_index],
+                    list(row),
+                )
+            )
+
+    def merge(self, data):
+        """Add the winners of another TopK, e.g., from another process
+
+        Parameters
+        ----------
+        data : dict
+            Output from TopK.to_dict with the same ``by``
+        """
+        if data["by"] != self.by:
+            raise ValueError(
+                "Cannot merge rankings by %s and %s" % (self.by, data["by"])
+            )
+        if data["rows"]:
+            self.count += data["count"] - len(data["rows"])
+            self.add_rows(data["columns"], data["rows"])
+
+    def to_dict(self):
+        """Get the winners as a dict
+
+        Returns
+        -------
+        dict
+            'k', 'by', 'columns', 'count' (number of rows added), and 'rows'
+        """
+        return {
+            "k": self.k,
+            "by": self.by,
+            "columns": self.columns,
+            "count": self.count,
+            "rows": self.rows,
+        }
+
+    @property
+    def rows(self):
+        """Get the winning rows
+
+        Returns
+        -------
+        list
+            Result rows, in descending order of TopK.column
+        """
+        return [entry[-1] for entry in sorted(self.heap, reverse=True)]
+
+
+def get_beam_detail_table(rows, columns, **kwargs):
+    """Get Beam.summary of each beam of the fraction groups of result rows,
+    e.g., TopK.rows. Each plan is analyzed again, so control point data is
+    only kept for these plans.
+
+    Parameters
+    ----------
+    rows : list
+        Typed result rows, e.g., TopK.rows
+    columns : list
+        Column names of ``rows``
+    kwargs :
+        Options passed to Plan (e.g., ignore_zero_mu_cp), see
+        mlca.mlc_analyzer.get_options
+
+    Returns
+    -------
+    list
+        BEAM_DETAIL_COLUMNS and the keys of Beam.summary, followed by a row
+        for each control point of each beam, grouped by plan in order of
+        each plan's first row in ``rows``
+    """
+    # import here since mlca.utilities imports RANK_BY for the CLI
+    from mlca.mlc_analyzer import Plan
+
+    file_index = columns.index("File Name")
+    fx_index = columns.index("Fx Group #")
+    uid_index = columns.index("SOP Instance UID")
+    plan_rows = {}
+    for row in rows:
+        plan_rows.setdefault(row[file_index], []).append(row)
+    table = []
+    # one plan at a time, so memory is bounded by the largest plan
+    for file_path, rows in plan_rows.items():
+        plan = Plan(file_path, **kwargs)
+        for row in rows:
+            fx_group = plan.fx_group[row[fx_index] - 1]
+            for b, beam in enumerate(fx_group.beam):
+                keys = list(beam.summary)
+                if not table:
+                    table.append(BEAM_DETAIL_COLUMNS + keys)
+                prefix = [file_path, row[uid_index], row[fx_index], b + 1]
+                prefix.append(beam.name)
+                for values in zip(*[beam.summary[key] for key in keys]):
+                    table.append(
+                        prefix
+                        + [
+                            "" if value is None else str(value)
+                            for value in values
+                        ]
+                    )
+    return table
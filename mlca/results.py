@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# results.py
+"""
+Typed analysis results, formatted as strings only for CSV output
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+from collections import namedtuple
+import numpy as np
+
+
+DTYPES = ["str", "int", "float", "category"]
+# Formatted value of None (e.g., FxGroup.fxs if NumberOfFractionsPlanned is
+# missing), stored as -1 in int columns and NaN in float columns
+MISSING = "UNKNOWN"
+
+# A categorical column of ResultTable.to_columns, ``codes`` index into
+# ``categories``
+Categorical = namedtuple("Categorical", ["codes", "categories"])
+
+
+class ResultTable:
+    """Rows of typed values (int, float, or str), e.g., one row per
+    fraction group of each plan in a PlanSet
+
+    Parameters
+    ----------
+    columns : list
+        Column names
+    dtypes : dict, optional
+        An element of DTYPES for each column, default is 'str'
+    formats : dict, optional
+        String format (e.g., '%0.3f') for int or float columns, default is
+        str
+
+    """
+
+    def __init__(self, columns, dtypes=None, formats=None):
+        self.columns = list(columns)
+        dtypes = {} if dtypes is None else dtypes
+        formats = {} if formats is None else formats
+        self.dtypes = {c: dtypes.get(c, "str") for c in self.columns}
+        self.formats = {c: formats[c] for c in self.columns if c in formats}
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, row):
+        """Add a row
+
+        Parameters
+        ----------
+        row : list
+            A value for each column, in order of ResultTable.columns
+        """
+        self.rows.append(row)
+
+    def extend(self, rows):
+        """Add rows
+
+        Parameters
+        ----------
+        rows : list
+            A list of rows, see ResultTable.append
+        """
+        self.rows.extend(rows)
+
+    def format_value(self, column, value):
+        """Format a value for CSV output
+
+        Parameters
+        ----------
+        column : str
+            Column name
+        value : int, float, str, None
+            A value of ``column``
+
+        Returns
+        -------
+        str
+            ``value`` formatted with ResultTable.formats, MISSING if None
+        """
+        if value is None:
+            return MISSING
+        if column in self.formats:
+            return self.formats[column] % value
+        return str(value)
+
+    def to_rows(self):
+        """Get the header and formatted rows, e.g., for write_csv
+
+        Returns
+        -------
+        list
+            ResultTable.columns followed by each row as a list of str
+        """
+        format_value = self.format_value
+        columns = self.columns
+        return [list(columns)] + [
+            [format_value(c, v) for c, v in zip(columns, row)]
+            for row in self.rows
+        ]
+
+    def to_columns(self):
+        """Get each column as a NumPy array
+
+        Returns
+        -------
+        dict
+            An array for each column: float64 for 'float', int64 for 'int',
+            str for 'str', and Categorical (int32 codes, list of labels) for
+            'category' columns
+        """
+        values = list(zip(*self.rows)) or [()] * len(self.columns)
+        data = {}
+        for column, column_values in zip(self.columns, values):
+            dtype = self.dtypes[column]
+            if dtype == "float":
+                data[column] = np.array(
+                    [np.nan if v is None else v for v in column_values],
+                    dtype=np.float64,
+                )
+            elif dtype == "int":
+                data[column] = np.array(
+                    [-1 if v is None else v for v in column_values],
+                    dtype=np.int64,
+                )
+            elif dtype == "category":
+                categories = sorted({str(v) for v in column_values})
+                index = {label: i for i, label in enumerate(categories)}
+                codes = np.array(
+                    [index[str(v)] for v in column_values], dtype=np.int32
+                )
+                data[column] = Categorical(codes, categories)
+            else:
+                data[column] = np.array(
+                    [str(v) for v in column_values], dtype=str
+                )
+        return data
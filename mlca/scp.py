@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# scp.py
+"""
+DICOM Storage SCP that analyzes received RT Plans in memory, requires
+pynetdicom (pip install dvha-mlca[scp])
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import argparse
+from os.path import exists
+import signal
+import threading
+from mlca._lazy import LazyModule
+from mlca.events import ConsoleReporter, get_emitter
+from mlca.server import _analyze_worker, _init_worker, CACHE_SIZE
+from mlca.utilities import write_csv
+
+
+# imported on first use, see mlca._lazy
+multiprocessing = LazyModule("multiprocessing")
+
+
+DEFAULT_AE_TITLE = "MLCA"
+DEFAULT_PORT = 11112
+# DIMSE status of C-STORE responses
+STATUS_SUCCESS = 0x0000
+STATUS_CANNOT_UNDERSTAND = 0xC000
+
+
+def get_pynetdicom():
+    """Import pynetdicom
+
+    Returns
+    -------
+    module
+        pynetdicom
+
+    Raises
+    ------
+    ImportError
+        If pynetdicom is not installed
+    """
+    try:
+        import pynetdicom
+    except ImportError:
+        raise ImportError(
+            "The DICOM Storage SCP requires pynetdicom, install with: "
+            "pip install dvha-mlca[scp]"
+        )
+    return pynetdicom
+
+
+class StorageSCP:
+    """Accept C-STORE requests of RT Plans, analyze each received dataset
+    with Plan in a process pool, and append the result rows to a csv file.
+    Plans are never written to disk. C-STORE responses are sent once the
+    dataset is queued, so analysis never blocks an association.
+
+    Parameters
+    ----------
+    output_file : str
+        Results are appended to this csv file, with a header if new
+    ae_title : str, optional
+        AE title of this SCP
+    host : str, optional
+        Address to listen on, all interfaces by default
+    port : int, optional
+        Port to listen on
+    processes : int, optional
+        Number of worker processes
+    kwargs :
+        Options passed to Plan, see mlca.mlc_analyzer.get_options
+
+    """
+
+    def __init__(
+        self,
+        output_file,
+        ae_title=DEFAULT_AE_TITLE,
+        host="",
+        port=DEFAULT_PORT,
+        processes=1,
+        **kwargs
+    ):
+        self.output_file = output_file
+        self.ae_title = ae_title
+        self.host = host
+        self.port = port
+        self.processes = processes
+        self.options = kwargs
+        self.pool = None
+        self.server = None
+        self.received = 0
+        self.analyzed = 0
+        self.failed = 0
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def start(self):
+        """Start the process pool and the SCP in a background thread
+
+        Returns
+        -------
+        StorageSCP
+            self
+        """
+        pynetdicom = get_pynetdicom()
+        from pynetdicom.sop_class import RTPlanStorage, Verification
+
+        ae = pynetdicom.AE(ae_title=self.ae_title)
+        ae.add_supported_context(RTPlanStorage)
+        ae.add_supported_context(Verification)
+        self.start_pool()
+        self.server = ae.start_server(
+            (self.host, self.port),
+            block=False,
+            evt_handlers=[(pynetdicom.evt.EVT_C_STORE, self.handle_store)],
+        )
+        return self
+
+    def start_pool(self):
+        """Start the process pool, called by StorageSCP.start"""
+        self.pool = multiprocessing.Pool(
+            processes=self.processes,
+            initializer=_init_worker,
+            initargs=(CACHE_SIZE,),
+        )
+
+    def handle_store(self, event):
+        """Queue a received dataset for analysis, handler of EVT_C_STORE
+
+        Parameters
+        ----------
+        event : pynetdicom.events.Event
+            A C-STORE request event
+
+        Returns
+        -------
+        int
+            DIMSE status
+        """
+        try:
+            dataset = event.dataset
+            dataset.file_meta = event.file_meta
+        except Exception:
+            return STATUS_CANNOT_UNDERSTAND
+        calling_ae = event.assoc.requestor.ae_title
+        if isinstance(calling_ae, bytes):
+            calling_ae = calling_ae.decode()
+        file_name = "%s:%s" % (
+            calling_ae.strip(),
+            getattr(dataset, "SOPInstanceUID", "Unknown"),
+        )
+        self.submit(dataset, file_name)
+        return STATUS_SUCCESS
+
+    def submit(self, dataset, file_name):
+        """Queue a dataset for analysis
+
+        Parameters
+        ----------
+        dataset : pydicom.dataset.Dataset
+            An RT Plan dataset
+        file_name : str
+            File Name column of the results
+        """
+        with self._condition:
+            self.received += 1
+            self._pending += 1
+            index = self.received
+        request = {
+            "dataset": dataset,
+            "file_name": file_name,
+            "options": self.options,
+        }
+        self.pool.apply_async(
+            _analyze_worker,
+            (request,),
+            callback=lambda result: self._write_result(
+                result, file_name, index
+            ),
+            # e.g., the dataset could not be pickled
+            error_callback=lambda e: self._write_result(
+                {"error": str(e)}, file_name, index
+            ),
+        )
+
+    def _write_result(self, result, file_name, index):
+        """Append the rows of an analysis, emit its event"""
+        from mlca.mlc_analyzer import COLUMNS, COLUMN_DTYPES, COLUMN_FORMATS
+        from mlca.results import ResultTable
+
+        event = {"file_path": file_name, "index": index, "total": None}
+        with self._condition:
+            try:
+                if "error" in result:
+                    self.failed += 1
+                    get_emitter().emit(
+                        "plan_failed", error=result["error"], **event
+                    )
+                    return
+                table = ResultTable(COLUMNS, COLUMN_DTYPES, COLUMN_FORMATS)
+                table.extend(result["rows"])
+                rows = table.to_rows()
+                if exists(self.output_file):
+                    rows = rows[1:]
+                write_csv(self.output_file, rows, mode="a")
+                self.analyzed += 1
+                get_emitter().emit(
+                    "plan_finished",
+                    wall_time=None,
+                    stages=None,
+                    plan=None,
+                    **event
+                )
+            finally:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Wait until all received datasets are analyzed
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time (s) to wait
+
+        Returns
+        -------
+        bool
+            True if no analyses are pending
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._pending == 0, timeout
+            )
+
+    def shutdown(self):
+        """Stop accepting associations, finish pending analyses"""
+        if self.server is not None:
+            self.server.shutdown()
+        self.wait()
+        self.pool.close()
+        self.pool.join()
+
+
+def create_cmd_parser():
+    """Get an argument parser for mlca scp
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        argument parser
+    """
+    cmd_parser = argparse.ArgumentParser(
+        prog="mlca scp",
+        description="Receive RT Plans with a DICOM Storage SCP, analyze them "
+        "in memory, and append results to a csv file (requires pynetdicom)",
+    )
+    cmd_parser.add_argument(
+        "-of",
+        "--output-file",
+        dest="output_file",
+        help="Append results to this file",
+        required=True,
+    )
+    cmd_parser.add_argument(
+        "-a",
+        "--ae-title",
+        dest="ae_title",
+        help="AE title of this SCP: default = %s" % DEFAULT_AE_TITLE,
+        default=DEFAULT_AE_TITLE,
+    )
+    cmd_parser.add_argument(
+        "-H",
+        "--host",
+        dest="host",
+        help="Address to listen on: default is all interfaces",
+        default="",
+    )
+    cmd_parser.add_argument(
+        "-p",
+        "--port",
+        dest="port",
+        help="Port to listen on: default = %s" % DEFAULT_PORT,
+        default=DEFAULT_PORT,
+    )
+    cmd_parser.add_argument(
+        "-n",
+        "--processes",
+        dest="processes",
+        help="Number of worker processes",
+        default=1,
+    )
+    cmd_parser.add_argument(
+        "-q",
+        "--quiet",
+        dest="quiet",
+        help="Do not print each analyzed or failed plan",
+        default=False,
+        action="store_true",
+    )
+    return cmd_parser
+
+
+def main(args=None):
+    """Parse command-line args, receive plans until interrupted or SIGTERM
+
+    Parameters
+    ----------
+    args : list, optional
+        Command-line args after 'scp', by default sys.argv is used
+
+    Returns
+    -------
+    int
+        Exit code
+    """
+    kwargs = vars(create_cmd_parser().parse_args(args))
+    for key in ["port", "processes"]:
+        kwargs[key] = int(float(kwargs[key]))
+    if not kwargs.pop("quiet"):
+        get_emitter().subscribe(ConsoleReporter())
+    try:
+        scp = StorageSCP(**kwargs).start()
+    except ImportError as e:
+        print("mlca: error: %s" % e)
+        return 1
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    print(
+        "DVHA MLC Analyzer SCP %s listening on port %s"
+        % (scp.ae_title, scp.port)
+    )
+    try:
+        while not stopped.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    scp.shutdown()
+    print(
+        "DVHA MLC Analyzer SCP stopped, %s plan(s) analyzed, %s failed"
+        % (scp.analyzed, scp.failed)
+    )
+    return 0
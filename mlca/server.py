@@ -0,0 +1,611 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# server.py
+"""
+Local analysis daemon with a warm process pool, serving JSON over localhost
+HTTP or a Unix socket
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import argparse
+from collections import OrderedDict
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+import json
+import math
+import numbers
+from os import remove
+from os.path import exists
+import signal
+import socket
+import socketserver
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from mlca._version import __version__
+from mlca._lazy import LazyModule
+
+
+# imported on first use, see mlca._lazy
+multiprocessing = LazyModule("multiprocessing")
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8350
+# Analysis results kept by each worker process, keyed by plan fingerprint
+CACHE_SIZE = 128
+DICOM_CONTENT_TYPES = ["application/dicom", "application/octet-stream"]
+# socketserver.UnixStreamServer is only defined where AF_UNIX is, e.g., not
+# on Windows
+UNIX_SOCKETS_SUPPORTED = hasattr(socket, "AF_UNIX")
+
+# Results of recently analyzed plans in this worker process, see analyze
+_CACHE = OrderedDict()
+_CACHE_SIZE = CACHE_SIZE
+
+
+def _init_worker(cache_size):
+    """Import the analysis modules once per worker process"""
+    global _CACHE_SIZE
+    _CACHE_SIZE = cache_size
+    import mlca.mlc_analyzer  # noqa: F401
+
+
+def _clean(value):
+    """Convert NumPy scalars, NaN, and inf for strict JSON"""
+    if isinstance(value, dict):
+        return {key: _clean(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return value if math.isfinite(value) else None
+    return str(value)
+
+
+def get_beam_detail(plan):
+    """Get the summary and control point data of each beam of a plan
+
+    Parameters
+    ----------
+    plan : mlca.mlc_analyzer.Plan
+        An analyzed plan
+
+    Returns
+    -------
+    list
+        A dict for each beam of each fraction group with 'fx_group',
+        'beam', 'name', 'mu', 'cp_count', 'complexity_score', and
+        'control_points' (Beam.summary)
+    """
+    detail = []
+    for f, fx_group in enumerate(plan.fx_group):
+        for b, beam in enumerate(fx_group.beam):
+            detail.append(
+                {
+                    "fx_group": f + 1,
+                    "beam": b + 1,
+                    "name": beam.name,
+                    "mu": beam.meter_set,
+                    "cp_count": beam.cp_count,
+                    "complexity_score": sum(beam.younge_complexity_scores),
+                    "control_points": beam.summary,
+                }
+            )
+    return _clean(detail)
+
+
+def analyze(request):
+    """Analyze a plan of an analysis request. Results are cached by plan
+    fingerprint and options, up to CACHE_SIZE plans per process.
+
+    Parameters
+    ----------
+    request : dict
+        'file_path', 'data' (bytes of a DICOM-RT Plan file), or 'dataset'
+        (a pydicom Dataset), and optionally 'file_name' (File Name of
+        'data' or 'dataset'), 'beams' (bool, include
+        get_beam_detail), 'metrics' (keys of mlca.metrics.METRICS), and
+        'options' (see mlca.mlc_analyzer.get_options)
+
+    Returns
+    -------
+    dict
+        'columns', 'rows' (typed values for each fraction group), 'cached'
+        (bool), and 'beams' if requested
+    """
+    import pydicom
+    from mlca.mlc_analyzer import COLUMNS, Plan, get_options
+    from mlca.fingerprint import get_fingerprint
+    from mlca.metrics import get_metric
+
+    if request.get("dataset") is not None:
+        rt_plan = request["dataset"]
+        file_name = request.get("file_name") or "Unknown"
+    elif request.get("data") is not None:
+        rt_plan = pydicom.dcmread(BytesIO(request["data"]), force=True)
+        file_name = request.get("file_name") or "Unknown"
+        rt_plan.filename = file_name
+    elif request.get("file_path"):
+        file_name = request["file_path"]
+        rt_plan = pydicom.dcmread(file_name)
+    else:
+        raise ValueError("Request requires 'file_path' or DICOM data")
+
+    options = get_options(request.get("options") or {})
+    metrics = list(request.get("metrics") or [])
+    beams = bool(request.get("beams"))
+    fingerprint = get_fingerprint(rt_plan)
+    key = (
+        fingerprint["sop_instance_uid"],
+        fingerprint["exact"],
+        tuple(sorted(options.items())),
+        tuple(metrics),
+        beams,
+    )
+
+    cached = key in _CACHE
+    if cached:
+        _CACHE.move_to_end(key)
+        result = _CACHE[key]
+    else:
+        plan = Plan(rt_plan, **options)
+        columns = COLUMNS + [get_metric(name)["column"] for name in metrics]
+        rows = [[row[c] for c in COLUMNS] for row in plan.results]
+        for name in metrics:
+            for row, value in zip(rows, plan.get_metric(name)):
+                row.append(value)
+        result = {"columns": columns, "rows": _clean(rows)}
+        if beams:
+            result["beams"] = get_beam_detail(plan)
+        _CACHE[key] = result
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+
+    file_index = COLUMNS.index("File Name")
+    response = dict(result, cached=cached)
+    response["rows"] = [list(row) for row in result["rows"]]
+    for row in response["rows"]:
+        row[file_index] = file_name
+    return response
+
+
+def _analyze_worker(request):
+    """Pool worker, return analyze or an 'error'"""
+    try:
+        return analyze(request)
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """Handle each request in a thread, wait for them when closed"""
+
+    daemon_threads = False
+    block_on_close = True
+
+
+if UNIX_SOCKETS_SUPPORTED:
+
+    class _ThreadingUnixHTTPServer(
+        socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+    ):
+        """HTTP over a Unix socket, handle each request in a thread"""
+
+        daemon_threads = False
+        block_on_close = True
+
+
+def _check_socket_path(socket_path):
+    """Raise OSError if a Unix socket is requested but not supported"""
+    if socket_path is not None and not UNIX_SOCKETS_SUPPORTED:
+        raise OSError(
+            "Unix sockets are not supported on this platform, use a host "
+            "and port instead of %s" % socket_path
+        )
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Route requests to the AnalysisServer of the server"""
+
+    # protocol_version is left as HTTP/1.0, which closes each connection,
+    # so idle keep-alive connections cannot delay shutdown
+    server_version = "mlca/%s" % __version__
+
+    def address_string(self):
+        # Unix socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        if self.server.analysis_server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _send(self, status, data):
+        """Send a JSON response"""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send(200, self.server.analysis_server.status)
+        else:
+            self._send(404, {"error": "Unknown path %s" % self.path})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        analysis_server = self.server.analysis_server
+        if url.path == "/shutdown":
+            self._send(200, {"status": "shutting down"})
+            threading.Thread(target=analysis_server.shutdown).start()
+        elif url.path == "/analyze":
+            try:
+                request = self._get_request(url, body)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            result = analysis_server.submit(request)
+            self._send(422 if "error" in result else 200, result)
+        else:
+            self._send(404, {"error": "Unknown path %s" % self.path})
+
+    def _get_request(self, url, body):
+        """Get an analysis request from a JSON body, or from DICOM bytes
+        with query parameters"""
+        content_type = self.headers.get("Content-Type", "").split(";")[0]
+        if content_type in DICOM_CONTENT_TYPES:
+            query = parse_qs(url.query)
+            return {
+                "data": body,
+                "file_name": query.get("file_name", [None])[0],
+                "beams": query.get("beams", ["0"])[0] in {"1", "true"},
+                "metrics": [
+                    m for m in query.get("metrics", [""])[0].split(",") if m
+                ],
+            }
+        try:
+            request = json.loads(body.decode() or "{}")
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+        if not isinstance(request, dict) or not request.get("file_path"):
+            raise ValueError("Request requires 'file_path' or DICOM data")
+        request.pop("data", None)
+        return request
+
+
+class AnalysisServer:
+    """Serve analysis requests with a warm process pool. Requests are
+    handled concurrently, each in its own thread, and analyzed in the pool.
+
+    Endpoints: ``GET /health``, ``POST /analyze`` with a JSON body (see
+    analyze) or DICOM bytes (Content-Type application/dicom, with optional
+    file_name, beams, and metrics query parameters), and ``POST /shutdown``
+
+    Parameters
+    ----------
+    host : str, optional
+        Address to listen on, localhost by default
+    port : int, optional
+        Port to listen on, 0 for any free port
+    socket_path : str, optional
+        Listen on this Unix socket instead of host and port, requires
+        UNIX_SOCKETS_SUPPORTED
+    processes : int, optional
+        Number of worker processes
+    cache_size : int, optional
+        Number of results cached by each worker process
+    verbose : bool, optional
+        Log each request to stderr
+
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        socket_path=None,
+        processes=1,
+        cache_size=CACHE_SIZE,
+        verbose=False,
+    ):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.processes = processes
+        self.cache_size = cache_size
+        self.verbose = verbose
+        self.pool = None
+        self.server = None
+        self.requests = 0
+        self.active = 0
+        self.started = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the process pool and bind the server
+
+        Returns
+        -------
+        AnalysisServer
+            self
+
+        Raises
+        ------
+        OSError
+            If AnalysisServer.socket_path is set and Unix sockets are not
+            supported
+        """
+        _check_socket_path(self.socket_path)
+        self.pool = multiprocessing.Pool(
+            processes=self.processes,
+            initializer=_init_worker,
+            initargs=(self.cache_size,),
+        )
+        if self.socket_path is not None:
+            if exists(self.socket_path):
+                remove(self.socket_path)
+            self.server = _ThreadingUnixHTTPServer(
+                self.socket_path, _RequestHandler
+            )
+        else:
+            self.server = _ThreadingHTTPServer(
+                (self.host, self.port), _RequestHandler
+            )
+        self.server.analysis_server = self
+        self.started = time.time()
+        return self
+
+    @property
+    def address(self):
+        """Get the address the server is listening on
+
+        Returns
+        -------
+        str, tuple
+            Unix socket path, or (host, port)
+        """
+        if self.socket_path is not None:
+            return self.socket_path
+        return self.server.server_address[:2]
+
+    @property
+    def status(self):
+        """Get the server status
+
+        Returns
+        -------
+        dict
+            'status', 'version', 'processes', 'requests' (total), 'active'
+            requests, and 'uptime' (s)
+        """
+        return {
+            "status": "ok",
+            "version": __version__,
+            "processes": self.processes,
+            "requests": self.requests,
+            "active": self.active,
+            "uptime": time.time() - self.started,
+        }
+
+    def submit(self, request):
+        """Analyze a request in the process pool
+
+        Parameters
+        ----------
+        request : dict
+            See analyze
+
+        Returns
+        -------
+        dict
+            Output from analyze, or a dict with an 'error'
+        """
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+        try:
+            return self.pool.apply_async(_analyze_worker, (request,)).get()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def serve_forever(self):
+        """Handle requests until shutdown, then close"""
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """Stop serving, e.g., from another thread or a signal handler.
+        Requests in progress are completed by serve_forever"""
+        self.server.shutdown()
+
+    def close(self):
+        """Wait for requests in progress, stop the pool, remove the socket"""
+        self.server.server_close()
+        self.pool.close()
+        self.pool.join()
+        if self.socket_path is not None and exists(self.socket_path):
+            remove(self.socket_path)
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    """HTTPConnection over a Unix socket"""
+
+    def __init__(self, socket_path, timeout=None):
+        HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def send_request(
+    method,
+    path,
+    body=None,
+    content_type="application/json",
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    socket_path=None,
+    timeout=None,
+):
+    """Send a request to an AnalysisServer
+
+    Parameters
+    ----------
+    method : str
+        'GET' or 'POST'
+    path : str
+        e.g., '/analyze' or '/health'
+    body : dict, bytes, optional
+        A JSON request, or DICOM bytes
+    content_type : str, optional
+        Content-Type of bytes ``body``
+    host : str, optional
+        Server address
+    port : int, optional
+        Server port
+    socket_path : str, optional
+        Connect to this Unix socket instead of host and port, requires
+        UNIX_SOCKETS_SUPPORTED
+    timeout : float, optional
+        Socket timeout (s)
+
+    Returns
+    -------
+    tuple
+        HTTP status and the decoded JSON response
+    """
+    _check_socket_path(socket_path)
+    if socket_path is not None:
+        connection = _UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        connection = HTTPConnection(host, port, timeout=timeout)
+    headers = {}
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+    if body is not None:
+        headers["Content-Type"] = content_type
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode())
+    finally:
+        connection.close()
+
+
+def create_cmd_parser():
+    """Get an argument parser for mlca serve
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        argument parser
+    """
+    cmd_parser = argparse.ArgumentParser(
+        prog="mlca serve",
+        description="Run DVHA MLC Analyzer as a local daemon. POST JSON "
+        "{'file_path': ...} or DICOM bytes to /analyze, GET /health, "
+        "POST /shutdown",
+    )
+    cmd_parser.add_argument(
+        "-H",
+        "--host",
+        dest="host",
+        help="Address to listen on: default = %s" % DEFAULT_HOST,
+        default=DEFAULT_HOST,
+    )
+    cmd_parser.add_argument(
+        "-p",
+        "--port",
+        dest="port",
+        help="Port to listen on: default = %s" % DEFAULT_PORT,
+        default=DEFAULT_PORT,
+    )
+    cmd_parser.add_argument(
+        "-s",
+        "--socket",
+        dest="socket_path",
+        help="Listen on this Unix socket instead of --host and --port (not "
+        "supported on Windows)",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-n",
+        "--processes",
+        dest="processes",
+        help="Number of worker processes",
+        default=1,
+    )
+    cmd_parser.add_argument(
+        "-cs",
+        "--cache-size",
+        dest="cache_size",
+        help="Number of results cached by each worker process: default = %s"
+        % CACHE_SIZE,
+        default=CACHE_SIZE,
+    )
+    cmd_parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        help="Log each request",
+        default=False,
+        action="store_true",
+    )
+    return cmd_parser
+
+
+def main(args=None):
+    """Parse command-line args, serve until interrupted, SIGTERM, or a
+    shutdown request
+
+    Parameters
+    ----------
+    args : list, optional
+        Command-line args after 'serve', by default sys.argv is used
+
+    Returns
+    -------
+    int
+        Exit code
+    """
+    cmd_parser = create_cmd_parser()
+    kwargs = vars(cmd_parser.parse_args(args))
+    if kwargs["socket_path"] is not None and not UNIX_SOCKETS_SUPPORTED:
+        cmd_parser.error("--socket is not supported on this platform")
+    for key in ["port", "processes", "cache_size"]:
+        kwargs[key] = int(float(kwargs[key]))
+    server = AnalysisServer(**kwargs).start()
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    print("DVHA MLC Analyzer listening on: %s" % (server.address,))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("DVHA MLC Analyzer stopped")
+    return 0
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# similarity.py
+"""
+Aperture feature vectors and a nearest-neighbor index for plan similarity
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import numpy as np
+from os.path import isfile
+from mlca.diff import get_angle_deviation
+
+
+# Distributions of these Beam.summary keys are summarized by their
+# MU-weighted mean, standard deviation, and percentiles
+DISTRIBUTION_KEYS = ["area", "perim", "x_perim", "y_perim", "cmp_score"]
+PERCENTILES = [10, 50, 90]
+ANGLE_KEYS = ["gantry", "collimator", "couch"]
+
+
+def get_feature_names():
+    """Get the name of each element of a feature vector
+
+    Returns
+    -------
+    list
+        Feature names, in the order of get_fx_group_features
+    """
+    names = [
+        "beam_count",
+        "fx_mu",
+        "cp_count",
+        "complexity_score",
+        "gantry_travel",
+    ]
+    for key in ANGLE_KEYS:
+        names.extend(["%s_cos" % key, "%s_sin" % key])
+    for key in DISTRIBUTION_KEYS:
+        names.extend(["%s_mean" % key, "%s_std" % key])
+        names.extend(["%s_p%d" % (key, p) for p in PERCENTILES])
+    return names
+
+
+FEATURES = get_feature_names()
+
+
+def get_weighted_percentiles(values, weights, percentiles):
+    """Get percentiles of values with weights
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Sample values
+    weights : np.ndarray
+        Non-negative weight of each value, same length as ``values``
+    percentiles : list
+        Percentiles from 0 to 100
+
+    Returns
+    -------
+    np.ndarray
+        A value for each percentile
+    """
+    order = np.argsort(values)
+    values, weights = np.asarray(values)[order], np.asarray(weights)[order]
+    cum_weights = np.cumsum(weights) - 0.5 * weights
+    cum_weights /= np.sum(weights)
+    return np.interp(np.divide(percentiles, 100.0), cum_weights, values)
+
+
+def get_fx_group_features(fx_group):
+    """Get the feature vector of a fraction group from Beam.summary
+
+    Parameters
+    ----------
+    fx_group : FxGroup
+        An analyzed fraction group
+
+    Returns
+    -------
+    np.ndarray
+        A value for each name in FEATURES. Control point distributions
+        are weighted by MU, angles are MU-weighted circular means. Control
+        points without MU or without a calculated aperture (``None`` in
+        Beam.summary) are left out of the distributions
+    """
+    summary = {
+        key: (
+            np.concatenate(
+                [beam.summary[key] for beam in fx_group.beam]
+            ).astype(float)
+            if fx_group.beam
+            else np.zeros(0)
+        )
+        for key in DISTRIBUTION_KEYS + ANGLE_KEYS + ["cp_mu"]
+    }
+    weights = summary["cp_mu"]
+    if not len(weights):
+        return np.zeros(len(FEATURES))
+    if np.sum(weights) <= 0:
+        weights = np.ones(len(weights))
+
+    gantry_travel = 0.0
+    for beam in fx_group.beam:
+        gantry_travel += np.sum(
+            get_angle_deviation(
+                beam.summary["gantry"][1:], beam.summary["gantry"][:-1]
+            )
+        )
+
+    features = [
+        fx_group.beam_count,
+        fx_group.fx_mu,
+        sum(fx_group.cp_counts),
+        fx_group.younge_complexity_score,
+        gantry_travel,
+    ]
+    for key in ANGLE_KEYS:
+        radians = np.radians(summary[key])
+        features.append(np.average(np.cos(radians), weights=weights))
+        features.append(np.average(np.sin(radians), weights=weights))
+    for key in DISTRIBUTION_KEYS:
+        # control points without MU do not shift the percentiles
+        valid = np.logical_and(~np.isnan(summary[key]), weights > 0)
+        values, key_weights = summary[key][valid], weights[valid]
+        if not len(values):
+            features.extend([0.0] * (2 + len(PERCENTILES)))
+            continue
+        mean = np.average(values, weights=key_weights)
+        variance = np.average((values - mean) ** 2, weights=key_weights)
+        features.extend([mean, np.sqrt(variance)])
+        features.extend(
+            get_weighted_percentiles(values, key_weights, PERCENTILES)
+        )
+    return np.array(features, dtype=float)
+
+
+def get_plan_features(plan):
+    """Get the feature vector of each fraction group of a plan
+
+    Parameters
+    ----------
+    plan : Plan
+        An analyzed plan
+
+    Returns
+    -------
+    list
+        (key, label, features) for each fraction group, where key is
+        '<SOP Instance UID>/<fx group #>' and label is the plan file name
+    """
+    return [
+        (
+            "%s/%d" % (plan.sop_instance_uid, f + 1),
+            plan.rt_plan_file,
+            get_fx_group_features(fx_grp),
+        )
+        for f, fx_grp in enumerate(plan.fx_group)
+    ]
+
+
+class FeatureIndex:
+    """Nearest-neighbor index of feature vectors, persisted as a .npz file.
+    Features are standardized by the mean and standard deviation of the
+    indexed vectors, and neighbors are ranked by Euclidean distance.
+
+    Parameters
+    ----------
+    file_path : str, optional
+        Load this .npz file, if it exists
+
+    """
+
+    def __init__(self, file_path=None):
+        self.keys = []
+        self.labels = []
+        self._positions = {}
+        self._features = np.zeros((16, len(FEATURES)), dtype=np.float32)
+        self._scaled = None
+
+        if file_path is not None and isfile(file_path):
+            self.load(file_path)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    @property
+    def features(self):
+        """Get the indexed feature vectors
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (index length, feature count)
+        """
+        return self._features[: len(self.keys)]
+
+    def add(self, key, features, label=""):
+        """Insert or replace a feature vector
+
+        Parameters
+        ----------
+        key : str
+            Unique identifier, an existing vector with this key is replaced
+        features : np.ndarray
+            A value for each name in FEATURES
+        label : str, optional
+            Description returned with query results (e.g., file name)
+        """
+        if key in self._positions:
+            position = self._positions[key]
+            self.labels[position] = label
+        else:
+            position = len(self.keys)
+            if position == len(self._features):
+                # grow by doubling, so inserts are amortized constant time
+                self._features = np.vstack(
+                    [self._features, np.zeros_like(self._features)]
+                )
+            self._positions[key] = position
+            self.keys.append(key)
+            self.labels.append(label)
+        self._features[position] = features
+        self._scaled = None
+
+    def _get_scale(self):
+        """Get the mean and standard deviation of each feature"""
+        features = self.features.astype(float)
+        mean, std = np.mean(features, axis=0), np.std(features, axis=0)
+        std[std == 0] = 1.0
+        return mean, std
+
+    def query(self, features, k=20):
+        """Get the nearest neighbors of a feature vector
+
+        Parameters
+        ----------
+        features : np.ndarray
+            A value for each name in FEATURES
+        k : int, optional
+            Number of neighbors
+
+        Returns
+        -------
+        list
+            Dicts with keys 'key', 'label', and 'distance', nearest first
+        """
+        if not len(self):
+            return []
+        if self._scaled is None:
+            mean, std = self._get_scale()
+            self._scaled = (
+                ((self.features - mean) / std).astype(np.float32),
+                mean,
+                std,
+            )
+        scaled, mean, std = self._scaled
+        query = ((np.asarray(features, dtype=float) - mean) / std).astype(
+            np.float32
+        )
+        distances = np.sum((scaled - query) ** 2, axis=1)
+
+        k = min(int(k), len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [
+            {
+                "key": self.keys[i],
+                "label": self.labels[i],
+                "distance": float(np.sqrt(distances[i])),
+            }
+            for i in nearest
+        ]
+
+    def save(self, file_path):
+        """Save the index to a .npz file
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the .npz file
+        """
+        with open(file_path, "wb") as f:
+            np.savez(
+                f,
+                features=self.features,
+                keys=np.array(self.keys, dtype=str),
+                labels=np.array(self.labels, dtype=str),
+                feature_names=np.array(FEATURES, dtype=str),
+            )
+
+    def load(self, file_path):
+        """Load an index saved with FeatureIndex.save, replacing this index
+
+        Parameters
+        ----------
+        file_path : str
+            Path to the .npz file
+        """
+        with np.load(file_path, allow_pickle=False) as data:
+            if data["feature_names"].tolist() != FEATURES:
+                raise ValueError(
+                    "%s was saved with different features" % file_path
+                )
+            features = data["features"].astype(np.float32)
+            self.keys = data["keys"].tolist()
+            self.labels = data["labels"].tolist()
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+        self._features = np.vstack(
+            [features, np.zeros((max(16, len(features)), len(FEATURES)))]
+        ).astype(np.float32)
+        self._scaled = None
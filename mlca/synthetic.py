@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# synthetic.py
+"""
+Generate synthetic DICOM-RT Plan datasets for testing and benchmarking
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import numpy as np
+from os import makedirs
+from os.path import join
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import generate_uid, ImplicitVRLittleEndian
+
+
+RT_PLAN_STORAGE = "1.2.840.10008.5.1.4.1.1.481.5"
+JAW_BEHAVIORS = ["static", "dynamic", "none"]
+
+
+def get_leaf_boundaries(leaf_count, leaf_width=None):
+    """Get LeafPositionBoundaries centered on the isocenter
+
+    Parameters
+    ----------
+    leaf_count : int
+        Number of leaf pairs
+    leaf_width : float, optional
+        Leaf width (mm). By default, 10 mm for 40 or fewer leaf pairs,
+        otherwise 5 mm
+
+    Returns
+    -------
+    list
+        Leaf boundaries (mm), length is ``leaf_count`` + 1
+    """
+    if leaf_width is None:
+        leaf_width = 10.0 if leaf_count <= 40 else 5.0
+    half = leaf_count * leaf_width / 2.0
+    return np.linspace(-half, half, leaf_count + 1).tolist()
+
+
+def _get_device_positions(device_type, positions):
+    """Get an element of a BeamLimitingDevicePositionSequence"""
+    device = Dataset()
+    device.RTBeamLimitingDeviceType = device_type
+    device.LeafJawPositions = [round(float(p), 1) for p in positions]
+    return device
+
+
+def _get_leaf_positions(rng, cp_count, leaf_count, half_width, max_step):
+    """Get random leaf positions that move a limited distance per control
+    point
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (control point count, 2, leaf pair count)
+    """
+    centers = np.zeros((cp_count, leaf_count))
+    gaps = np.zeros((cp_count, leaf_count))
+    centers[0] = rng.uniform(-0.3, 0.3, leaf_count) * half_width
+    gaps[0] = rng.uniform(0.0, 0.5, leaf_count) * half_width
+    for i in range(1, cp_count):
+        centers[i] = centers[i - 1] + rng.uniform(-1, 1, leaf_count) * max_step
+        gaps[i] = gaps[i - 1] + rng.uniform(-1, 1, leaf_count) * max_step
+    centers = np.clip(centers, -0.5 * half_width, 0.5 * half_width)
+    gaps = np.clip(gaps, 0.0, half_width)
+    return np.stack([centers - gaps / 2.0, centers + gaps / 2.0], axis=1)
+
+
+def create_beam(
+    beam_number,
+    cp_count=10,
+    leaf_count=60,
+    leaf_type="mlcx",
+    jaws="static",
+    arc=False,
+    rng=None,
+):
+    """Create an element of a BeamSequence (300A,00B0)
+
+    Parameters
+    ----------
+    beam_number : int
+        BeamNumber (300A,00C0)
+    cp_count : int, optional
+        Number of control points, at least 2
+    leaf_count : int, optional
+        Number of leaf pairs
+    leaf_type : str, None, optional
+        'mlcx', 'mlcy', or ``None`` (jaws only)
+    jaws : str, optional
+        'static' (jaw positions in the first control point only), 'dynamic'
+        (jaws follow the MLC opening in every control point), or 'none'
+        (no jaws, ignored if ``leaf_type`` is ``None``)
+    arc : bool, optional
+        If True, rotate the gantry 360 degrees over the control points
+    rng : np.random.Generator, optional
+        Random number generator
+
+    Returns
+    -------
+    Dataset
+        A beam with BeamLimitingDeviceSequence and ControlPointSequence
+    """
+    if jaws not in JAW_BEHAVIORS:
+        raise ValueError("jaws must be one of: %s" % ", ".join(JAW_BEHAVIORS))
+    if leaf_type not in {"mlcx", "mlcy", None}:
+        raise ValueError("leaf_type must be 'mlcx', 'mlcy', or None")
+    rng = np.random.default_rng() if rng is None else rng
+    cp_count = max(int(cp_count), 2)
+    if leaf_type is None:
+        jaws = "static" if jaws == "none" else jaws
+
+    boundaries = get_leaf_boundaries(leaf_count)
+    half_width = min(boundaries[-1], 200.0)
+    positions = None
+    if leaf_type is not None:
+        max_step = 2.0 if arc else 10.0
+        positions = _get_leaf_positions(
+            rng, cp_count, leaf_count, half_width, max_step
+        )
+
+    # leaves travel along x for mlcx, so the x-jaws bound leaf positions
+    travel, across = ("X", "Y") if leaf_type != "mlcy" else ("Y", "X")
+    jaw_positions = np.tile(
+        [-half_width, half_width, boundaries[0], boundaries[-1]],
+        (cp_count, 1),
+    )
+    if positions is not None:
+        jaw_positions[:, 0] = np.min(positions[:, 0], axis=1) - 5.0
+        jaw_positions[:, 1] = np.max(positions[:, 1], axis=1) + 5.0
+        if jaws == "static":
+            jaw_positions[:, 0] = np.min(jaw_positions[:, 0])
+            jaw_positions[:, 1] = np.max(jaw_positions[:, 1])
+
+    beam = Dataset()
+    beam.BeamNumber = beam_number
+    beam.BeamName = "Beam %s" % beam_number
+    beam.BeamType = "DYNAMIC" if arc or cp_count > 2 else "STATIC"
+    beam.RadiationType = "PHOTON"
+    beam.TreatmentDeliveryType = "TREATMENT"
+    beam.TreatmentMachineName = "Synthetic"
+    beam.SourceAxisDistance = 1000.0
+    beam.FinalCumulativeMetersetWeight = 1.0
+    beam.NumberOfControlPoints = cp_count
+
+    device_types = []
+    if jaws != "none":
+        device_types.extend(["ASYM%s" % travel, "ASYM%s" % across])
+    if leaf_type is not None:
+        device_types.append(leaf_type.upper())
+    beam.BeamLimitingDeviceSequence = Sequence()
+    for device_type in device_types:
+        device = Dataset()
+        device.RTBeamLimitingDeviceType = device_type
+        if device_type.startswith("MLC"):
+            device.NumberOfLeafJawPairs = leaf_count
+            device.LeafPositionBoundaries = boundaries
+        else:
+            device.NumberOfLeafJawPairs = 1
+        beam.BeamLimitingDeviceSequence.append(device)
+
+    gantry = np.linspace(180.0, 540.0, cp_count) % 360 if arc else None
+    cum_mu = np.linspace(0.0, 1.0, cp_count)
+    beam.ControlPointSequence = Sequence()
+    for i in range(cp_count):
+        cp = Dataset()
+        cp.ControlPointIndex = i
+        cp.CumulativeMetersetWeight = round(float(cum_mu[i]), 6)
+        if i == 0 or arc:
+            cp.GantryAngle = float(gantry[i]) if arc else 0.0
+        if i == 0:
+            cp.BeamLimitingDeviceAngle = 0.0
+            cp.PatientSupportAngle = 0.0
+
+        cp.BeamLimitingDevicePositionSequence = Sequence()
+        if jaws == "dynamic" or (jaws == "static" and i == 0):
+            travel_jaws = jaw_positions[i, 0:2]
+            across_jaws = jaw_positions[i, 2:4]
+            for device_type, value in [
+                ("ASYM%s" % travel, travel_jaws),
+                ("ASYM%s" % across, across_jaws),
+            ]:
+                cp.BeamLimitingDevicePositionSequence.append(
+                    _get_device_positions(device_type, value)
+                )
+        if positions is not None:
+            cp.BeamLimitingDevicePositionSequence.append(
+                _get_device_positions(
+                    leaf_type.upper(), np.concatenate(positions[i])
+                )
+            )
+        beam.ControlPointSequence.append(cp)
+
+    return beam
+
+
+def create_rt_plan(
+    beam_count=1,
+    cp_count=10,
+    leaf_count=60,
+    leaf_type="mlcx",
+    jaws="static",
+    arc=False,
+    fx_group_count=1,
+    fractions=25,
+    mu=100.0,
+    seed=None,
+):
+    """Create a synthetic DICOM-RT Plan dataset
+
+    Parameters
+    ----------
+    beam_count : int, optional
+        Number of beams in each fraction group
+    cp_count : int, optional
+        Number of control points per beam
+    leaf_count : int, optional
+        Number of leaf pairs
+    leaf_type : str, None, optional
+        'mlcx', 'mlcy', or ``None`` (jaws only)
+    jaws : str, optional
+        'static', 'dynamic', or 'none', see create_beam
+    arc : bool, optional
+        If True, each beam is a 360 degree arc
+    fx_group_count : int, optional
+        Number of fraction groups, each with its own beams
+    fractions : int, optional
+        NumberOfFractionsPlanned (300A,0078) of each fraction group
+    mu : float, optional
+        BeamMeterset (300A,0086) of each beam
+    seed : int, optional
+        Seed for reproducible leaf positions
+
+    Returns
+    -------
+    FileDataset
+        An RT Plan that can be saved with ``save_as``
+    """
+    rng = np.random.default_rng(seed)
+
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = RT_PLAN_STORAGE
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    file_meta.TransferSyntaxUID = ImplicitVRLittleEndian
+
+    ds = FileDataset(None, {}, file_meta=file_meta, preamble=b"\0" * 128)
+    ds.is_little_endian = True
+    ds.is_implicit_VR = True
+    ds.SOPClassUID = RT_PLAN_STORAGE
+    ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    ds.Modality = "RTPLAN"
+    ds.Manufacturer = "DVHA-MLCA"
+    ds.ManufacturerModelName = "Synthetic"
+    ds.PatientName = "Synthetic^Plan"
+    ds.PatientID = "SYNTHETIC"
+    ds.RTPlanLabel = "Synthetic"
+    ds.RTPlanGeometry = "PATIENT"
+
+    ds.BeamSequence = Sequence()
+    ds.FractionGroupSequence = Sequence()
+    beam_number = 1
+    for f in range(fx_group_count):
+        fx_grp = Dataset()
+        fx_grp.FractionGroupNumber = f + 1
+        fx_grp.NumberOfFractionsPlanned = fractions
+        fx_grp.NumberOfBeams = beam_count
+        fx_grp.NumberOfBrachyApplicationSetups = 0
+        fx_grp.ReferencedBeamSequence = Sequence()
+        for b in range(beam_count):
+            ds.BeamSequence.append(
+                create_beam(
+                    beam_number,
+                    cp_count=cp_count,
+                    leaf_count=leaf_count,
+                    leaf_type=leaf_type,
+                    jaws=jaws,
+                    arc=arc,
+                    rng=rng,
+                )
+            )
+            ref_beam = Dataset()
+            ref_beam.ReferencedBeamNumber = beam_number
+            ref_beam.BeamMeterset = float(mu)
+            fx_grp.ReferencedBeamSequence.append(ref_beam)
+            beam_number += 1
+        ds.FractionGroupSequence.append(fx_grp)
+
+    return ds
+
+
+def write_corpus(
+    directory, plan_count, non_dicom_count=0, seed=None, **kwargs
+):
+    """Write synthetic DICOM-RT Plan files to a directory
+
+    Parameters
+    ----------
+    directory : str
+        Output directory, created if needed
+    plan_count : int
+        Number of RT Plan files
+    non_dicom_count : int, optional
+        Number of non-DICOM text files, to exercise DICOM file discovery
+    seed : int, optional
+        Seed for reproducible leaf positions, plan i uses seed + i
+    kwargs :
+        Keyword arguments passed to create_rt_plan
+
+    Returns
+    -------
+    list
+        File paths of the RT Plan files
+    """
+    makedirs(directory, exist_ok=True)
+    file_paths = []
+    for i in range(plan_count):
+        plan_seed = None if seed is None else seed + i
+        ds = create_rt_plan(seed=plan_seed, **kwargs)
+        file_path = join(directory, "rtplan_%05d.dcm" % i)
+        ds.save_as(file_path, write_like_original=False)
+        file_paths.append(file_path)
+    for i in range(non_dicom_count):
+        with open(join(directory, "notes_%05d.txt" % i), "w") as f:
+            f.write("not a DICOM file\n")
+    return file_paths
@@ -13,17 +13,24 @@ Utilities for DVHA-MLCA
 import argparse
 from datetime import datetime
 from mlca._version import __version__
-import numpy as np
-import pydicom
+from mlca._lazy import LazyModule
 from os import walk
 from os.path import join
 from mlca.options import DEFAULT_OPTIONS
-from multiprocessing import Pool
-from tqdm import tqdm
+from mlca.metrics import METRICS
+from mlca.ranking import RANK_BY
+from mlca.counters import get_counters
+from mlca.events import EventEmitter, get_emitter, set_emitter
 import warnings
 import csv
 
 
+# imported on first use, see mlca._lazy
+np = LazyModule("numpy")
+pydicom = LazyModule("pydicom")
+multiprocessing = LazyModule("multiprocessing")
+
+
 def get_xy_path_lengths(shapely_object):
     """Get the x and y path lengths of a Shapely object
 
@@ -40,9 +47,10 @@ def get_xy_path_lengths(shapely_object):
     """
     path = np.array([0.0, 0.0])
     if shapely_object.type == "GeometryCollection":
-        for geometry in shapely_object.geoms:
-            if geometry.type in {"MultiPolygon", "Polygon"}:
-                path = np.add(path, get_xy_path_lengths(geometry))
+        with get_counters().timer("geometry_collection_fallbacks"):
+            for geometry in shapely_object.geoms:
+                if geometry.type in {"MultiPolygon", "Polygon"}:
+                    path = np.add(path, get_xy_path_lengths(geometry))
     elif shapely_object.type == "MultiPolygon":
         for shape in shapely_object:
             path = np.add(path, get_xy_path_lengths(shape))
@@ -124,7 +132,7 @@ def is_file_dicom(file_path, modality=None, verbose=False):
     modality : str, optional
         Return False if file is not this Modality (0008,0060)
     verbose : bool, optional
-        Print results to terminal
+        Emit a 'file_sniffed' event (see mlca.events)
 
     Returns
     -------
@@ -133,25 +141,38 @@ def is_file_dicom(file_path, modality=None, verbose=False):
         SOPClassUID (0008,0016) is not found
 
     """
+    counters = get_counters()
+    with counters.timer("files_sniffed"):
+        is_dicom = _sniff_dicom(file_path, modality, verbose)
+    if not is_dicom:
+        counters.increment("files_rejected")
+    return is_dicom
+
+
+def _sniff_dicom(file_path, modality, verbose):
+    """Check a file for is_file_dicom, see is_file_dicom for parameters"""
     kwargs = {"stop_before_pixels": True, "force": True}
+    is_dicom, error = False, None
     try:
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             ds = pydicom.read_file(file_path, **kwargs)
         # Assuming SOPClassUID is a required tag
         if modality is None and "SOPClassUID" in ds:
-            if verbose:
-                print("DICOM File Found: %s" % file_path)
-            return True
-        if ds.Modality.upper() == modality.upper():
-            if verbose:
-                print("DICOM %s File Found: %s" % (modality, file_path))
-            return True
+            is_dicom = True
+        elif ds.Modality.upper() == modality.upper():
+            is_dicom = True
     except Exception as e:
-        if verbose:
-            print("Non-DICOM File Found: %s" % file_path)
-            print(str(e))
-    return False
+        error = str(e)
+    if verbose:
+        get_emitter().emit(
+            "file_sniffed",
+            file_path=file_path,
+            is_dicom=is_dicom,
+            modality=modality,
+            error=error,
+        )
+    return is_dicom
 
 
 def get_dicom_files(file_paths, modality=None, verbose=False, processes=1):
@@ -164,7 +185,8 @@ def get_dicom_files(file_paths, modality=None, verbose=False, processes=1):
     modality : str, optional
         Specify Modality (0008,0060)
     verbose : bool, optional
-        Print results to terminal
+        Emit a 'file_sniffed' event for each file (see mlca.events),
+        ignored if multiprocessing
     processes : int
         Number of processes for multiprocessing.
 
@@ -188,7 +210,7 @@ def _get_dicom_files_worker(args):
     return args[0] if is_file_dicom(*args) else None
 
 
-def run_multiprocessing(worker, queue, processes):
+def run_multiprocessing(worker, queue, processes, on_result=None):
     """Parallel processing
 
     Parameters
@@ -199,26 +221,48 @@ def run_multiprocessing(worker, queue, processes):
         A list of arguments for worker
     processes : int
         Number of processes for multiprocessing.Pool
+    on_result : callable, optional
+        Called in the parent process with each return from worker, the
+        number of completed tasks, and the total number of tasks, as each
+        task completes
 
     Returns
     -------
     list
-        List of returns from worker
+        List of returns from worker, in order of completion. A 'progress'
+        event (see mlca.events) is emitted as each task completes.
 
     """
-    progress_kwargs = {
-        "total": len(queue),
-        "bar_format": "{desc:<5.5}{percentage:3.0f}%|{bar:30}{r_bar}",
-    }
     data = []
-    with Pool(processes=processes) as pool:
-        with tqdm(**progress_kwargs) as pbar:
-            for item in pool.imap_unordered(worker, queue):
-                data.append(item)
-                pbar.update()
+    counters = get_counters()
+    emitter = get_emitter()
+    total = len(queue)
+    queue = [(worker, item) for item in queue]
+    emitter.emit("progress", done=0, total=total)
+    with multiprocessing.Pool(processes=processes) as pool:
+        for item, worker_counters in pool.imap_unordered(
+            _counted_worker, queue
+        ):
+            data.append(item)
+            counters.merge(worker_counters)
+            if on_result is not None:
+                on_result(item, len(data), total)
+            emitter.emit("progress", done=len(data), total=total)
     return data
 
 
+def _counted_worker(args):
+    """Call a run_multiprocessing worker, return its result with the
+    counters of this task (see mlca.counters). Events are only emitted
+    by the parent process, so workers use a silent emitter."""
+    worker, item = args
+    counters = get_counters()
+    counters.reset()
+    if get_emitter().callbacks:
+        set_emitter(EventEmitter())
+    return worker(item), counters.to_dict()
+
+
 def create_cmd_parser():
     """Get an argument parser for mlca.main
 
@@ -260,6 +304,22 @@ def create_cmd_parser():
         % DEFAULT_OPTIONS["complexity_weight_y"],
         default=DEFAULT_OPTIONS["complexity_weight_y"],
     )
+    cmd_parser.add_argument(
+        "-wg",
+        "--weight-grid",
+        dest="weight_grid",
+        help="CSV file of complexity coefficient pairs (x, y), one pair per "
+        "row. A complexity score column is added for each pair",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-m",
+        "--metrics",
+        dest="metrics",
+        help="Comma-separated list of additional complexity metrics, a "
+        "column is added for each. Options: %s" % ", ".join(sorted(METRICS)),
+        default=None,
+    )
     cmd_parser.add_argument(
         "-xs",
         "--x-max-field-size",
@@ -276,6 +336,195 @@ def create_cmd_parser():
         % DEFAULT_OPTIONS["max_field_size_y"],
         default=DEFAULT_OPTIONS["max_field_size_y"],
     )
+    cmd_parser.add_argument(
+        "-ls",
+        "--max-leaf-speed",
+        dest="max_leaf_speed",
+        help="Maximum leaf speed for deliverability checks: "
+        "default = %0.1f (mm/s)" % DEFAULT_OPTIONS["max_leaf_speed"],
+        default=DEFAULT_OPTIONS["max_leaf_speed"],
+    )
+    cmd_parser.add_argument(
+        "-gs",
+        "--max-gantry-speed",
+        dest="max_gantry_speed",
+        help="Maximum gantry speed for deliverability checks: "
+        "default = %0.1f (deg/s)" % DEFAULT_OPTIONS["max_gantry_speed"],
+        default=DEFAULT_OPTIONS["max_gantry_speed"],
+    )
+    cmd_parser.add_argument(
+        "-dr",
+        "--max-dose-rate",
+        dest="max_dose_rate",
+        help="Maximum dose rate for deliverability checks: "
+        "default = %0.1f (MU/min)" % DEFAULT_OPTIONS["max_dose_rate"],
+        default=DEFAULT_OPTIONS["max_dose_rate"],
+    )
+    cmd_parser.add_argument(
+        "-is",
+        "--interpolation-steps",
+        dest="interpolation_steps",
+        help="Evaluate complexity with leaf and jaw positions interpolated "
+        "onto this many apertures per control point interval: default = %d"
+        % DEFAULT_OPTIONS["interpolation_steps"],
+        default=DEFAULT_OPTIONS["interpolation_steps"],
+    )
+    cmd_parser.add_argument(
+        "-sg",
+        "--skip-zero-mu-geometry",
+        dest="skip_zero_mu_geometry",
+        help="Only calculate apertures of control points delivering MU, "
+        "area and perimeter of other control points are not reported",
+        default=DEFAULT_OPTIONS["skip_zero_mu_geometry"],
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-sd",
+        "--skip-duplicates",
+        dest="skip_duplicates",
+        help="Do not analyze plans with the same leaf, jaw, and MU values as "
+        "a previously analyzed plan of the same patient (or with the same "
+        "SOP Instance UID)",
+        default=False,
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-df",
+        "--duplicates-file",
+        dest="duplicates_file",
+        help="Save plan fingerprints with duplicates and near-duplicate "
+        "clusters to this csv file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-fi",
+        "--feature-index",
+        dest="feature_index",
+        help="Add aperture feature vectors of analyzed plans to this .npz "
+        "file, created if it does not exist",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-st",
+        "--similar-to",
+        dest="similar_to",
+        help="Print the plans in the feature index most similar to this "
+        "DICOM-RT Plan file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-k",
+        "--neighbors",
+        dest="neighbors",
+        help="Number of similar plans to print: default = 20",
+        default=20,
+    )
+    cmd_parser.add_argument(
+        "-pr",
+        "--profile",
+        dest="profile",
+        help="Print wall and CPU time of each stage and the slowest plans",
+        default=False,
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-pf",
+        "--profile-file",
+        dest="profile_file",
+        help="Save stage and per-plan timings to this JSON file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-mr",
+        "--memory-report",
+        dest="memory_report",
+        help="Track the peak memory of each plan and save a report sorted "
+        "by memory and control point count to this file (slower)",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-ag",
+        "--aggregates",
+        dest="aggregates",
+        help="Save the count, mean, standard deviation, and approximate "
+        "quantiles of MU, complexity score, and control point count to "
+        "this file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-gb",
+        "--group-by",
+        dest="group_by",
+        help="Comma-separated fields to group --aggregates by, choose "
+        "from: machine, month, plan_name, tps",
+        default="tps",
+    )
+    cmd_parser.add_argument(
+        "-pn",
+        "--plan-name-pattern",
+        dest="plan_name_pattern",
+        help="Regular expression, group plan names by the first match "
+        "(or its first group) for --group-by plan_name",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-ao",
+        "--aggregate-only",
+        dest="aggregate_only",
+        help="Do not keep or save result rows, memory is constant for "
+        "any number of plans (requires --aggregates)",
+        default=False,
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-tk",
+        "--top-k",
+        dest="top_k",
+        help="Only keep and save the N fraction groups ranked highest by "
+        "--by",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-by",
+        "--by",
+        dest="rank_by",
+        help="Ranking for --top-k, choose from: %s (default: complexity)"
+        % ", ".join(RANK_BY),
+        choices=list(RANK_BY),
+        default="complexity",
+    )
+    cmd_parser.add_argument(
+        "-bd",
+        "--beam-details",
+        dest="beam_details",
+        help="Save the control point data of each beam of the --top-k "
+        "fraction groups to this file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-db",
+        "--database",
+        dest="database",
+        help="Also write results to this SQLite database, updating rows of "
+        "previously analyzed plans",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-bs",
+        "--beam-summaries",
+        dest="beam_summaries",
+        help="Also write a row for each beam to --database",
+        default=False,
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-cf",
+        "--counters-file",
+        dest="counters_file",
+        help="Write geometry and file counters to this file in the "
+        "Prometheus text format",
+        default=None,
+    )
     cmd_parser.add_argument(
         "-ver",
         "--version",
@@ -292,6 +541,14 @@ def create_cmd_parser():
         default=False,
         action="store_true",
     )
+    cmd_parser.add_argument(
+        "-q",
+        "--quiet",
+        dest="quiet",
+        help="Do not print progress of each plan or progress bars",
+        default=False,
+        action="store_true",
+    )
     cmd_parser.add_argument(
         "-n",
         "--processes",
@@ -338,3 +595,56 @@ def write_csv(file_path, rows, mode="w", newline=""):
             f, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL
         )
         writer.writerows(rows)
+
+
+def read_csv(file_path):
+    """Read all rows of a csv file, e.g., from write_csv
+
+    Parameters
+    ----------
+    file_path : str
+        path to file
+
+    Returns
+    -------
+    list
+        Each row as a list of str
+    """
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+def read_weight_grid(file_path):
+    """Read complexity weight pairs from a csv file
+
+    Parameters
+    ----------
+    file_path : str
+        path to a csv file with two columns (x-weight, y-weight), with an
+        optional header row. Blank rows are ignored
+
+    Returns
+    -------
+    list
+        A list of (complexity_weight_x, complexity_weight_y) tuples
+
+    Raises
+    ------
+    ValueError
+        If a row other than the header cannot be converted to two floats
+    """
+    weight_grid = []
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        for line_num, row in enumerate(csv.reader(f), 1):
+            if not any(value.strip() for value in row):
+                continue
+            try:
+                weight_grid.append((float(row[0]), float(row[1])))
+            except (IndexError, ValueError):
+                if line_num == 1:  # header
+                    continue
+                raise ValueError(
+                    "Invalid weight pair on line %s of %s: %s"
+                    % (line_num, file_path, ",".join(row))
+                )
+    return weight_grid
@@ -0,0 +1,644 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# verify.py
+"""
+Rerun analysis of a baseline results file, report score deviations and
+stage timing regressions (mlca verify)
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import argparse
+import json
+import math
+import re
+from mlca.mlc_analyzer import PlanSet, COLUMNS
+from mlca.metrics import METRICS
+from mlca.options import (
+    BEAM_MU_TOLERANCE,
+    COMPLEXITY_SCORE_TOLERANCE,
+    DEFAULT_OPTIONS,
+    STAGE_TIME_THRESHOLD,
+)
+from mlca.results import MISSING
+from mlca.profiling import Profiler, set_profiler
+from mlca.events import ConsoleReporter, get_emitter
+from mlca.utilities import (
+    get_file_paths,
+    get_dicom_files,
+    read_csv,
+    write_csv,
+)
+
+
+# Exit codes of mlca verify, 2 is used by argparse for usage errors
+EXIT_PASSED = 0
+EXIT_DEVIATIONS = 1
+EXIT_TIMING = 3
+EXIT_ERROR = 4
+
+# Rows are matched on these columns
+KEY_COLUMNS = ["SOP Instance UID", "Fx Group #"]
+# Columns that may differ, e.g., if the archive moved
+IGNORED_COLUMNS = ["File Name"]
+# Numeric columns that must match exactly, other numeric columns are
+# compared with the 'score' tolerance
+COUNT_COLUMNS = [
+    "# of Fx Group(s)",
+    "Fractions",
+    "Beam Count(s)",
+    "Control Point(s)",
+]
+MU_COLUMNS = ["Plan MUs"]
+
+DEVIATION_COLUMNS = [
+    "SOP Instance UID",
+    "Fx Group #",
+    "Column",
+    "Baseline",
+    "Value",
+    "Deviation",
+]
+
+# Stages with less baseline time than this (s) are too noisy to compare
+MIN_STAGE_TIME = 0.01
+
+
+def get_tolerances(over_rides=None):
+    """Get verification tolerances
+
+    Parameters
+    ----------
+    over_rides : dict, optional
+        Over rides, keys may be 'meter_set' or 'score'
+
+    Returns
+    -------
+    dict
+        Absolute tolerances for MU and score columns
+    """
+    tolerances = {
+        "meter_set": BEAM_MU_TOLERANCE,
+        "score": COMPLEXITY_SCORE_TOLERANCE,
+    }
+    if over_rides:
+        for key, value in over_rides.items():
+            if key in tolerances and value is not None:
+                tolerances[key] = float(value)
+    return tolerances
+
+
+def get_analysis_options(header):
+    """Get the PlanSet options that produced a results table, other
+    options (e.g., complexity_weight_x) are not in the table and must be
+    passed to verify
+
+    Parameters
+    ----------
+    header : list
+        Column names of a PlanSet.summary_table
+
+    Returns
+    -------
+    dict
+        'weight_grid' and 'metrics' for PlanSet
+    """
+    pattern = re.compile(r"Complexity Score \(x=(.+), y=(.+)\)$")
+    metric_names = {m["column"]: name for name, m in METRICS.items()}
+    weight_grid, metrics = [], []
+    for column in header[len(COLUMNS) :]:
+        match = pattern.match(column)
+        if match:
+            weight_grid.append((float(match[1]), float(match[2])))
+        elif column in metric_names:
+            metrics.append(metric_names[column])
+    return {"weight_grid": weight_grid or None, "metrics": metrics}
+
+
+def _get_rows_by_key(table):
+    """Get the rows of a results table keyed by KEY_COLUMNS values, more
+    than one row per key if a plan is in the table more than once (e.g.,
+    copied under two file names)"""
+    header = table[0]
+    indices = [header.index(column) for column in KEY_COLUMNS]
+    rows = {}
+    for row in table[1:]:
+        key = tuple(str(row[i]) for i in indices)
+        rows.setdefault(key, []).append(dict(zip(header, row)))
+    return rows
+
+
+def _to_float(value):
+    """Convert a table value to float, None if not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value):
+    """Convert a table value to str, as formatted by ResultTable"""
+    return MISSING if value is None else str(value)
+
+
+def _get_rounding(value):
+    """Get the largest rounding error of a table value, i.e., half of the
+    last decimal place of a formatted float, 0 for typed values"""
+    if not isinstance(value, str) or "." not in value or "e" in value:
+        return 0.0
+    return 0.5 * 10.0 ** -len(value.split(".")[1])
+
+
+def compare_results(baseline, table, tolerances=None):
+    """Compare two results tables. Values formatted for CSV output (e.g.,
+    PlanSet.summary_table) may differ by their rounding in addition to the
+    tolerance, so compare typed values (e.g., PlanSet.results.rows) where
+    available.
+
+    Parameters
+    ----------
+    baseline : list
+        Header and rows of the baseline results, e.g., from read_csv
+    table : list
+        Header and rows of the new results, values may be typed
+    tolerances : dict, optional
+        Over rides for get_tolerances
+
+    Returns
+    -------
+    list
+        A dict for each deviation with keys of DEVIATION_COLUMNS, a plan
+        missing from either table is reported with 'Column' of 'Row', and
+        a plan with more than one row in either table with 'Column' of
+        'Duplicate' and the row counts. Rows of duplicate plans are
+        compared in order.
+    """
+    tolerances = get_tolerances(tolerances)
+    baseline_rows = _get_rows_by_key(baseline)
+    rows = _get_rows_by_key(table)
+
+    deviations = []
+    for key in sorted(set(baseline_rows) | set(rows)):
+        olds, news = baseline_rows.get(key, []), rows.get(key, [])
+        if len(olds) > 1 or len(news) > 1:
+            deviations.append(
+                {
+                    "SOP Instance UID": key[0],
+                    "Fx Group #": key[1],
+                    "Column": "Duplicate",
+                    "Baseline": len(olds),
+                    "Value": len(news),
+                    "Deviation": len(news) - len(olds),
+                }
+            )
+        if not olds or not news:
+            deviations.append(
+                {
+                    "SOP Instance UID": key[0],
+                    "Fx Group #": key[1],
+                    "Column": "Row",
+                    "Baseline": "present" if olds else "missing",
+                    "Value": "present" if news else "missing",
+                    "Deviation": "",
+                }
+            )
+            continue
+        for old, new in zip(olds, news):
+            deviations.extend(_compare_rows(key, old, new, tolerances))
+    return deviations
+
+
+def _compare_rows(key, old, new, tolerances):
+    """Get the deviations of a row from its baseline row, see
+    compare_results"""
+    deviations = []
+    for column, old_value in old.items():
+        if column in IGNORED_COLUMNS or column in KEY_COLUMNS:
+            continue
+        new_value = new.get(column)
+        a, b = _to_float(old_value), _to_float(new_value)
+        if a is None or b is None:
+            failed = _to_str(old_value) != _to_str(new_value)
+            deviation = ""
+        elif math.isnan(a) or math.isnan(b):
+            failed, deviation = math.isnan(a) != math.isnan(b), ""
+        else:
+            if column in COUNT_COLUMNS:
+                tolerance = 0.0
+            elif column in MU_COLUMNS:
+                tolerance = tolerances["meter_set"]
+            else:
+                tolerance = tolerances["score"]
+            tolerance += _get_rounding(old_value) + _get_rounding(new_value)
+            deviation = b - a
+            failed = abs(deviation) > tolerance
+        if failed:
+            deviations.append(
+                {
+                    "SOP Instance UID": key[0],
+                    "Fx Group #": key[1],
+                    "Column": column,
+                    "Baseline": old_value,
+                    "Value": new_value,
+                    "Deviation": deviation,
+                }
+            )
+    return deviations
+
+
+def compare_profiles(
+    baseline, profile, threshold=STAGE_TIME_THRESHOLD, min_time=MIN_STAGE_TIME
+):
+    """Compare the time per plan of each stage of two profiles
+
+    Parameters
+    ----------
+    baseline : dict
+        Baseline Profiler.report, e.g., loaded from a Profiler.save file
+    profile : dict
+        New Profiler.report
+    threshold : float, optional
+        Allowed fractional increase in the time per plan of a stage
+    min_time : float, optional
+        Stages with less baseline wall time (s) are not compared
+
+    Returns
+    -------
+    list
+        A dict for each stage in both profiles with 'stage', 'baseline' and
+        'value' (wall time per plan, s), 'change' (fractional), and
+        'regression' (bool)
+    """
+    old_count = max(baseline.get("plan_count", 0), 1)
+    new_count = max(profile.get("plan_count", 0), 1)
+    comparisons = []
+    for name, stage in profile["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None or old["wall_time"] < min_time:
+            continue
+        old_time = old["wall_time"] / old_count
+        new_time = stage["wall_time"] / new_count
+        change = new_time / old_time - 1.0
+        comparisons.append(
+            {
+                "stage": name,
+                "baseline": old_time,
+                "value": new_time,
+                "change": change,
+                "regression": change > threshold,
+            }
+        )
+    return comparisons
+
+
+def verify(
+    baseline,
+    baseline_profile=None,
+    init_dir=None,
+    processes=1,
+    tolerances=None,
+    threshold=STAGE_TIME_THRESHOLD,
+    output_file=None,
+    report_file=None,
+    profile_file=None,
+    quiet=False,
+    **kwargs
+):
+    """Rerun analysis of the plans in a baseline results file and compare
+
+    Parameters
+    ----------
+    baseline : str
+        Path to a results file from mlca
+    baseline_profile : str, optional
+        Path to a profile from mlca --profile-file, if provided, stage
+        timings are compared
+    init_dir : str, optional
+        Search this directory for plans, by default the 'File Name' of each
+        baseline row is used
+    processes : int, optional
+        Number of processes for PlanSet
+    tolerances : dict, optional
+        Over rides for get_tolerances
+    threshold : float, optional
+        Allowed fractional increase in the time per plan of a stage
+    output_file : str, optional
+        Save the new results to this file
+    report_file : str, optional
+        Save the score deviations to this file
+    profile_file : str, optional
+        Save the new profile to this file
+    quiet : bool, optional
+        Do not print progress of each plan or progress bars
+    kwargs :
+        Options for PlanSet (e.g., complexity_weight_x), which must match
+        those of the baseline
+
+    Returns
+    -------
+    int
+        EXIT_PASSED, EXIT_DEVIATIONS (score deviations, or missing or
+        duplicate plans),
+        EXIT_TIMING (timing regressions only), or EXIT_ERROR
+    """
+    try:
+        baseline_table = read_csv(baseline)
+        if baseline_profile is not None:
+            with open(baseline_profile, "r") as f:
+                baseline_profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print("mlca verify: error: %s" % e)
+        return EXIT_ERROR
+    header = baseline_table[0] if baseline_table else []
+    if any(column not in header for column in KEY_COLUMNS):
+        print("mlca verify: error: %s is not an mlca results file" % baseline)
+        return EXIT_ERROR
+
+    profiler = Profiler()
+    previous_profiler = set_profiler(profiler)
+    reporter = None if quiet else get_emitter().subscribe(ConsoleReporter())
+    try:
+        if init_dir is None:
+            index = header.index("File Name")
+            file_paths = list(
+                dict.fromkeys(row[index] for row in baseline_table[1:])
+            )
+        else:
+            with profiler.stage("tree_walk"):
+                file_paths = get_file_paths(init_dir)
+            with profiler.stage("sniffing"):
+                file_paths = get_dicom_files(
+                    file_paths, modality="RTPLAN", processes=processes
+                )
+        kwargs.update(get_analysis_options(header))
+        print("Analyzing %s file(s) ..." % len(file_paths))
+        plan_set = PlanSet(file_paths, processes=processes, **kwargs)
+    finally:
+        set_profiler(previous_profiler)
+        if reporter is not None:
+            get_emitter().unsubscribe(reporter)
+
+    if output_file:
+        write_csv(output_file, plan_set.summary_table)
+    if profile_file:
+        profiler.save(profile_file)
+
+    table = [plan_set.columns] + plan_set.results.rows
+    deviations = compare_results(baseline_table, table, tolerances)
+    duplicates = [d for d in deviations if d["Column"] == "Duplicate"]
+    print(
+        "\n%s score deviation(s) in %s baseline row(s)"
+        % (len(deviations) - len(duplicates), len(baseline_table) - 1)
+    )
+    if duplicates:
+        print(
+            "%s plan(s) with more than one row, see 'Duplicate' below"
+            % len(duplicates)
+        )
+    for d in deviations[:20]:
+        print(
+            "%s fx %s  %s: %s -> %s"
+            % (
+                d["SOP Instance UID"],
+                d["Fx Group #"],
+                d["Column"],
+                d["Baseline"],
+                d["Value"],
+            )
+        )
+    if report_file:
+        write_csv(
+            report_file,
+            [DEVIATION_COLUMNS]
+            + [[d[c] for c in DEVIATION_COLUMNS] for d in deviations],
+        )
+
+    regressions = []
+    if baseline_profile is not None:
+        comparisons = compare_profiles(
+            baseline_profile, profiler.report, threshold
+        )
+        regressions = [c for c in comparisons if c["regression"]]
+        print(
+            "\n%-12s %12s %12s %8s" % ("Stage", "Baseline", "Value", "Change")
+        )
+        for c in comparisons:
+            print(
+                "%-12s %10.4f s %10.4f s %+7.1f%%%s"
+                % (
+                    c["stage"],
+                    c["baseline"],
+                    c["value"],
+                    100.0 * c["change"],
+                    "  REGRESSION" if c["regression"] else "",
+                )
+            )
+
+    if duplicates:
+        print("\nVerification failed: duplicate plans")
+        return EXIT_DEVIATIONS
+    if deviations:
+        print("\nVerification failed: score deviations")
+        return EXIT_DEVIATIONS
+    if regressions:
+        print("\nVerification failed: timing regressions")
+        return EXIT_TIMING
+    print("\nVerification passed")
+    return EXIT_PASSED
+
+
+def create_cmd_parser():
+    """Get an argument parser for mlca verify
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        argument parser
+    """
+    cmd_parser = argparse.ArgumentParser(
+        prog="mlca verify",
+        description="Rerun DVHA MLC Analyzer on the plans of a baseline "
+        "results file and report score deviations and timing regressions. "
+        "Exit codes: %s passed, %s score deviations or missing or duplicate "
+        "plans, %s timing regressions, "
+        "%s error" % (EXIT_PASSED, EXIT_DEVIATIONS, EXIT_TIMING, EXIT_ERROR),
+    )
+    cmd_parser.add_argument(
+        "baseline",
+        help="Results file from a previous mlca run",
+    )
+    cmd_parser.add_argument(
+        "-bp",
+        "--baseline-profile",
+        dest="baseline_profile",
+        help="Profile from a previous mlca --profile-file run, stage "
+        "timings are compared if provided",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-d",
+        "--directory",
+        dest="init_dir",
+        help="Search this directory for plans instead of the baseline "
+        "File Name column",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-n",
+        "--processes",
+        dest="processes",
+        help="Enable multiprocessing, set number of parallel processes",
+        default=1,
+    )
+    cmd_parser.add_argument(
+        "-xw",
+        "--x-weight",
+        dest="complexity_weight_x",
+        help="Complexity coefficient for x-dimension of the baseline: "
+        "default = %0.1f" % DEFAULT_OPTIONS["complexity_weight_x"],
+        default=DEFAULT_OPTIONS["complexity_weight_x"],
+    )
+    cmd_parser.add_argument(
+        "-yw",
+        "--y-weight",
+        dest="complexity_weight_y",
+        help="Complexity coefficient for y-dimension of the baseline: "
+        "default = %0.1f" % DEFAULT_OPTIONS["complexity_weight_y"],
+        default=DEFAULT_OPTIONS["complexity_weight_y"],
+    )
+    cmd_parser.add_argument(
+        "-xs",
+        "--x-max-field-size",
+        dest="max_field_size_x",
+        help="Maximum field size in the x-dimension of the baseline: "
+        "default = %0.1f (mm)" % DEFAULT_OPTIONS["max_field_size_x"],
+        default=DEFAULT_OPTIONS["max_field_size_x"],
+    )
+    cmd_parser.add_argument(
+        "-ys",
+        "--y-max-field-size",
+        dest="max_field_size_y",
+        help="Maximum field size in the y-dimension of the baseline: "
+        "default = %0.1f (mm)" % DEFAULT_OPTIONS["max_field_size_y"],
+        default=DEFAULT_OPTIONS["max_field_size_y"],
+    )
+    cmd_parser.add_argument(
+        "-ls",
+        "--max-leaf-speed",
+        dest="max_leaf_speed",
+        help="Maximum leaf speed of the baseline: default = %0.1f (mm/s)"
+        % DEFAULT_OPTIONS["max_leaf_speed"],
+        default=DEFAULT_OPTIONS["max_leaf_speed"],
+    )
+    cmd_parser.add_argument(
+        "-gs",
+        "--max-gantry-speed",
+        dest="max_gantry_speed",
+        help="Maximum gantry speed of the baseline: default = %0.1f (deg/s)"
+        % DEFAULT_OPTIONS["max_gantry_speed"],
+        default=DEFAULT_OPTIONS["max_gantry_speed"],
+    )
+    cmd_parser.add_argument(
+        "-dr",
+        "--max-dose-rate",
+        dest="max_dose_rate",
+        help="Maximum dose rate of the baseline: default = %0.1f (MU/min)"
+        % DEFAULT_OPTIONS["max_dose_rate"],
+        default=DEFAULT_OPTIONS["max_dose_rate"],
+    )
+    cmd_parser.add_argument(
+        "-is",
+        "--interpolation-steps",
+        dest="interpolation_steps",
+        help="Interpolation steps per control point interval of the "
+        "baseline: default = %d" % DEFAULT_OPTIONS["interpolation_steps"],
+        default=DEFAULT_OPTIONS["interpolation_steps"],
+    )
+    cmd_parser.add_argument(
+        "-sg",
+        "--skip-zero-mu-geometry",
+        dest="skip_zero_mu_geometry",
+        help="Set if the baseline was analyzed with --skip-zero-mu-geometry",
+        default=DEFAULT_OPTIONS["skip_zero_mu_geometry"],
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-mt",
+        "--mu-tolerance",
+        dest="meter_set",
+        help="Absolute tolerance of MU columns: default = %s"
+        % BEAM_MU_TOLERANCE,
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-st",
+        "--score-tolerance",
+        dest="score",
+        help="Absolute tolerance of score and metric columns: default = %s"
+        % COMPLEXITY_SCORE_TOLERANCE,
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-tt",
+        "--timing-threshold",
+        dest="threshold",
+        help="Allowed fractional increase in the time per plan of a stage: "
+        "default = %s" % STAGE_TIME_THRESHOLD,
+        default=STAGE_TIME_THRESHOLD,
+    )
+    cmd_parser.add_argument(
+        "-q",
+        "--quiet",
+        dest="quiet",
+        help="Do not print progress of each plan or progress bars",
+        default=False,
+        action="store_true",
+    )
+    cmd_parser.add_argument(
+        "-of",
+        "--output-file",
+        dest="output_file",
+        help="Save the new results to this file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-rf",
+        "--report-file",
+        dest="report_file",
+        help="Save the score deviations to this file",
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-pf",
+        "--profile-file",
+        dest="profile_file",
+        help="Save the new profile to this file",
+        default=None,
+    )
+    return cmd_parser
+
+
+def main(args=None):
+    """Parse command-line args, pass into verify
+
+    Parameters
+    ----------
+    args : list, optional
+        Command-line args after 'verify', by default sys.argv is used
+
+    Returns
+    -------
+    int
+        Exit code from verify
+    """
+    kwargs = vars(create_cmd_parser().parse_args(args))
+    kwargs["tolerances"] = {
+        "meter_set": kwargs.pop("meter_set"),
+        "score": kwargs.pop("score"),
+    }
+    kwargs["processes"] = int(float(kwargs["processes"]))
+    kwargs["threshold"] = float(kwargs["threshold"])
+    return verify(**kwargs)
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# watch.py
+"""
+Watch a directory, analyze new or modified DICOM-RT Plan files once their
+writes settle, and write the results to a csv file, keyed by file name
+"""
+# Copyright (c) 2016-2021 Dan Cutright
+# This file is part of DVH Analytics MLC Analyzer, released under a BSD license
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+from os.path import abspath, exists, join
+import select
+import signal
+import sys
+import threading
+import time
+from mlca.events import ConsoleReporter, get_emitter
+from mlca.utilities import get_dicom_files, read_csv, write_csv
+
+
+# Time (s) between scans, and time without changes before a file is read
+POLL_INTERVAL = 2.0
+SETTLE_TIME = 2.0
+STATE_FILE_SUFFIX = ".state.json"
+
+
+class _Inotify:
+    """Wake a watcher early when files in watched directories are written,
+    with inotify from libc (Linux only)"""
+
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    MASK = 0x2 | 0x8 | 0x80 | 0x100
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = set()
+
+    def watch(self, directory):
+        """Watch a directory, not including sub-directories"""
+        if directory not in self.directories:
+            wd = self._add_watch(self.fd, os.fsencode(directory), self.MASK)
+            if wd >= 0:
+                self.directories.add(directory)
+
+    def wait(self, timeout):
+        """Wait for events, return True if any occurred"""
+        ready = select.select([self.fd], [], [], timeout)[0]
+        if ready:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+        return bool(ready)
+
+    def close(self):
+        """Close the inotify file descriptor"""
+        os.close(self.fd)
+
+
+def get_inotify():
+    """Get an inotify waiter if available
+
+    Returns
+    -------
+    _Inotify, None
+        None if inotify is not available (e.g., not Linux), in which case
+        FolderWatcher polls
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return _Inotify()
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+class FolderWatcher:
+    """Analyze new or modified files of a directory with PlanSet, append
+    result rows to a csv file. Rows of a modified file replace its earlier
+    rows. Files analyzed (or found not to be DICOM-RT Plans) are recorded
+    with their modification time and size in a state file, so they are not
+    processed again after a restart.
+
+    Parameters
+    ----------
+    init_dir : str
+        Directory to watch, including sub-directories
+    output_file : str
+        Results are appended to this csv file, with a header if new. Rows
+        are keyed by their File Name column
+    state_file : str, optional
+        JSON file of processed files, default is ``output_file`` with
+        STATE_FILE_SUFFIX appended
+    interval : float, optional
+        Time (s) between scans, inotify events wake the watcher early
+    settle : float, optional
+        A file is processed once its size and modification time have not
+        changed for this many seconds
+    processes : int, optional
+        Number of processes for sniffing and analysis
+    use_inotify : bool, optional
+        Set to False to always poll
+    kwargs :
+        Passed to PlanSet, e.g., weight_grid, metrics, or database
+
+    """
+
+    def __init__(
+        self,
+        init_dir,
+        output_file,
+        state_file=None,
+        interval=POLL_INTERVAL,
+        settle=SETTLE_TIME,
+        processes=1,
+        use_inotify=True,
+        **kwargs
+    ):
+        self.init_dir = init_dir
+        self.output_file = abspath(output_file)
+        self.state_file = abspath(
+            state_file or self.output_file + STATE_FILE_SUFFIX
+        )
+        self.interval = interval
+        self.settle = settle
+        self.processes = processes
+        self.kwargs = kwargs
+        self.inotify = get_inotify() if use_inotify else None
+        self.processed = self.load_state()
+        self.pending = {}
+        self._stop = threading.Event()
+
+    def load_state(self):
+        """Read the state file
+
+        Returns
+        -------
+        dict
+            [modification time, size] of each processed file
+        """
+        if not exists(self.state_file):
+            return {}
+        with open(self.state_file, "r") as f:
+            return json.load(f)["files"]
+
+    def save_state(self):
+        """Write the state file, replacing it only once written"""
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"init_dir": self.init_dir, "files": self.processed}, f)
+        os.replace(temp_file, self.state_file)
+
+    def scan(self):
+        """Get the modification time and size of each file
+
+        Returns
+        -------
+        dict
+            [modification time, size] of each file in FolderWatcher.init_dir
+        """
+        files = {}
+        ignored = {
+            self.output_file,
+            self.output_file + ".tmp",
+            self.state_file,
+            self.state_file + ".tmp",
+        }
+        for directory, _, file_names in os.walk(self.init_dir):
+            if self.inotify is not None:
+                self.inotify.watch(directory)
+            for file_name in file_names:
+                file_path = abspath(join(directory, file_name))
+                if file_path in ignored:
+                    continue
+                try:
+                    stat = os.stat(file_path)
+                except OSError:  # removed since os.walk
+                    continue
+                files[file_path] = [stat.st_mtime, stat.st_size]
+        return files
+
+    def get_ready_files(self, now=None):
+        """Scan for new or modified files that have settled
+
+        Parameters
+        ----------
+        now : float, optional
+            Current time.time(), used for testing
+
+        Returns
+        -------
+        list
+            File paths whose size and modification time are unchanged since
+            the previous scan and at least FolderWatcher.settle seconds old
+        """
+        now = time.time() if now is None else now
+        ready = []
+        pending = {}
+        for file_path, stat in self.scan().items():
+            if self.processed.get(file_path) == stat:
+                continue
+            if (
+                self.pending.get(file_path) == stat
+                and now - stat[0] >= self.settle
+            ):
+                ready.append(file_path)
+            else:
+                pending[file_path] = stat
+        self.pending = pending
+        return sorted(ready)
+
+    def remove_rows(self, file_paths):
+        """Remove the rows of files from FolderWatcher.output_file, replacing
+        it only once written
+
+        Parameters
+        ----------
+        file_paths : list
+            Values of the File Name column of rows to remove
+
+        Returns
+        -------
+        int
+            Number of rows removed
+        """
+        if not file_paths or not exists(self.output_file):
+            return 0
+        table = read_csv(self.output_file)
+        if not table or "File Name" not in table[0]:
+            return 0
+        file_index = table[0].index("File Name")
+        file_paths = set(file_paths)
+        rows = [
+            row
+            for row in table[1:]
+            if len(row) <= file_index or row[file_index] not in file_paths
+        ]
+        removed = len(table) - 1 - len(rows)
+        if removed:
+            temp_file = self.output_file + ".tmp"
+            write_csv(temp_file, [table[0]] + rows)
+            os.replace(temp_file, self.output_file)
+        return removed
+
+    def process(self, file_paths):
+        """Analyze the DICOM-RT Plan files of a list of files, append their
+        result rows to FolderWatcher.output_file, after removing the rows of
+        files processed before
+
+        Parameters
+        ----------
+        file_paths : list
+            Files from FolderWatcher.get_ready_files
+
+        Returns
+        -------
+        int
+            Number of rows appended
+        """
+        from mlca.mlc_analyzer import PlanSet
+
+        stats = {f: os.stat(f) for f in file_paths if exists(f)}
+        self.remove_rows([f for f in stats if f in self.processed])
+        plan_files = get_dicom_files(
+            list(stats), modality="RTPLAN", processes=self.processes
+        )
+        rows = []
+        if plan_files:
+            table = PlanSet(
+                plan_files, processes=self.processes, **self.kwargs
+            ).summary_table
+            rows = table[1:]
+            new_file = not exists(self.output_file)
+            write_csv(self.output_file, table if new_file else rows, mode="a")
+        for file_path, stat in stats.items():
+            self.processed[file_path] = [stat.st_mtime, stat.st_size]
+        self.save_state()
+        return len(rows)
+
+    def run_once(self):
+        """Scan and process ready files
+
+        Returns
+        -------
+        list
+            Processed file paths
+        """
+        file_paths = self.get_ready_files()
+        if file_paths:
+            self.process(file_paths)
+        return file_paths
+
+    def run(self):
+        """Scan and process until FolderWatcher.stop is called"""
+        try:
+            while not self._stop.is_set():
+                self.run_once()
+                # pending files are checked again once they may be settled
+                timeout = self.interval
+                if self.pending:
+                    timeout = min(self.interval, self.settle)
+                if self.inotify is not None:
+                    self.inotify.wait(timeout)
+                else:
+                    self._stop.wait(timeout)
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+                self.inotify = None
+
+    def stop(self):
+        """Stop FolderWatcher.run after the current scan"""
+        self._stop.set()
+
+
+def create_cmd_parser():
+    """Get an argument parser for mlca watch
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        argument parser
+    """
+    cmd_parser = argparse.ArgumentParser(
+        prog="mlca watch",
+        description="Analyze new or modified DICOM-RT Plan files in a "
+        "directory as they arrive, append results to a csv file, "
+        "replacing the rows of modified files",
+    )
+    cmd_parser.add_argument(
+        "init_dir",
+        help="Directory to watch, including sub-directories",
+    )
+    cmd_parser.add_argument(
+        "-of",
+        "--output-file",
+        dest="output_file",
+        help="Append results to this file, the rows of a modified file "
+        "replace its earlier rows",
+        required=True,
+    )
+    cmd_parser.add_argument(
+        "-sf",
+        "--state-file",
+        dest="state_file",
+        help="Record processed files in this file: default = "
+        "<output-file>%s" % STATE_FILE_SUFFIX,
+        default=None,
+    )
+    cmd_parser.add_argument(
+        "-i",
+        "--interval",
+        dest="interval",
+        help="Time (s) between scans: default = %s" % POLL_INTERVAL,
+        default=POLL_INTERVAL,
+    )
+    cmd_parser.add_argument(
+        "-s",
+        "--settle",
+        dest="settle",
+        help="Time (s) a file must be unchanged before it is read: "
+        "default = %s" % SETTLE_TIME,
+        default=SETTLE_TIME,
+    )
+    cmd_parser.add_argument(
+        "-n",
+        "--processes",
+        dest="processes",
+        help="Enable multiprocessing, set number of parallel processes",
+        default=1,
+    )
+    cmd_parser.add_argument(
+        "-p",
+        "--poll",
+        dest="use_inotify",
+        help="Poll only, do not use inotify",
+        default=True,
+        action="store_false",
+    )
+    cmd_parser.add_argument(
+        "-q",
+        "--quiet",
+        dest="quiet",
+        help="Do not print progress of each plan or progress bars",
+        default=False,
+        action="store_true",
+    )
+    return cmd_parser
+
+
+def main(args=None):
+    """Parse command-line args, watch until interrupted or SIGTERM
+
+    Parameters
+    ----------
+    args : list, optional
+        Command-line args after 'watch', by default sys.argv is used
+
+    Returns
+    -------
+    int
+        Exit code
+    """
+    kwargs = vars(create_cmd_parser().parse_args(args))
+    kwargs["processes"] = int(float(kwargs["processes"]))
+    for key in ["interval", "settle"]:
+        kwargs[key] = float(kwargs[key])
+    if not kwargs.pop("quiet"):
+        get_emitter().subscribe(ConsoleReporter())
+    watcher = FolderWatcher(**kwargs)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    print(
+        "Watching %s (%s), appending results to: %s"
+        % (
+            kwargs["init_dir"],
+            "inotify" if watcher.inotify is not None else "polling",
+            watcher.output_file,
+        )
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    print("Stopped watching %s" % kwargs["init_dir"])
+    return 0
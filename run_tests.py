@@ -11,9 +11,52 @@
 import unittest
 from tests.test_utilities import TestUtilities
 from tests.test_mlc_analyzer import TestMLCAnalzyer
+from tests.test_metrics import TestMetrics
+from tests.test_geometry import TestGeometry
+from tests.test_fluence import TestFluence
+from tests.test_diff import TestDiff
+from tests.test_fingerprint import TestFingerprint
+from tests.test_similarity import TestSimilarity
+from tests.test_synthetic import TestSynthetic
+from tests.test_profiling import TestProfiling
+from tests.test_counters import TestCounters
+from tests.test_memory import TestMemory
+from tests.test_verify import TestVerify
+from tests.test_events import TestEvents
+from tests.test_results import TestResults
+from tests.test_database import TestDatabase
+from tests.test_aggregates import TestAggregates
+from tests.test_ranking import TestRanking
+from tests.test_server import TestServer
+from tests.test_watch import TestWatch
+from tests.test_scp import TestSCP
+from tests.test_machines import TestMachines
 
 
-test_classes = [TestUtilities, TestMLCAnalzyer]
+test_classes = [
+    TestUtilities,
+    TestMLCAnalzyer,
+    TestMetrics,
+    TestGeometry,
+    TestFluence,
+    TestDiff,
+    TestFingerprint,
+    TestSimilarity,
+    TestSynthetic,
+    TestProfiling,
+    TestCounters,
+    TestMemory,
+    TestVerify,
+    TestEvents,
+    TestResults,
+    TestDatabase,
+    TestAggregates,
+    TestRanking,
+    TestServer,
+    TestWatch,
+    TestSCP,
+    TestMachines,
+]
 
 
 class TestSuite:
@@ -52,7 +52,9 @@ setup(
     keywords=['radiation therapy', 'research', 'dicom', 'dicom-rt', 'analytics'],
     classifiers=CLASSIFIERS,
     install_requires=requires,
-    entry_points={'console_scripts': ['mlca = mlca.main:main']},
+    extras_require={'scp': ['pynetdicom']},
+    entry_points={'console_scripts': ['mlca = mlca.main:main',
+                                      'mlca-benchmark = mlca.benchmark:main']},
     long_description=long_description,
     long_description_content_type="text/x-rst"
 )
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_aggregates.py
+"""unittest cases for aggregates."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+import json
+import math
+import random
+from os.path import join
+from mlca import aggregates, mlc_analyzer
+from mlca.aggregates import (
+    Aggregator,
+    QuantileSketch,
+    RunningStats,
+    SUMMARY_COLUMNS,
+)
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestAggregates(unittest.TestCase):
+    """Unit tests for aggregates."""
+
+    def setUp(self):
+        """Random values with a fixed seed"""
+        rng = random.Random(0)
+        self.values = [rng.lognormvariate(0, 1) for _ in range(2000)]
+        self.values.extend([0.0, -1.5, -3.0])
+
+    def test_running_stats(self):
+        """Test RunningStats against a two-pass calculation"""
+        stats, first, second = RunningStats(), RunningStats(), RunningStats()
+        for i, value in enumerate(self.values):
+            stats.add(value)
+            (first if i % 3 else second).add(value)
+        merged = RunningStats()
+        merged.merge(first.to_dict())
+        merged.merge(second.to_dict())
+        merged.merge(RunningStats().to_dict())
+
+        count = len(self.values)
+        mean = sum(self.values) / count
+        variance = sum((v - mean) ** 2 for v in self.values) / (count - 1)
+        for result in [stats, merged]:
+            self.assertEqual(count, result.count)
+            self.assertAlmostEqual(mean, result.mean)
+            self.assertAlmostEqual(variance, result.variance)
+            self.assertEqual(min(self.values), result.min)
+            self.assertEqual(max(self.values), result.max)
+        self.assertTrue(math.isnan(RunningStats().variance))
+
+    def test_quantile_sketch(self):
+        """Test QuantileSketch quantiles are within relative accuracy"""
+        sketch, first, second = (
+            QuantileSketch(),
+            QuantileSketch(),
+            QuantileSketch(),
+        )
+        for i, value in enumerate(self.values):
+            sketch.add(value)
+            (first if i % 2 else second).add(value)
+        merged = QuantileSketch()
+        merged.merge(json.loads(json.dumps(first.to_dict())))
+        merged.merge(second.to_dict())
+        self.assertEqual(sketch.to_dict(), merged.to_dict())
+
+        values = sorted(self.values)
+        for q in [0.0, 0.01, 0.25, 0.5, 0.9, 0.99, 1.0]:
+            exp = values[int(q * (len(values) - 1))]
+            result = sketch.quantile(q)
+            self.assertLessEqual(
+                abs(result - exp), sketch.relative_accuracy * abs(exp) + 1e-9
+            )
+        self.assertLess(len(sketch.positive), 1000)
+        self.assertTrue(math.isnan(QuantileSketch().quantile(0.5)))
+        with self.assertRaises(ValueError):
+            sketch.merge(QuantileSketch(0.05).to_dict())
+
+    def test_get_month(self):
+        """Test get_month"""
+        self.assertEqual("2017-08", aggregates.get_month("20170807"))
+        self.assertEqual(aggregates.UNKNOWN, aggregates.get_month(""))
+
+    def test_aggregator(self):
+        """Test Aggregator groups and merges"""
+        aggregator = Aggregator(["tps"], values=["a"])
+        for value in self.values:
+            aggregator.add(("x",), {"a": value, "b": 1.0})
+        aggregator.add(("y",), {"a": None})
+        aggregator.add(("y",), {"a": float("nan")})
+        self.assertEqual(2, len(aggregator))
+
+        copy = Aggregator.from_dict(aggregator.to_dict())
+        copy.merge(aggregator.to_dict())
+        stats, _ = copy.groups[("x",)]["a"]
+        self.assertEqual(2 * len(self.values), stats.count)
+        self.assertEqual(0, copy.groups[("y",)]["a"][0].count)
+
+        table = aggregator.summary_table
+        self.assertEqual(["tps"] + SUMMARY_COLUMNS, table[0])
+        self.assertEqual(["x", "a", str(len(self.values))], table[1][:3])
+        self.assertEqual(["y", "a", "0", ""], table[2][:4])
+
+        with self.assertRaises(KeyError):
+            Aggregator(["unknown"])
+
+    def test_plan_set_aggregator(self):
+        """Test PlanSet aggregates with and without multiprocessing"""
+        file_paths = [example_file_path] * 3
+        plan = mlc_analyzer.Plan(example_file_path)
+        self.assertEqual("SL A", plan.machine)
+        self.assertEqual("20170807", plan.plan_date)
+        pattern = r"^(\w)"
+        results = []
+        for processes in [1, 2]:
+            aggregator = Aggregator(
+                ["tps", "machine", "month", "plan_name"],
+                plan_name_pattern=pattern,
+            )
+            plan_set = mlc_analyzer.PlanSet(
+                file_paths,
+                processes=processes,
+                aggregator=aggregator,
+                keep_results=False,
+            )
+            self.assertEqual(0, len(plan_set.results))
+            # memory does not grow with the number of plans
+            self.assertEqual(0, len(plan_set.index))
+            self.assertEqual(1, len(aggregator))
+            group = list(aggregator.groups)[0]
+            self.assertEqual(
+                (plan.tps, "SL A", "2017-08", plan.plan_name[0]), group
+            )
+            stats, _ = aggregator.groups[group]["Plan MUs"]
+            self.assertEqual(3 * len(plan.fx_group), stats.count)
+            results.append(aggregator.summary_table)
+        self.assertEqual(results[0], results[1])
+
+        aggregator = Aggregator(["plan_name"], plan_name_pattern="^$")
+        self.assertEqual((aggregates.OTHER,), aggregator.get_group(plan))
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
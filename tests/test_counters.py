@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_counters.py
+"""unittest cases for counters."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from tempfile import TemporaryDirectory
+from mlca import counters, mlc_analyzer, utilities
+from mlca.synthetic import write_corpus
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestCounters(unittest.TestCase):
+    """Unit tests for counters."""
+
+    def setUp(self):
+        """Reset the module level counters"""
+        counters.get_counters().reset()
+
+    def test_counters(self):
+        """Test Counters"""
+        c = counters.Counters()
+        c.increment("files_rejected")
+        c.increment("files_rejected", 2)
+        with c.timer("intersections"):
+            pass
+        self.assertEqual(3, c.get("files_rejected"))
+        self.assertEqual(1, c.get("intersections"))
+        self.assertEqual(0, c.get("polygons_built"))
+        self.assertIn("intersections", c.seconds)
+
+        other = counters.Counters()
+        other.merge(c.to_dict())
+        other.merge(c.to_dict())
+        self.assertEqual(6, other.get("files_rejected"))
+        self.assertEqual(2, other.get("intersections"))
+
+        other.reset()
+        self.assertEqual(0, other.get("files_rejected"))
+
+    def test_prometheus(self):
+        """Test Counters.to_prometheus and write_prometheus"""
+        c = counters.Counters()
+        c.increment("control_points_skipped", 4)
+        with c.timer("buffer_repairs"):
+            pass
+        text = c.to_prometheus()
+        self.assertIn("mlca_control_points_skipped_total 4\n", text)
+        self.assertIn("mlca_buffer_repairs_total 1\n", text)
+        self.assertIn("# TYPE mlca_buffer_repairs_seconds_total counter", text)
+        self.assertIn("mlca_polygons_built_total 0\n", text)
+        self.assertNotIn("polygons_built_seconds", text)
+
+        with TemporaryDirectory() as temp_dir:
+            file_path = join(temp_dir, "mlca.prom")
+            c.write_prometheus(file_path, prefix="test")
+            with open(file_path, "r") as f:
+                self.assertEqual(c.to_prometheus("test"), f.read())
+
+    def test_plan_counters(self):
+        """Test geometry counters of a Plan"""
+        c = counters.get_counters()
+        plan = mlc_analyzer.Plan(example_file_path)
+        cp_count = sum(
+            len(beam.control_point)
+            for fx_grp in plan.fx_group
+            for beam in fx_grp.beam
+        )
+        self.assertEqual(cp_count, c.get("intersections"))
+        self.assertEqual(cp_count, c.get("buffer_repairs"))
+        self.assertEqual(2 * cp_count, c.get("polygons_built"))
+
+    def test_multiprocessing_counters(self):
+        """Test counters are merged from run_multiprocessing workers"""
+        with TemporaryDirectory() as temp_dir:
+            write_corpus(temp_dir, 2, non_dicom_count=3, seed=0, cp_count=3)
+            file_paths = utilities.get_file_paths(temp_dir)
+            files = utilities.get_dicom_files(
+                file_paths, modality="RTPLAN", processes=2
+            )
+        self.assertEqual(2, len(files))
+        c = counters.get_counters()
+        self.assertEqual(5, c.get("files_sniffed"))
+        self.assertEqual(3, c.get("files_rejected"))
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_database.py
+"""unittest cases for database."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from mlca import database, mlc_analyzer
+from mlca.database import ResultDatabase
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestDatabase(unittest.TestCase):
+    """Unit tests for database."""
+
+    def setUp(self):
+        """Create a temporary directory for database files"""
+        self.temp_dir = mkdtemp()
+        self.db_path = join(self.temp_dir, "results.db")
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        rmtree(self.temp_dir)
+
+    def test_get_column_name(self):
+        """Test get_column_name"""
+        self.assertEqual("mrn", database.get_column_name("Patient MRN"))
+        self.assertEqual(
+            "complexity_score_x_0_001_y_0_002",
+            database.get_column_name("Complexity Score (x=0.001, y=0.002)"),
+        )
+
+    def test_upsert(self):
+        """Test ResultDatabase upserts on SOP Instance UID and Fx Group #"""
+        plan_set = mlc_analyzer.PlanSet([example_file_path])
+        columns = plan_set.columns
+        dtypes = plan_set.results.dtypes
+        rows = plan_set.results.rows
+        fx_groups = len(rows)
+
+        # INSERT OR REPLACE is used with SQLite older than 3.24
+        modes = [True, False] if database.UPSERT_SUPPORTED else [False]
+        for upsert in modes:
+            db_path = join(self.temp_dir, "results_%s.db" % upsert)
+            with ResultDatabase(db_path, batch_size=2) as db:
+                db.upsert = upsert
+                db.prepare(columns, dtypes)
+                db.add_rows(rows)
+                db.add_rows(rows)
+                self.assertEqual(fx_groups, len(db.query()))
+
+            changed = [list(row) for row in rows]
+            changed[0][columns.index("Plan name")] = "Renamed"
+            with ResultDatabase(db_path) as db:
+                db.upsert = upsert
+                db.prepare(columns, dtypes)
+                db.add_rows(changed)
+                data = db.query()
+                self.assertEqual(fx_groups, len(data))
+                self.assertEqual("Renamed", data[0]["plan_name"])
+                self.assertEqual(1, len(db.query(plan_name="Renamed")))
+                mrn = rows[0][columns.index("Patient MRN")]
+                self.assertEqual(fx_groups, len(db.query(mrn=mrn)))
+                self.assertEqual(0, len(db.query(since="9999-01-01")))
+                self.assertEqual(fx_groups, len(db.query(until="9999-01-01")))
+                self.assertIsInstance(data[0]["plan_mu"], float)
+                self.assertIsInstance(data[0]["cp_count"], int)
+                with self.assertRaises(KeyError):
+                    db.query(unknown="value")
+
+    def test_plan_date(self):
+        """Test ResultDatabase stores and queries RTPlanDate"""
+        self.assertEqual("2017-08-07", database.get_iso_date("20170807"))
+        self.assertIsNone(database.get_iso_date(""))
+        self.assertIsNone(database.get_iso_date("2017"))
+
+        plan_set = mlc_analyzer.PlanSet([example_file_path])
+        with ResultDatabase(self.db_path) as db:
+            db.prepare(plan_set.columns, plan_set.results.dtypes)
+            db.add_rows(plan_set.results.rows, plan_date="20170807")
+            fx_groups = len(plan_set.results)
+            data = db.query(since="2017-08-01", date_column="plan_date")
+            self.assertEqual(fx_groups, len(data))
+            self.assertEqual("2017-08-07", data[0]["plan_date"])
+            self.assertEqual(
+                0, len(db.query(until="2017-08-07", date_column="plan_date"))
+            )
+            with self.assertRaises(KeyError):
+                db.query(date_column="plan_name")
+            cursor = db.connection.execute("PRAGMA index_list(plans)")
+            self.assertIn(
+                "idx_plans_plan_date", [row[1] for row in cursor.fetchall()]
+            )
+
+    def test_stale_beams(self):
+        """Test beam rows of a re-analyzed plan replace the old beam rows"""
+        plan_set = mlc_analyzer.PlanSet([example_file_path])
+        rows = plan_set.results.rows[:1]
+        uid = rows[0][plan_set.columns.index("SOP Instance UID")]
+        fx_group = rows[0][plan_set.columns.index("Fx Group #")]
+        beam_rows = [
+            [uid, fx_group, b, "Beam %s" % b, 100.0, 10, 0.1]
+            for b in range(1, 4)
+        ]
+        with ResultDatabase(self.db_path, beams=True) as db:
+            db.prepare(plan_set.columns, plan_set.results.dtypes)
+            db.add_rows(rows, beam_rows)
+            db.flush()
+            db.add_rows(rows, beam_rows[:1])
+            db.flush()
+            cursor = db.connection.execute(
+                "SELECT beam_index FROM beams WHERE sop_instance_uid = ?",
+                (uid,),
+            )
+            self.assertEqual([(1,)], cursor.fetchall())
+
+    def test_plan_set_database(self):
+        """Test PlanSet writes rows and beam rows to a ResultDatabase"""
+        for processes in [1, 2]:
+            db = ResultDatabase(":memory:", beams=True)
+            plan_set = mlc_analyzer.PlanSet(
+                [example_file_path],
+                processes=processes,
+                weight_grid=[(0.001, 0.002)],
+                database=db,
+            )
+            data = db.query()
+            self.assertEqual(len(plan_set.results), len(data))
+            self.assertIn("complexity_score_x_0_001_y_0_002", data[0])
+            self.assertEqual("2017-08-07", data[0]["plan_date"])
+            beam_count = sum(
+                row[plan_set.columns.index("Beam Count(s)")]
+                for row in plan_set.results.rows
+            )
+            cursor = db.connection.execute("SELECT COUNT(*) FROM beams")
+            self.assertEqual(beam_count, cursor.fetchone()[0])
+            db.close()
+
+        with self.assertRaises(RuntimeError):
+            ResultDatabase(":memory:").add_rows([[]])
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_diff.py
+"""unittest cases for diff."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from mlca import mlc_analyzer, diff
+import pydicom
+from numpy.testing import assert_array_almost_equal
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestDiff(unittest.TestCase):
+    """Unit tests for diff."""
+
+    def setUp(self):
+        """Setup files and base data for diff testing."""
+        self.plan_ds = pydicom.read_file(example_file_path)
+        self.plan = mlc_analyzer.Plan(self.plan_ds)
+
+    def test_get_angle_deviation(self):
+        """Test get_angle_deviation"""
+        assert_array_almost_equal(
+            [2.0, 2.0, 180.0],
+            diff.get_angle_deviation([359.0, 1.0, 0.0], [1.0, 359.0, 180.0]),
+        )
+
+    def test_diff_plans_equal(self):
+        """Test diff_plans of identical plans"""
+        report = diff.diff_plans(self.plan, mlc_analyzer.Plan(self.plan_ds))
+        self.assertTrue(report["equal"])
+        self.assertEqual({}, report["header"])
+        self.assertEqual(3, len(report["fx_groups"]))
+        beam = report["fx_groups"][0]["beams"][0]
+        self.assertEqual([], beam["control_points"])
+        self.assertEqual(0.0, beam["max_deviation"]["leaf"])
+
+    def test_diff_plans_deviations(self):
+        """Test diff_plans with modified header, MU, and leaf positions"""
+        ds = pydicom.read_file(example_file_path)
+        ds.RTPlanLabel = "other"
+        cp_seq = ds.BeamSequence[0].ControlPointSequence
+        for device in cp_seq[4].BeamLimitingDevicePositionSequence:
+            if device.RTBeamLimitingDeviceType.upper() == "MLCX":
+                positions = list(device.LeafJawPositions)
+                positions[10] = float(positions[10]) + 0.5
+                device.LeafJawPositions = positions
+        other = mlc_analyzer.Plan(ds)
+
+        report = diff.diff_plans(self.plan, other)
+        self.assertFalse(report["equal"])
+        self.assertEqual(("ANON", "other"), report["header"]["plan_name"])
+        beam = report["fx_groups"][0]["beams"][0]
+        self.assertFalse(beam["equal"])
+        self.assertEqual([4], beam["control_points"])
+        self.assertAlmostEqual(0.5, beam["max_deviation"]["leaf"])
+
+        # within tolerance
+        report = diff.diff_plans(self.plan, other, {"position": 1.0})
+        self.assertTrue(report["fx_groups"][0]["equal"])
+
+        rows = diff.get_diff_summary(report)
+        self.assertEqual(26, len(rows))
+        self.assertEqual(1, rows[0]["fx_group"])
+        self.assertEqual("", rows[0]["control_points"])
+
+    def test_diff_plans_datasets(self):
+        """Test diff_plans of file paths and Datasets, without geometry"""
+        report = diff.diff_plans(example_file_path, self.plan_ds)
+        self.assertTrue(report["equal"])
+        self.assertEqual(3, len(report["fx_groups"]))
+
+        ds = pydicom.read_file(example_file_path)
+        cp_seq = ds.BeamSequence[0].ControlPointSequence
+        for device in cp_seq[4].BeamLimitingDevicePositionSequence:
+            if device.RTBeamLimitingDeviceType.upper() == "MLCX":
+                positions = list(device.LeafJawPositions)
+                positions[10] = float(positions[10]) + 0.5
+                device.LeafJawPositions = positions
+        expected = diff.diff_plans(self.plan, mlc_analyzer.Plan(ds))
+        report = diff.diff_plans(example_file_path, ds)
+        self.assertFalse(report["equal"])
+        self.assertEqual(
+            diff.get_diff_summary(expected), diff.get_diff_summary(report)
+        )
+
+        # arrays match those of Beam
+        arrays = diff.PlanArrays(self.plan_ds)
+        beam = self.plan.fx_group[0].beam[0]
+        beam_arrays = arrays.fx_group[0].beam[0]
+        self.assertFalse(hasattr(beam_arrays, "control_point"))
+        self.assertEqual(beam.name, beam_arrays.name)
+        self.assertEqual(beam.meter_set, beam_arrays.meter_set)
+        assert_array_almost_equal(
+            beam.leaf_positions, beam_arrays.leaf_positions
+        )
+        assert_array_almost_equal(
+            beam.jaw_positions, beam_arrays.jaw_positions
+        )
+        assert_array_almost_equal(beam.cum_mu_frac, beam_arrays.cum_mu_frac)
+        assert_array_almost_equal(
+            beam.cp_gantry_angle, beam_arrays.cp_gantry_angle
+        )
+
+        # beam datasets, meter sets are not compared
+        report = diff.diff_beams(
+            self.plan_ds.BeamSequence[0], ds.BeamSequence[0]
+        )
+        self.assertEqual([4], report["control_points"])
+        self.assertNotIn("meter_set", report["max_deviation"])
+
+    def test_diff_beams_cp_count(self):
+        """Test diff_beams with different control point counts"""
+        beams = self.plan.fx_group[0].beam
+        report = diff.diff_beams(beams[0], beams[1])
+        self.assertFalse(report["equal"])
+        self.assertEqual((18, 10), report["header"]["cp_count"])
+
+    def test_control_point_eq(self):
+        """Test ControlPoint.__eq__ detects leaf deviations"""
+        beam = self.plan_ds.BeamSequence[0]
+        leaf_boundaries = beam.BeamLimitingDeviceSequence[2]
+        leaf_boundaries = leaf_boundaries.LeafPositionBoundaries
+        cp = beam.ControlPointSequence[2]
+        mlca_cp = mlc_analyzer.ControlPoint(cp, leaf_boundaries)
+
+        for device in cp.BeamLimitingDevicePositionSequence:
+            if device.RTBeamLimitingDeviceType.upper() == "MLCX":
+                positions = list(device.LeafJawPositions)
+                positions[0] = float(positions[0]) - 1.0
+                device.LeafJawPositions = positions
+        other_cp = mlc_analyzer.ControlPoint(cp, leaf_boundaries)
+        self.assertTrue(mlca_cp == mlca_cp)
+        self.assertFalse(mlca_cp == other_cp)
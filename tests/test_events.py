@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_events.py
+"""unittest cases for events."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+import io
+from os.path import join
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+from mlca import events, mlc_analyzer, utilities
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestEvents(unittest.TestCase):
+    """Unit tests for events."""
+
+    def setUp(self):
+        """Collect events of a new module level emitter"""
+        self.events = []
+        self.previous = events.set_emitter(events.EventEmitter())
+        events.get_emitter().subscribe(
+            lambda name, data: self.events.append((name, data))
+        )
+
+    def tearDown(self):
+        """Restore the module level emitter"""
+        events.set_emitter(self.previous)
+
+    def get_names(self):
+        """Get the names of collected events"""
+        return [name for name, _ in self.events]
+
+    def test_event_emitter(self):
+        """Test EventEmitter"""
+        emitter = events.EventEmitter()
+        received = []
+        callback = emitter.subscribe(lambda n, d: received.append((n, d)))
+        emitter.emit("progress", done=1, total=2)
+        emitter.unsubscribe(callback)
+        emitter.emit("progress", done=2, total=2)
+        self.assertEqual([("progress", {"done": 1, "total": 2})], received)
+
+    def test_console_reporter(self):
+        """Test ConsoleReporter rate limits plan_started lines"""
+        stream = io.StringIO()
+        reporter = events.ConsoleReporter(interval=3600, stream=stream)
+        for i in range(5):
+            reporter(
+                "plan_started", {"file_path": i, "index": i + 1, "total": 5}
+            )
+        reporter(
+            "plan_failed",
+            {"file_path": "bad", "index": 5, "total": 5, "error": "oops"},
+        )
+        lines = stream.getvalue().splitlines()
+        self.assertEqual("Analyzing (1 of 5): 0", lines[0])
+        self.assertEqual("Analyzing (5 of 5): 4", lines[1])
+        self.assertEqual(["Analysis failed: bad", "oops"], lines[2:4])
+        self.assertEqual(5, reporter.counts["plan_started"])
+
+    def test_plan_set_events(self):
+        """Test PlanSet events, with no console output"""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with TemporaryDirectory() as temp_dir:
+            duplicate = join(temp_dir, example_file_name)
+            copyfile(example_file_path, duplicate)
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                mlc_analyzer.PlanSet(
+                    [example_file_path, duplicate, "missing.dcm"],
+                    skip_duplicates=True,
+                    verbose=True,
+                )
+        self.assertEqual("", stdout.getvalue() + stderr.getvalue())
+        self.assertEqual(
+            [
+                "plan_started",
+                "plan_finished",
+                "plan_started",
+                "plan_skipped",
+                "plan_started",
+                "plan_failed",
+            ],
+            self.get_names(),
+        )
+        finished = self.events[1][1]
+        self.assertIsInstance(finished["plan"], mlc_analyzer.Plan)
+        self.assertGreater(finished["wall_time"], 0)
+        self.assertEqual(example_file_path, self.events[3][1]["original"])
+
+    def test_plan_set_events_multiprocessing(self):
+        """Test PlanSet events are emitted by the parent process as each
+        plan completes"""
+        mlc_analyzer.PlanSet(
+            [example_file_path, example_file_path, "missing.dcm"],
+            processes=2,
+        )
+        names = self.get_names()
+        self.assertEqual(4, names.count("progress"))
+        self.assertEqual(2, names.count("plan_finished"))
+        self.assertEqual(1, names.count("plan_failed"))
+        self.assertEqual(
+            ["progress"] + ["plan", "progress"] * 3,
+            [n if n == "progress" else "plan" for n in names],
+        )
+        self.assertEqual({"done": 3, "total": 3}, self.events[-1][1])
+        self.assertEqual([1, 2, 3], [d["index"] for _, d in self.events[1::2]])
+
+    def test_file_sniffed(self):
+        """Test is_file_dicom emits events only if verbose"""
+        utilities.is_file_dicom(example_file_path, "RTPLAN")
+        self.assertEqual([], self.events)
+        utilities.is_file_dicom(example_file_path, "RTPLAN", verbose=True)
+        utilities.is_file_dicom(
+            join(basedata_dir, "plan_summary.json"), verbose=True
+        )
+        self.assertEqual(
+            [True, False], [data["is_dicom"] for _, data in self.events]
+        )
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
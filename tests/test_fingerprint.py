@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_fingerprint.py
+"""unittest cases for fingerprint."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+from mlca import mlc_analyzer, fingerprint
+import pydicom
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+def set_leaf(ds, value):
+    """Set the first MLC leaf position of the first control point"""
+    cp = ds.BeamSequence[0].ControlPointSequence[0]
+    for device in cp.BeamLimitingDevicePositionSequence:
+        if device.RTBeamLimitingDeviceType.upper() == "MLCX":
+            positions = list(device.LeafJawPositions)
+            positions[0] = value
+            device.LeafJawPositions = positions
+
+
+class TestFingerprint(unittest.TestCase):
+    """Unit tests for fingerprint."""
+
+    def setUp(self):
+        """Setup files and base data for fingerprint testing."""
+        self.plan_ds = pydicom.read_file(example_file_path)
+
+    def test_get_fingerprint(self):
+        """Test get_fingerprint"""
+        fp = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertEqual(fp, fingerprint.get_fingerprint(example_file_path))
+        self.assertEqual(self.plan_ds.SOPInstanceUID, fp["sop_instance_uid"])
+        self.assertEqual(16, len(fp["exact"]))
+
+        # renamed plans have the same fingerprints
+        self.plan_ds.RTPlanLabel = "renamed"
+        self.plan_ds.SOPInstanceUID = "1.2.3"
+        renamed = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertEqual(fp["exact"], renamed["exact"])
+        self.assertEqual("1.2.3", renamed["sop_instance_uid"])
+
+        # small changes only affect the exact fingerprint
+        set_leaf(self.plan_ds, -10.0)
+        a = fingerprint.get_fingerprint(self.plan_ds)
+        set_leaf(self.plan_ds, -10.2)
+        b = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertNotEqual(a["exact"], b["exact"])
+        self.assertEqual(a["coarse"], b["coarse"])
+        c = fingerprint.get_fingerprint(self.plan_ds, {"exact": 1.0})
+        self.assertEqual(a["coarse"], c["exact"])
+
+        set_leaf(self.plan_ds, -15.0)
+        d = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertNotEqual(a["coarse"], d["coarse"])
+
+    def test_plan_index(self):
+        """Test PlanIndex"""
+        fp = fingerprint.get_fingerprint(self.plan_ds)
+        set_leaf(self.plan_ds, -10.0)
+        near = fingerprint.get_fingerprint(self.plan_ds)
+        set_leaf(self.plan_ds, -10.2)
+        nearer = fingerprint.get_fingerprint(self.plan_ds)
+
+        index = fingerprint.PlanIndex()
+        self.assertIsNone(index.add("a", fp))
+        self.assertEqual("a", index.add("b", fp))
+        self.assertEqual("a", index.add("b", fp))
+        self.assertIsNone(index.add("c", near))
+        self.assertIsNone(index.add("d", nearer))
+        self.assertEqual(4, len(index))
+        self.assertTrue("d" in index)
+        self.assertEqual({"b": "a"}, index.duplicates)
+        self.assertEqual([["c", "d"]], index.near_duplicate_clusters)
+
+        table = index.summary_table
+        self.assertEqual(fingerprint.INDEX_COLUMNS, table[0])
+        self.assertEqual(["b", "a", ""], [table[2][i] for i in [0, 3, 4]])
+        self.assertEqual(["d", "", "1"], [table[4][i] for i in [0, 3, 4]])
+
+    def test_plan_index_patients(self):
+        """Test identical plans of different patients are not duplicates"""
+        fp = fingerprint.get_fingerprint(self.plan_ds)
+        self.plan_ds.PatientID = "other"
+        other = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertEqual(fp["exact"], other["exact"])
+        self.assertEqual("other", other["patient_id"])
+
+        index = fingerprint.PlanIndex()
+        self.assertIsNone(index.add("a", fp))
+        # same SOP Instance UID, e.g., re-exported with a new PatientID
+        self.assertEqual("a", index.add("b", other))
+        # same PatientID
+        self.plan_ds.SOPInstanceUID = "1.2.3"
+        other = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertEqual("b", index.add("c", other))
+        # another patient
+        self.plan_ds.PatientID = "another"
+        self.plan_ds.SOPInstanceUID = "4.5.6"
+        another = fingerprint.get_fingerprint(self.plan_ds)
+        self.assertIsNone(index.add("d", another))
+        # the PatientID of d and the SOP Instance UID of a, a is first
+        self.plan_ds.SOPInstanceUID = fp["sop_instance_uid"]
+        self.assertEqual(
+            "a", index.add("e", fingerprint.get_fingerprint(self.plan_ds))
+        )
+        self.assertEqual("a", index.add("b", other))
+        self.assertEqual({"b": "a", "c": "b", "e": "a"}, index.duplicates)
+        self.assertEqual(
+            [["a", "b", "c", "d", "e"]], index.near_duplicate_clusters
+        )
+
+    def test_plan_set_patients(self):
+        """Test PlanSet keeps identical plans of different patients"""
+        with TemporaryDirectory() as temp_dir:
+            files = [join(temp_dir, "%s.dcm" % i) for i in range(2)]
+            copyfile(example_file_path, files[0])
+            self.plan_ds.PatientID = "other"
+            self.plan_ds.SOPInstanceUID = "1.2.3"
+            self.plan_ds.save_as(files[1])
+
+            for processes in [1, 2]:
+                plan_set = mlc_analyzer.PlanSet(
+                    files, processes=processes, skip_duplicates=True
+                )
+                self.assertEqual(7, len(plan_set.summary_table))
+                self.assertEqual({}, plan_set.index.duplicates)
+                self.assertEqual(
+                    [files], plan_set.index.near_duplicate_clusters
+                )
+
+    def test_plan_set_skip_duplicates(self):
+        """Test PlanSet with skip_duplicates"""
+        with TemporaryDirectory() as temp_dir:
+            files = [join(temp_dir, "%s.dcm" % i) for i in range(3)]
+            for file_path in files:
+                copyfile(example_file_path, file_path)
+
+            plan_set = mlc_analyzer.PlanSet(files)
+            self.assertEqual(10, len(plan_set.summary_table))
+            self.assertEqual(0, len(plan_set.index))
+
+            plan_set = mlc_analyzer.PlanSet(files, index_fingerprints=True)
+            self.assertEqual(10, len(plan_set.summary_table))
+            self.assertEqual(2, len(plan_set.index.duplicates))
+
+            for processes in [1, 2]:
+                plan_set = mlc_analyzer.PlanSet(
+                    files, processes=processes, skip_duplicates=True
+                )
+                self.assertEqual(4, len(plan_set.summary_table))
+                self.assertEqual(files[0], plan_set.summary_table[1][-1])
+                self.assertEqual(
+                    {files[1]: files[0], files[2]: files[0]},
+                    plan_set.index.duplicates,
+                )
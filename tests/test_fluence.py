@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_fluence.py
+"""unittest cases for fluence."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from mlca import mlc_analyzer, fluence
+import pydicom
+import numpy as np
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestFluence(unittest.TestCase):
+    """Unit tests for fluence."""
+
+    def setUp(self):
+        """Setup files and base data for fluence testing."""
+        self.plan_ds = pydicom.read_file(example_file_path)
+
+    def test_get_pixel_edges(self):
+        """Test get_pixel_edges"""
+        assert_array_equal([-2, -1, 0, 1, 2], fluence.get_pixel_edges(4, 1))
+        assert_array_equal([-1.5, 0, 1.5], fluence.get_pixel_edges(2, 1.5))
+
+    def test_get_interval_coverage(self):
+        """Test get_interval_coverage"""
+        edges = fluence.get_pixel_edges(4, 1)
+        coverage = fluence.get_interval_coverage(
+            [-1.5, 0.0, 1.0], [0.5, 0.0, -1.0], edges
+        )
+        expected = [[0.5, 1, 0.5, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        assert_array_equal(expected, coverage)
+
+    def test_get_fluence(self):
+        """Test get_fluence for jaws and each MLC orientation"""
+        edges = fluence.get_pixel_edges(40, 1)
+        jaws = np.array([[-10, 10, -5, 5], [-10, 10, -5, 5]])
+        mu = [2.0, 0.0]
+        jaw_fluence = fluence.get_fluence(
+            None, None, jaws, None, mu, edges, edges
+        )
+        self.assertEqual(2.0 * 200, np.sum(jaw_fluence))
+        self.assertEqual(2.0, np.max(jaw_fluence))
+
+        boundaries = [-10, 0, 10]
+        positions = np.array([[[-5, 0], [5, 2.5]], [[0, 0], [0, 0]]])
+        mlcx = fluence.get_fluence(
+            boundaries, positions, jaws, "mlcx", mu, edges, edges
+        )
+        self.assertEqual(2.0 * (10 * 5 + 2.5 * 5), np.sum(mlcx))
+
+        jaws_y = jaws[:, [2, 3, 0, 1]]
+        mlcy = fluence.get_fluence(
+            boundaries, positions, jaws_y, "mlcy", mu, edges, edges
+        )
+        assert_array_equal(mlcx, mlcy.T)
+
+    def test_beam_fluence(self):
+        """Test Beam.get_fluence and FxGroup.get_fluence"""
+        beam_seq = self.plan_ds.BeamSequence
+        fx_grp = mlc_analyzer.FxGroup(
+            self.plan_ds.FractionGroupSequence[0], beam_seq
+        )
+        beam = fx_grp.beam[0]
+        beam_fluence = beam.get_fluence(2.0)
+        self.assertEqual((200, 200), beam_fluence.shape)
+
+        # integral fluence is the MU weighted aperture area
+        exp_sum = np.sum(np.multiply(beam.area, beam.cp_mu))
+        self.assertAlmostEqual(exp_sum, np.sum(beam_fluence) * 4)
+
+        fx_fluence = fx_grp.get_fluence(2.0)
+        assert_array_almost_equal(
+            np.sum([b.get_fluence(2.0) for b in fx_grp.beam], axis=0),
+            fx_fluence,
+        )
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_geometry.py
+"""unittest cases for geometry."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from mlca import mlc_analyzer, geometry
+import pydicom
+import numpy as np
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestGeometry(unittest.TestCase):
+    """Unit tests for geometry."""
+
+    def setUp(self):
+        """Setup files and base data for geometry testing."""
+        self.plan_ds = pydicom.read_file(example_file_path)
+
+    def test_get_aperture_metrics(self):
+        """Test batched aperture metrics against Shapely apertures"""
+        for beam_ds in self.plan_ds.BeamSequence:
+            beam = mlc_analyzer.Beam(beam_ds, 100)
+            apertures = geometry.get_aperture_metrics(
+                beam.leaf_boundaries,
+                beam.leaf_positions,
+                beam.jaw_positions,
+                beam.leaf_type,
+            )
+            assert_array_almost_equal(beam.area, apertures["area"])
+            assert_array_almost_equal(
+                beam.perimeter_x, apertures["perimeter_x"]
+            )
+            assert_array_almost_equal(
+                beam.perimeter_y, apertures["perimeter_y"]
+            )
+
+        # jaws only
+        jaws = [[-10, 10, -20, 20], [0, 0, -20, 20]]
+        apertures = geometry.get_aperture_metrics(None, None, jaws, None)
+        assert_array_equal([800, 0], apertures["area"])
+        assert_array_equal([40, 0], apertures["perimeter_x"])
+        assert_array_equal([80, 0], apertures["perimeter_y"])
+
+    def test_get_aperture_metrics_mlcy(self):
+        """Test batched aperture metrics for an MLC moving along y"""
+        boundaries = [-10, 0, 10, 20]
+        positions = np.array([[[-5, -5, 0], [5, -5, 10]]])
+        jaws = np.array([[-100, 100, -100, 100]])
+        apertures = geometry.get_aperture_metrics(
+            boundaries, positions, jaws, "mlcy"
+        )
+        # leaf pair 2 is closed, so two rectangles: 10 x 10 and 10 x 10
+        assert_array_equal([200], apertures["area"])
+        assert_array_equal([40], apertures["perimeter_x"])
+        assert_array_equal([40], apertures["perimeter_y"])
+
+    def test_interpolate_control_points(self):
+        """Test interpolate_control_points"""
+        values = np.array([[0.0, 10.0], [10.0, 30.0]])
+        assert_array_equal(
+            values, geometry.interpolate_control_points(values, 1)
+        )
+        expected = [[0, 10], [5, 20], [10, 30], [10, 30]]
+        assert_array_equal(
+            expected, geometry.interpolate_control_points(values, 2)
+        )
+
+    def test_forward_fill(self):
+        """Test forward_fill"""
+        nan = np.nan
+        values = [[nan, 1.0], [2.0, nan], [nan, nan], [3.0, 4.0], [nan, nan]]
+        expected = [[2, 1], [2, 1], [2, 1], [3, 4], [3, 4]]
+        assert_array_equal(expected, geometry.forward_fill(values))
+        self.assertTrue(np.isnan(values[0][0]))
+        self.assertTrue(np.all(np.isnan(geometry.forward_fill([nan, nan]))))
+
+    def test_get_jaw_positions(self):
+        """Test get_jaw_positions without ASYMY jaws"""
+        cp_seq = self.plan_ds.BeamSequence[0].ControlPointSequence
+        positions = geometry.get_device_positions(cp_seq)
+        self.assertEqual(len(cp_seq), len(positions["asymx"]))
+        positions.pop("asymy", None)
+        jaws = geometry.get_jaw_positions(positions, len(cp_seq), 300, 200)
+        assert_array_almost_equal(positions["asymx"], jaws[:, :2])
+        assert_array_equal([-100.0, 100.0], jaws[0, 2:])
+
+    def test_get_cp_values(self):
+        """Test get_cp_values carries values forward"""
+        cp_seq = self.plan_ds.BeamSequence[0].ControlPointSequence
+        angles = geometry.get_cp_values(cp_seq, "GantryAngle")
+        self.assertEqual(len(cp_seq), len(angles))
+        self.assertEqual(1, len(np.unique(angles)))
+        assert_array_equal(
+            np.zeros(len(cp_seq)), geometry.get_cp_values(cp_seq, "Unknown")
+        )
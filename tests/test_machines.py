@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_machines.py
+"""unittest cases for machines."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from mlca import machines, mlc_analyzer
+from mlca.counters import get_counters
+import pydicom
+import numpy as np
+from numpy.testing import assert_array_equal
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestMachines(unittest.TestCase):
+    """Unit tests for machines."""
+
+    def setUp(self):
+        """Clear the module level registry"""
+        machines.clear_machine_models()
+        get_counters().reset()
+
+    def test_machine_model(self):
+        """Test MachineModel leaf geometry"""
+        model = machines.MachineModel([-10, -5, 5, 10], "LA1", "mlcx")
+        self.assertEqual(3, model.leaf_pair_count)
+        assert_array_equal([5, 10, 5], model.widths)
+        assert_array_equal([-7.5, 0, 7.5], model.centers)
+        assert_array_equal([-10, -5, -5, 5, 5, 10], model.polygon_boundary)
+        self.assertEqual([-10, -5, 5, -10, -5, 5], model.border_top)
+        self.assertEqual([-5, 5, 10, -5, 5, 10], model.border_bottom)
+
+        exp = [[1, -10], [1, -5], [2, -5], [2, 5], [3, 5], [3, 10]]
+        assert_array_equal(exp, model.get_bank_vertices([1, 2, 3]))
+        model.leaf_type = "mlcy"
+        exp = [[x, y] for y, x in exp]
+        assert_array_equal(exp, model.get_bank_vertices([1, 2, 3]))
+
+    def test_get_machine_model(self):
+        """Test machine models are shared by configuration"""
+        self.assertIsNone(machines.get_machine_model(None))
+        a = machines.get_machine_model([-5, 0, 5], "LA1", "mlcx")
+        self.assertIs(
+            a, machines.get_machine_model((-5.0, 0.0, 5.0), "LA1", "mlcx")
+        )
+        self.assertIsNot(
+            a, machines.get_machine_model([-5, 0, 5], "LA2", "mlcx")
+        )
+        self.assertIsNot(
+            a, machines.get_machine_model([-5, 1, 5], "LA1", "mlcx")
+        )
+        self.assertEqual(3, len(machines.get_machine_models()))
+        self.assertEqual(3, get_counters().get("machine_models_built"))
+
+    def test_plan_machine_models(self):
+        """Test every beam of a plan shares one machine model"""
+        plan = mlc_analyzer.Plan(pydicom.read_file(example_file_path))
+        beams = [beam for fx_group in plan.fx_group for beam in fx_group.beam]
+        model = beams[0].machine_model
+        self.assertEqual(1, len(machines.get_machine_models()))
+        for beam in beams:
+            self.assertIs(model, beam.machine_model)
+            for cp in beam.control_point:
+                self.assertIs(model, cp.machine_model)
+        self.assertEqual(beams[0].machine_name, model.machine_name)
+        self.assertEqual("mlcx", model.leaf_type)
+        boundaries = beams[0].beam_dataset.BeamLimitingDeviceSequence[-1]
+        assert_array_equal(
+            np.array(boundaries.LeafPositionBoundaries, dtype=float),
+            beams[0].leaf_boundaries,
+        )
+
+        # a control point without a beam builds from its own boundaries
+        cp = mlc_analyzer.ControlPoint(
+            beams[0].cp_seq[0], boundaries.LeafPositionBoundaries
+        )
+        self.assertIsNot(model, cp.machine_model)
+        self.assertEqual(beams[0].control_point[0].area, cp.area)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_memory.py
+"""unittest cases for memory."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+import tracemalloc
+from mlca import memory, mlc_analyzer
+from mlca.memory import MEMORY_COLUMNS
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestMemory(unittest.TestCase):
+    """Unit tests for memory."""
+
+    def tearDown(self):
+        """Restore the default memory tracker"""
+        memory.set_memory_tracker(memory.MemoryTracker(enabled=False))
+
+    def test_memory_tracker(self):
+        """Test MemoryTracker"""
+        tracker = memory.MemoryTracker()
+        with tracker.plan("small") as record:
+            record["cp_count"] = 10
+            small = bytearray(10**5)
+        with tracker.plan("large") as record:
+            record["cp_count"] = 5
+            large = bytearray(10**6)
+        del small, large
+        self.assertFalse(tracemalloc.is_tracing())
+
+        self.assertEqual(2, len(tracker.plans))
+        self.assertEqual(
+            ["large", "small"], [p["file_path"] for p in tracker.sorted_plans]
+        )
+        self.assertGreaterEqual(tracker.plans[1]["traced_peak"], 1.0)
+        self.assertGreaterEqual(tracker.plans[1]["traced_growth"], 1.0)
+
+        other = memory.MemoryTracker()
+        other.merge(tracker.to_dict())
+        other.merge(tracker.to_dict())
+        self.assertEqual(4, len(other.plans))
+
+        table = tracker.summary_table
+        self.assertEqual(MEMORY_COLUMNS, table[0])
+        self.assertEqual(["large", "small"], [row[0] for row in table[1:]])
+        self.assertIn("large", str(tracker))
+
+        tracker.reset()
+        self.assertEqual(0, len(tracker.plans))
+
+    def test_disabled(self):
+        """Test a disabled MemoryTracker records nothing"""
+        tracker = memory.MemoryTracker(enabled=False)
+        with tracker.plan(example_file_path):
+            pass
+        self.assertEqual(0, len(tracker.plans))
+
+    def test_plan_set_memory(self):
+        """Test PlanSet records memory and control point counts"""
+        tracker = memory.MemoryTracker()
+        memory.set_memory_tracker(tracker)
+        mlc_analyzer.PlanSet([example_file_path])
+        plan = mlc_analyzer.Plan(example_file_path)
+        self.assertEqual(1, len(tracker.plans))
+        self.assertEqual(plan.cp_count, tracker.plans[0]["cp_count"])
+        self.assertGreater(tracker.plans[0]["traced_peak"], 0)
+
+    def test_plan_set_memory_multiprocessing(self):
+        """Test memory records are merged from PlanSet workers"""
+        tracker = memory.MemoryTracker()
+        memory.set_memory_tracker(tracker)
+        mlc_analyzer.PlanSet([example_file_path] * 2, processes=2)
+        self.assertEqual(2, len(tracker.plans))
+        self.assertGreater(tracker.plans[0]["cp_count"], 0)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
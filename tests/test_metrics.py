@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_metrics.py
+"""unittest cases for metrics."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from mlca import mlc_analyzer, metrics
+import pydicom
+import numpy as np
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestMetrics(unittest.TestCase):
+    """Unit tests for metrics."""
+
+    def setUp(self):
+        """Setup files and base data for metrics testing."""
+        self.plan_ds = pydicom.read_file(example_file_path)
+        self.beam = mlc_analyzer.Beam(self.plan_ds.BeamSequence[0], 90.2)
+
+    def test_register_metric(self):
+        """Test register_metric and get_metric"""
+
+        @metrics.register_metric("test_cp_count", "CP Count", fmt="%d")
+        def cp_count(beam):
+            return beam.cp_count
+
+        try:
+            self.assertEqual(18, self.beam.get_metric("test_cp_count"))
+            self.assertEqual(
+                "CP Count", metrics.get_metric("test_cp_count")["column"]
+            )
+        finally:
+            metrics.METRICS.pop("test_cp_count")
+
+        with self.assertRaises(KeyError):
+            metrics.get_metric("test_cp_count")
+
+    def test_aggregate_metric(self):
+        """Test aggregate_metric"""
+        values, mu = [1.0, 3.0], [100.0, 300.0]
+        self.assertEqual(4.0, metrics.aggregate_metric(values, mu, "sum"))
+        self.assertEqual(3.0, metrics.aggregate_metric(values, mu, "max"))
+        self.assertEqual(
+            2.5, metrics.aggregate_metric(values, mu, "mu_weighted")
+        )
+        self.assertEqual(0.0, metrics.aggregate_metric([], [], "sum"))
+        with self.assertRaises(ValueError):
+            metrics.aggregate_metric(values, mu, "median")
+
+    def test_beam_metrics(self):
+        """Test each registered metric on a beam"""
+        self.assertAlmostEqual(
+            np.sum(self.beam.younge_complexity_scores),
+            self.beam.get_metric("younge"),
+        )
+        self.assertAlmostEqual(
+            self.beam.younge_complexity_terms[1], self.beam.get_metric("edge")
+        )
+
+        mcs = self.beam.get_metric("mcs")
+        self.assertTrue(0 < mcs <= 1)
+
+        sas = [self.beam.get_metric("sas_%s" % t) for t in [5, 10, 20]]
+        self.assertTrue(all(0 <= value <= 1 for value in sas))
+        self.assertEqual(sorted(sas), sas)
+
+        positions = self.beam.leaf_positions
+        self.assertEqual((18, 2, 40), positions.shape)
+        self.assertAlmostEqual(
+            np.sum(np.abs(np.diff(positions, axis=0))),
+            self.beam.get_metric("leaf_travel"),
+        )
+
+        self.assertEqual(0.0, self.beam.get_metric("max_leaf_speed"))
+        self.assertEqual(0, self.beam.get_metric("leaf_speed_violations"))
+
+        mu = np.array(self.beam.cp_mu)
+        exp_area = np.sum(np.array(self.beam.area) * mu) / np.sum(mu)
+        self.assertAlmostEqual(exp_area, self.beam.get_metric("mean_area"))
+
+    def test_plan_metrics(self):
+        """Test metrics aggregated for each fraction group"""
+        plan = mlc_analyzer.Plan(self.plan_ds)
+        assert_scores = np.testing.assert_array_almost_equal
+        assert_scores(plan.younge_complexity_scores, plan.get_metric("younge"))
+
+        fx_grp = plan.fx_group[0]
+        mcs = [beam.get_metric("mcs") for beam in fx_grp.beam]
+        exp_mcs = np.sum(np.multiply(mcs, fx_grp.beam_mu)) / fx_grp.fx_mu
+        self.assertAlmostEqual(exp_mcs, fx_grp.get_metric("mcs"))
+
+        plan_set = mlc_analyzer.PlanSet(
+            [example_file_path], metrics=["mcs", "leaf_travel"]
+        )
+        header = plan_set.summary_table[0]
+        self.assertEqual("Leaf Travel (mm)", header[-1])
+        self.assertEqual("Modulation Complexity Score", header[-2])
+        self.assertEqual("%0.3f" % exp_mcs, plan_set.summary_table[1][-2])
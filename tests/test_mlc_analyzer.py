@@ -11,10 +11,14 @@
 
 
 import unittest
+from copy import deepcopy
 from os.path import join
 from mlca import mlc_analyzer, utilities
+from mlca.counters import get_counters
+from mlca.similarity import get_plan_features
 import pydicom
 import json
+import numpy as np
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 
 test_dir = "tests"
@@ -52,7 +56,11 @@ class TestMLCAnalzyer(unittest.TestCase):
             "complexity_weight_x": 0.5,
             "complexity_weight_y": 0.9,
         }
-        self.assertEqual(over_rides, mlc_analyzer.get_options(over_rides))
+        expected = {
+            key: value for key, value in mlc_analyzer.DEFAULT_OPTIONS.items()
+        }
+        expected.update(over_rides)
+        self.assertEqual(expected, mlc_analyzer.get_options(over_rides))
 
         self.assertEqual(
             mlc_analyzer.DEFAULT_OPTIONS, mlc_analyzer.get_options({})
@@ -106,8 +114,11 @@ class TestMLCAnalzyer(unittest.TestCase):
         # check beam summary to test data
         for key, value in beam.summary.items():
             assert_array_almost_equal(
-                self.expected_beam_summary["0"][key], value
+                np.array(self.expected_beam_summary["0"][key], dtype=float),
+                np.array(value, dtype=float),
             )
+        # undefined leaf speeds are None, not NaN
+        json.dumps(beam.summary["leaf_speed"], allow_nan=False)
 
         # check mlc borders compared to test data
         for key, value in beam.mlc_borders[0].items():
@@ -131,6 +142,186 @@ class TestMLCAnalzyer(unittest.TestCase):
         ]
         assert_array_equal(exp_no_zero, beam_no_zero.summary["cp_mu"])
 
+    def test_leaf_speed(self):
+        """Test leaf travel and speed analytics"""
+        beam_ds = self.plan_ds.BeamSequence[0]
+        beam = mlc_analyzer.Beam(beam_ds, 90.199996948242)
+        travel = beam.leaf_travel
+        self.assertEqual((18, 80), travel.shape)
+        assert_array_equal(np.max(travel, axis=1), beam.max_leaf_travel)
+
+        # Step-N-Shoot, leaves only move while beam is off
+        self.assertTrue(beam.is_deliverable)
+        self.assertTrue(np.all(np.isnan(beam.max_leaf_speed[2::2])))
+
+        # Convert to an arc, 2 degrees per control point
+        for i, cp in enumerate(beam_ds.ControlPointSequence):
+            cp.GantryAngle = (179.0 + 2 * i) % 360
+        arc = mlc_analyzer.Beam(beam_ds, 90.199996948242)
+        assert_array_almost_equal(
+            [179.0, 181.0, 183.0], arc.cp_gantry_angle[:3]
+        )
+
+        time = arc.segment_time
+        mu_time = np.array(arc.cp_mu[:-1]) / 10.0  # 600 MU/min
+        assert_array_almost_equal(np.maximum(mu_time, 2 / 6.0), time[1:])
+        assert_array_almost_equal(
+            arc.max_leaf_travel[1:] / time[1:], arc.max_leaf_speed[1:]
+        )
+        exp_violations = np.sum(arc.max_leaf_speed[1:] > 25.0)
+        self.assertTrue(exp_violations > 0)
+        self.assertEqual(exp_violations, arc.leaf_speed_violations)
+        self.assertFalse(arc.is_deliverable)
+
+        fast_mlc = mlc_analyzer.Beam(
+            beam_ds, 90.199996948242, max_leaf_speed=1000
+        )
+        self.assertTrue(fast_mlc.is_deliverable)
+
+    def test_interpolation_steps(self):
+        """Test complexity with interpolated sub-control point apertures"""
+        beam_ds = self.plan_ds.BeamSequence[0]
+
+        # Step-N-Shoot MU is delivered between identical apertures
+        beam = mlc_analyzer.Beam(beam_ds, 90.2)
+        beam_4 = mlc_analyzer.Beam(beam_ds, 90.2, interpolation_steps=4)
+        self.assertEqual(4, beam_4.interpolation_steps)
+        assert_array_almost_equal(
+            beam.younge_complexity_scores, beam_4.younge_complexity_scores
+        )
+
+        # Spread MU over every control point, as in an arc
+        cp_seq = beam_ds.ControlPointSequence
+        for i, cp in enumerate(cp_seq):
+            cp.CumulativeMetersetWeight = i / (len(cp_seq) - 1)
+        beam = mlc_analyzer.Beam(beam_ds, 90.2)
+        beam_4 = mlc_analyzer.Beam(beam_ds, 90.2, interpolation_steps=4)
+        apertures = beam_4.get_interpolated_apertures(4)
+        self.assertEqual(4 * beam.cp_count, len(apertures["area"]))
+        assert_array_almost_equal(beam.area, apertures["area"][::4])
+        self.assertAlmostEqual(np.sum(beam.cp_mu), np.sum(apertures["mu"]))
+
+        scores, scores_4 = (
+            beam.younge_complexity_scores,
+            beam_4.younge_complexity_scores,
+        )
+        self.assertEqual(len(scores), len(scores_4))
+        self.assertNotAlmostEqual(np.sum(scores), np.sum(scores_4))
+        self.assertAlmostEqual(
+            np.sum(scores_4), np.sum(beam_4.younge_complexity_terms)
+        )
+
+    def test_interpolation_closed_leaves(self):
+        """Test interpolated complexity with leaves closing in transit"""
+        beam_ds = self.plan_ds.BeamSequence[0]
+        cp_seq = beam_ds.ControlPointSequence
+        # an arc with MU on every control point, all leaves closed at one
+        for i, cp in enumerate(cp_seq):
+            cp.CumulativeMetersetWeight = i / (len(cp_seq) - 1)
+        for device in cp_seq[4].BeamLimitingDevicePositionSequence:
+            if device.RTBeamLimitingDeviceType == "MLCX":
+                device.LeafJawPositions = [0.0] * len(device.LeafJawPositions)
+        beam = mlc_analyzer.Beam(beam_ds, 90.2, interpolation_steps=4)
+        apertures = beam.get_interpolated_apertures(4)
+        self.assertEqual(0, apertures["area"][16])
+        self.assertTrue(apertures["mu"][16] > 0)
+
+        scores = beam.younge_complexity_scores
+        self.assertTrue(np.all(np.isfinite(scores)))
+        self.assertTrue(np.all(np.isfinite(beam.younge_complexity_terms)))
+        self.assertTrue(scores[4] > 0)
+
+    def test_skip_zero_mu_geometry(self):
+        """Test apertures are only calculated for control points with MU"""
+        beam_ds = self.plan_ds.BeamSequence[0]
+        beam = mlc_analyzer.Beam(beam_ds, 90.2)
+        self.assertTrue(np.all(beam.geometry_mask))
+
+        counters = get_counters()
+        counters.reset()
+        skip = mlc_analyzer.Beam(beam_ds, 90.2, skip_zero_mu_geometry=True)
+        mask = np.array(beam.cp_mu) != 0
+        assert_array_equal(mask, skip.geometry_mask)
+        # Step-N-Shoot, every other control point and the last have no MU
+        self.assertEqual(9, np.sum(~mask))
+        self.assertEqual(9, counters.get("apertures_skipped"))
+        self.assertEqual(9, counters.get("intersections"))
+        assert_array_almost_equal(
+            beam.younge_complexity_scores, skip.younge_complexity_scores
+        )
+        assert_array_almost_equal(
+            beam.younge_complexity_terms, skip.younge_complexity_terms
+        )
+        assert_array_equal(
+            np.array(beam.area)[mask], np.array(skip.area)[mask]
+        )
+        assert_array_equal(np.zeros(9), np.array(skip.area)[~mask])
+
+        # apertures that were not calculated are not reported as closed
+        for key in ["area", "x_perim", "y_perim", "perim"]:
+            self.assertNotIn(None, beam.summary[key])
+            values = np.array(skip.summary[key], dtype=object)
+            self.assertTrue(all(v is None for v in values[~mask]))
+            assert_array_almost_equal(
+                np.array(beam.summary[key], dtype=float)[mask],
+                values[mask].astype(float),
+            )
+        features = [
+            [
+                f[2]
+                for f in get_plan_features(
+                    mlc_analyzer.Plan(self.plan_ds, **kwargs)
+                )
+            ]
+            for kwargs in [{}, {"skip_zero_mu_geometry": True}]
+        ]
+        assert_array_almost_equal(features[0], features[1])
+
+        # ignore_zero_mu_cp drops the control points without an aperture
+        no_zero = mlc_analyzer.Beam(beam_ds, 90.2, ignore_zero_mu_cp=True)
+        assert_array_equal(mask, no_zero.geometry_mask)
+        for key, values in no_zero.summary.items():
+            assert_array_almost_equal(
+                np.array(beam.summary[key], dtype=float)[mask],
+                np.array(values, dtype=float),
+            )
+
+    def test_carry_forward(self):
+        """Test device positions omitted from control points"""
+        beam_ds = self.plan_ds.BeamSequence[0]
+        beam = mlc_analyzer.Beam(beam_ds, 90.2)
+        self.assertEqual(
+            {"asymx", "asymy", "mlcx"}, set(beam.device_positions)
+        )
+
+        # Step-N-Shoot, each segment starts and ends with the same positions
+        sparse_ds = deepcopy(beam_ds)
+        for cp in sparse_ds.ControlPointSequence[1::2]:
+            del cp.BeamLimitingDevicePositionSequence
+        sparse = mlc_analyzer.Beam(sparse_ds, 90.2)
+        assert_array_equal(beam.leaf_positions, sparse.leaf_positions)
+        assert_array_equal(beam.jaw_positions, sparse.jaw_positions)
+        self.assertEqual(beam.jaws, sparse.jaws)
+        assert_array_almost_equal(beam.area, sparse.area)
+        assert_array_almost_equal(
+            beam.younge_complexity_scores, sparse.younge_complexity_scores
+        )
+
+        # jaws specified in the first control point only
+        static_ds = deepcopy(beam_ds)
+        for cp in static_ds.ControlPointSequence[1:]:
+            cp.BeamLimitingDevicePositionSequence = [
+                device
+                for device in cp.BeamLimitingDevicePositionSequence
+                if device.RTBeamLimitingDeviceType == "MLCX"
+            ]
+        static = mlc_analyzer.Beam(static_ds, 90.2)
+        assert_array_equal(
+            np.tile(beam.jaw_positions[0], (beam.cp_count, 1)),
+            static.jaw_positions,
+        )
+        assert_array_equal(beam.leaf_positions, static.leaf_positions)
+
     def test_fx_group(self):
         """Test of the FxGroup class"""
         beam_seq = self.plan_ds.BeamSequence
@@ -178,6 +369,28 @@ class TestMLCAnalzyer(unittest.TestCase):
             for key, value in fx_summary.items():
                 self.assertEqual(value, plan.summary[i][key])
 
+    def test_younge_complexity_weight_grid(self):
+        """Test complexity scores for many weights from one analysis"""
+        plan = mlc_analyzer.Plan(self.plan_ds)
+        weights = [(1.0, 1.0), (0.5, 2.0), (0.0, 1.0)]
+        scores = plan.get_younge_complexity_scores(weights)
+        self.assertEqual((3, 3), scores.shape)
+        assert_array_almost_equal(plan.younge_complexity_scores, scores[:, 0])
+
+        for c, (c1, c2) in enumerate(weights):
+            plan_c = mlc_analyzer.Plan(
+                self.plan_ds, complexity_weight_x=c1, complexity_weight_y=c2
+            )
+            assert_array_almost_equal(
+                plan_c.younge_complexity_scores, scores[:, c]
+            )
+
+        beam = plan.fx_group[0].beam[0]
+        x_term, y_term = beam.younge_complexity_terms
+        self.assertAlmostEqual(
+            np.sum(beam.younge_complexity_scores), x_term + y_term
+        )
+
     def test_plan_set(self):
         """Test PlanSet"""
         files = utilities.get_file_paths(test_dir)
@@ -185,9 +398,22 @@ class TestMLCAnalzyer(unittest.TestCase):
         plan_set = mlc_analyzer.PlanSet(dcm_files, verbose=True)
         self.assertTrue(len(plan_set.summary_table) == 4)
 
-        # Test _worker
-        data = plan_set._worker(dcm_files[0])
-        self.assertTrue(len(data) == 3)
+        # Test _index_worker, used with multiprocessing
+        result = plan_set._index_worker(dcm_files[0])
+        self.assertIsNone(result["error"])
+        self.assertEqual(3, len(result["rows"]))
+        result = plan_set._index_worker(join(test_dir, "missing.dcm"))
+        self.assertIsNotNone(result["error"])
+        self.assertEqual([], result["rows"])
+
+        # Test weight grid columns
+        weight_grid = [(1, 1), (0.5, 2)]
+        plan_set = mlc_analyzer.PlanSet(dcm_files, weight_grid=weight_grid)
+        header = plan_set.summary_table[0]
+        self.assertEqual("Complexity Score (x=0.5, y=2)", header[-1])
+        for row in plan_set.summary_table[1:]:
+            self.assertEqual(len(header), len(row))
+            self.assertEqual(row[header.index("Complexity Score(s)")], row[-2])
 
     def test_plan_set_multiprocessing(self):
         """Test PlanSet with multiprocessing"""
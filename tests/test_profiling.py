@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_profiling.py
+"""unittest cases for profiling."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+import json
+from os.path import join, getsize
+from os import unlink
+from mlca import mlc_analyzer, profiling
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestProfiling(unittest.TestCase):
+    """Unit tests for profiling."""
+
+    def tearDown(self):
+        """Restore the default profiler"""
+        profiling.set_profiler(profiling.Profiler(enabled=False))
+
+    def test_profiler(self):
+        """Test Profiler"""
+        profiler = profiling.Profiler()
+        with profiler.plan(example_file_path):
+            with profiler.stage("parse"):
+                pass
+            with profiler.stage("geometry"):
+                sum(range(1000))
+        with profiler.stage("geometry"):
+            pass
+        with profiler.stage("output"):
+            pass
+
+        self.assertEqual(2, profiler.stages["geometry"]["count"])
+        self.assertEqual(1, len(profiler.plans))
+        plan = profiler.plans[0]
+        self.assertEqual(getsize(example_file_path), plan["bytes_read"])
+        self.assertEqual({"parse", "geometry"}, set(plan["stages"]))
+
+        other = profiling.Profiler()
+        other.merge(profiler.to_dict())
+        other.merge(profiler.to_dict())
+        self.assertEqual(4, other.stages["geometry"]["count"])
+        self.assertEqual(2, len(other.plans))
+
+        report = other.report
+        self.assertEqual(
+            ["parse", "geometry", "output"], list(report["stages"])
+        )
+        self.assertEqual(2 * plan["bytes_read"], report["bytes_read"])
+        self.assertTrue("Slowest plan(s)" in str(other))
+
+        file_path = "test_profile.json"
+        other.save(file_path)
+        with open(file_path, "r") as f:
+            data = json.load(f)
+        unlink(file_path)
+        self.assertEqual(2, data["plan_count"])
+        self.assertEqual(2, len(data["plans"]))
+
+        other.reset()
+        self.assertEqual({}, other.stages)
+
+    def test_profiler_disabled(self):
+        """Test Profiler with enabled=False"""
+        profiler = profiling.Profiler(enabled=False)
+        with profiler.plan(example_file_path):
+            with profiler.stage("parse"):
+                pass
+        self.assertEqual({}, profiler.stages)
+        self.assertEqual([], profiler.plans)
+        self.assertFalse(profiling.get_profiler().enabled)
+
+    def test_plan_set_profile(self):
+        """Test PlanSet stage and per-plan timings"""
+        for processes in [1, 2]:
+            profiler = profiling.Profiler()
+            profiling.set_profiler(profiler)
+            mlc_analyzer.PlanSet(
+                [example_file_path, example_file_path],
+                processes=processes,
+                index_fingerprints=True,
+            )
+            self.assertEqual(2, len(profiler.plans))
+            for stage in ["parse", "fingerprint", "geometry", "scoring"]:
+                self.assertTrue(stage in profiler.stages)
+            self.assertEqual(2, profiler.stages["parse"]["count"])
+            self.assertEqual(
+                set(profiler.stages), set(profiler.plans[0]["stages"])
+            )
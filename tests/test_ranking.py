@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_ranking.py
+"""unittest cases for ranking."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+import random
+from os.path import join
+from mlca import mlc_analyzer
+from mlca.ranking import TopK, BEAM_DETAIL_COLUMNS, get_beam_detail_table
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+COLUMNS = ["File Name", "Fx Group #", "Plan MUs"]
+
+
+class TestRanking(unittest.TestCase):
+    """Unit tests for ranking."""
+
+    def test_top_k(self):
+        """Test TopK keeps the largest values regardless of order"""
+        rows = [
+            ["plan_%s" % (i % 7), i % 3, float(i % 50)] for i in range(200)
+        ]
+        exp = sorted(rows, key=lambda r: (r[2], r[0], r[1]), reverse=True)
+        for seed in range(3):
+            random.Random(seed).shuffle(rows)
+            top_k = TopK(5, by="mu")
+            top_k.add_rows(COLUMNS, rows)
+            self.assertEqual(exp[:5], top_k.rows)
+            self.assertEqual(200, top_k.count)
+
+        first, second = TopK(5, by="mu"), TopK(5, by="mu")
+        first.add_rows(COLUMNS, rows[:100])
+        second.add_rows(COLUMNS, rows[100:])
+        first.merge(second.to_dict())
+        self.assertEqual(exp[:5], first.rows)
+        self.assertEqual(200, first.count)
+
+        empty = TopK(0, by="mu")
+        empty.add_rows(COLUMNS, rows)
+        self.assertEqual([], empty.rows)
+
+        with self.assertRaises(ValueError):
+            first.merge(TopK(5).to_dict())
+        with self.assertRaises(KeyError):
+            TopK(5, by="unknown")
+
+    def test_plan_set_top_k(self):
+        """Test PlanSet keeps only the top rows"""
+        plan_set = mlc_analyzer.PlanSet([example_file_path])
+        column = plan_set.columns.index("Control Point(s)")
+        exp = sorted(plan_set.results.rows, key=lambda r: r[column])[::-1]
+        for processes in [1, 2]:
+            top_k = TopK(2, by="cp-count")
+            plan_set = mlc_analyzer.PlanSet(
+                [example_file_path],
+                processes=processes,
+                top_k=top_k,
+                keep_results=False,
+            )
+            self.assertEqual(0, len(plan_set.results))
+            self.assertEqual(exp[:2], top_k.rows)
+
+        table = get_beam_detail_table(top_k.rows, plan_set.columns)
+        plan = mlc_analyzer.Plan(example_file_path)
+        fx_column = plan_set.columns.index("Fx Group #")
+        cp_count = sum(
+            beam.cp_count
+            for row in top_k.rows
+            for beam in plan.fx_group[row[fx_column] - 1].beam
+        )
+        self.assertEqual(cp_count + 1, len(table))
+        self.assertEqual(BEAM_DETAIL_COLUMNS, table[0][:5])
+        self.assertIn("cmp_score", table[0])
+        speed = table[0].index("leaf_speed")
+        speeds = [row[speed] for row in table[1:]]
+        self.assertIn("", speeds)
+        self.assertNotIn("nan", speeds)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
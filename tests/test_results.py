@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_results.py
+"""unittest cases for results."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+import numpy as np
+from numpy.testing import assert_array_equal
+from mlca import mlc_analyzer, results
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestResults(unittest.TestCase):
+    """Unit tests for results."""
+
+    def test_result_table(self):
+        """Test ResultTable"""
+        table = results.ResultTable(
+            ["name", "tps", "count", "score"],
+            dtypes={"tps": "category", "count": "int", "score": "float"},
+            formats={"score": "%0.2f"},
+        )
+        table.append(["a", "TPS 1", 3, 1.23456])
+        table.extend([["b", "TPS 2", None, 2.0], ["c", "TPS 1", 5, None]])
+        self.assertEqual(3, len(table))
+
+        rows = table.to_rows()
+        self.assertEqual(["name", "tps", "count", "score"], rows[0])
+        self.assertEqual(["a", "TPS 1", "3", "1.23"], rows[1])
+        self.assertEqual(results.MISSING, rows[2][2])
+        self.assertEqual(results.MISSING, rows[3][3])
+
+        columns = table.to_columns()
+        assert_array_equal(["a", "b", "c"], columns["name"])
+        self.assertEqual(np.int64, columns["count"].dtype)
+        assert_array_equal([3, -1, 5], columns["count"])
+        self.assertEqual(np.float64, columns["score"].dtype)
+        self.assertEqual(1.23456, columns["score"][0])
+        self.assertTrue(np.isnan(columns["score"][2]))
+        self.assertEqual(["TPS 1", "TPS 2"], columns["tps"].categories)
+        assert_array_equal([0, 1, 0], columns["tps"].codes)
+
+    def test_empty_table(self):
+        """Test ResultTable without rows"""
+        table = results.ResultTable(["count"], dtypes={"count": "int"})
+        self.assertEqual([["count"]], table.to_rows())
+        self.assertEqual(0, len(table.to_columns()["count"]))
+
+    def test_plan_set_results(self):
+        """Test typed PlanSet results match the formatted summary table"""
+        plan_set = mlc_analyzer.PlanSet(
+            [example_file_path], weight_grid=[(0.5, 2)], metrics=["mcs"]
+        )
+        columns = plan_set.get_results()
+        table = plan_set.summary_table
+        self.assertEqual(plan_set.columns, table[0])
+        self.assertEqual(set(plan_set.columns), set(columns))
+
+        mu = columns["Plan MUs"]
+        self.assertEqual(np.float64, mu.dtype)
+        self.assertEqual(
+            ["%0.1f" % value for value in mu],
+            [row[table[0].index("Plan MUs")] for row in table[1:]],
+        )
+        self.assertEqual(np.int64, columns["Control Point(s)"].dtype)
+        assert_array_equal([1, 2, 3], columns["Fx Group #"])
+        tps = columns["TPS"]
+        self.assertEqual(["ADAC Pinnacle3"], tps.categories)
+        for column in [
+            "Complexity Score (x=0.5, y=2)",
+            "Modulation Complexity Score",
+        ]:
+            self.assertEqual(np.float64, columns[column].dtype)
+
+        plan = mlc_analyzer.Plan(example_file_path)
+        self.assertEqual(plan.results[0]["Plan MUs"], mu[0])
+        self.assertEqual("%0.1f" % mu[0], plan.summary[0]["Plan MUs"])
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_scp.py
+"""unittest cases for scp."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from importlib.util import find_spec
+from os.path import join
+from shutil import rmtree
+import socket
+from tempfile import mkdtemp
+import pydicom
+from mlca import mlc_analyzer
+from mlca.scp import StorageSCP
+from mlca.utilities import read_csv
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+has_pynetdicom = find_spec("pynetdicom") is not None
+
+
+def get_free_port():
+    """Get an unused local port"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestSCP(unittest.TestCase):
+    """Unit tests for scp."""
+
+    def setUp(self):
+        """Create a temporary directory for results"""
+        self.temp_dir = mkdtemp()
+        self.output_file = join(self.temp_dir, "results.csv")
+        plan_set = mlc_analyzer.PlanSet([example_file_path])
+        self.summary = plan_set.summary_table
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        rmtree(self.temp_dir)
+
+    def test_submit(self):
+        """Test StorageSCP analyzes datasets in memory"""
+        scp = StorageSCP(self.output_file, processes=2)
+        scp.start_pool()
+        dataset = pydicom.dcmread(example_file_path)
+        scp.submit(dataset, "SCU:1")
+        scp.submit(pydicom.Dataset(), "SCU:2")
+        scp.shutdown()
+        self.assertEqual((2, 1, 1), (scp.received, scp.analyzed, scp.failed))
+        results = read_csv(self.output_file)
+        self.assertEqual(self.summary[0], results[0])
+        for row, exp in zip(results[1:], self.summary[1:]):
+            self.assertEqual(exp[:-1], row[:-1])
+            self.assertEqual("SCU:1", row[-1])
+
+    @unittest.skipIf(has_pynetdicom, "pynetdicom is installed")
+    def test_missing_pynetdicom(self):
+        """Test StorageSCP.start requires pynetdicom"""
+        with self.assertRaises(ImportError):
+            StorageSCP(self.output_file).start()
+
+    @unittest.skipUnless(has_pynetdicom, "pynetdicom is not installed")
+    def test_c_store(self):
+        """Test StorageSCP with a local SCU"""
+        from pynetdicom import AE
+        from pynetdicom.sop_class import RTPlanStorage
+
+        port = get_free_port()
+        scp = StorageSCP(self.output_file, host="127.0.0.1", port=port)
+        scp.start()
+        try:
+            ae = AE(ae_title="SCU")
+            ae.add_requested_context(RTPlanStorage)
+            assoc = ae.associate("127.0.0.1", port, ae_title="MLCA")
+            self.assertTrue(assoc.is_established)
+            dataset = pydicom.dcmread(example_file_path)
+            status = assoc.send_c_store(dataset)
+            assoc.release()
+            self.assertEqual(0x0000, status.Status)
+            self.assertTrue(scp.wait(timeout=60))
+        finally:
+            scp.shutdown()
+        results = read_csv(self.output_file)
+        self.assertEqual(len(self.summary), len(results))
+        self.assertEqual("SCU:%s" % dataset.SOPInstanceUID, results[1][-1])
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
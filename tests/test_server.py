@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_server.py
+"""unittest cases for server."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import exists, join
+from shutil import rmtree
+import socket
+from tempfile import mkdtemp
+import threading
+from mlca import mlc_analyzer, server
+from mlca.server import AnalysisServer, send_request
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestServer(unittest.TestCase):
+    """Unit tests for server."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Analyze the example plan once"""
+        plan = mlc_analyzer.Plan(example_file_path)
+        cls.rows = [
+            [row[c] for c in mlc_analyzer.COLUMNS] for row in plan.results
+        ]
+
+    def start(self, **kwargs):
+        """Start an AnalysisServer in a thread"""
+        analysis_server = AnalysisServer(port=0, processes=2, **kwargs)
+        analysis_server.start()
+        thread = threading.Thread(target=analysis_server.serve_forever)
+        thread.start()
+        if analysis_server.socket_path is None:
+            host, port = analysis_server.address
+            address = {"host": host, "port": port}
+        else:
+            address = {"socket_path": analysis_server.socket_path}
+        return analysis_server, thread, address
+
+    def test_analyze(self):
+        """Test analyze with file paths and DICOM bytes"""
+        response = server.analyze(
+            {"file_path": example_file_path, "metrics": ["mcs"]}
+        )
+        self.assertEqual(mlc_analyzer.COLUMNS, response["columns"][:-1])
+        self.assertEqual(self.rows, [row[:-1] for row in response["rows"]])
+        self.assertNotIn("beams", response)
+
+        with open(example_file_path, "rb") as f:
+            data = f.read()
+        response = server.analyze(
+            {"data": data, "file_name": "bytes.dcm", "beams": True}
+        )
+        self.assertFalse(response["cached"])
+        self.assertEqual("bytes.dcm", response["rows"][0][-1])
+        self.assertEqual(self.rows[0][:-1], response["rows"][0][:-1])
+        beams = response["beams"]
+        beam_count = mlc_analyzer.COLUMNS.index("Beam Count(s)")
+        self.assertEqual(sum(row[beam_count] for row in self.rows), len(beams))
+        self.assertEqual(
+            beams[0]["cp_count"], len(beams[0]["control_points"]["cp"])
+        )
+
+        response = server.analyze({"data": data, "beams": True})
+        self.assertTrue(response["cached"])
+        self.assertEqual("Unknown", response["rows"][0][-1])
+
+        with self.assertRaises(ValueError):
+            server.analyze({})
+
+    def test_server(self):
+        """Test AnalysisServer endpoints, concurrency, and shutdown"""
+        analysis_server, thread, address = self.start()
+
+        status, data = send_request("GET", "/health", **address)
+        self.assertEqual(200, status)
+        self.assertEqual("ok", data["status"])
+
+        responses = []
+
+        def post():
+            responses.append(
+                send_request(
+                    "POST",
+                    "/analyze",
+                    {"file_path": example_file_path},
+                    **address
+                )
+            )
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([200] * 4, [status for status, _ in responses])
+        for _, data in responses:
+            self.assertEqual(self.rows, data["rows"])
+
+        with open(example_file_path, "rb") as f:
+            status, data = send_request(
+                "POST",
+                "/analyze?file_name=a.dcm&beams=1",
+                f.read(),
+                content_type="application/dicom",
+                **address
+            )
+        self.assertEqual(200, status)
+        self.assertEqual("a.dcm", data["rows"][0][-1])
+        self.assertIn("beams", data)
+
+        status, data = send_request(
+            "POST", "/analyze", {"file_path": "missing.dcm"}, **address
+        )
+        self.assertEqual(422, status)
+        self.assertIn("error", data)
+        status, _ = send_request("POST", "/analyze", b"[", **address)
+        self.assertEqual(400, status)
+        status, _ = send_request("GET", "/unknown", **address)
+        self.assertEqual(404, status)
+
+        status, data = send_request("GET", "/health", **address)
+        self.assertEqual(6, data["requests"])
+
+        status, _ = send_request("POST", "/shutdown", **address)
+        self.assertEqual(200, status)
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive())
+
+    def test_unix_socket_unsupported(self):
+        """Test AnalysisServer rejects Unix sockets without AF_UNIX"""
+        supported = server.UNIX_SOCKETS_SUPPORTED
+        server.UNIX_SOCKETS_SUPPORTED = False
+        try:
+            analysis_server = AnalysisServer(socket_path="mlca.sock")
+            with self.assertRaises(OSError):
+                analysis_server.start()
+            self.assertIsNone(analysis_server.pool)
+            with self.assertRaises(OSError):
+                send_request("GET", "/health", socket_path="mlca.sock")
+        finally:
+            server.UNIX_SOCKETS_SUPPORTED = supported
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets")
+    def test_unix_socket(self):
+        """Test AnalysisServer over a Unix socket"""
+        temp_dir = mkdtemp()
+        try:
+            socket_path = join(temp_dir, "mlca.sock")
+            analysis_server, thread, address = self.start(
+                socket_path=socket_path
+            )
+            status, data = send_request(
+                "POST", "/analyze", {"file_path": example_file_path}, **address
+            )
+            self.assertEqual(200, status)
+            self.assertEqual(self.rows, data["rows"])
+            analysis_server.shutdown()
+            thread.join(timeout=30)
+            self.assertFalse(thread.is_alive())
+            self.assertFalse(exists(socket_path))
+        finally:
+            rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_similarity.py
+"""unittest cases for similarity."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from os.path import join
+from os import unlink
+from mlca import mlc_analyzer, similarity
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestSimilarity(unittest.TestCase):
+    """Unit tests for similarity."""
+
+    def setUp(self):
+        """Setup files and base data for similarity testing."""
+        self.plan = mlc_analyzer.Plan(example_file_path)
+
+    def test_get_weighted_percentiles(self):
+        """Test get_weighted_percentiles"""
+        values = [3.0, 1.0, 2.0]
+        assert_array_almost_equal(
+            [1.0, 2.0, 3.0],
+            similarity.get_weighted_percentiles(
+                values, [1, 1, 1], [0, 50, 100]
+            ),
+        )
+        self.assertAlmostEqual(
+            3.0,
+            similarity.get_weighted_percentiles(values, [8, 1, 1], [90])[0],
+        )
+
+    def test_get_plan_features(self):
+        """Test get_plan_features"""
+        features = similarity.get_plan_features(self.plan)
+        self.assertEqual(3, len(features))
+        key, label, vector = features[0]
+        self.assertEqual("%s/1" % self.plan.sop_instance_uid, key)
+        self.assertEqual(example_file_path, label)
+        self.assertEqual(len(similarity.FEATURES), len(vector))
+
+        named = dict(zip(similarity.FEATURES, vector))
+        fx_grp = self.plan.fx_group[0]
+        self.assertEqual(fx_grp.beam_count, named["beam_count"])
+        self.assertAlmostEqual(fx_grp.fx_mu, named["fx_mu"])
+        self.assertAlmostEqual(
+            fx_grp.younge_complexity_score, named["complexity_score"]
+        )
+        self.assertTrue(named["area_p10"] <= named["area_p50"])
+        self.assertTrue(named["area_p50"] <= named["area_p90"])
+
+    def test_feature_index(self):
+        """Test FeatureIndex"""
+        index = similarity.FeatureIndex()
+        count = len(similarity.FEATURES)
+        vectors = np.random.default_rng(0).normal(size=(40, count))
+        for i, vector in enumerate(vectors):
+            index.add(str(i), vector, "label %s" % i)
+        self.assertEqual(40, len(index))
+        self.assertTrue("39" in index)
+
+        results = index.query(vectors[7] + 0.001, k=5)
+        self.assertEqual(5, len(results))
+        self.assertEqual("7", results[0]["key"])
+        self.assertEqual("label 7", results[0]["label"])
+        distances = [r["distance"] for r in results]
+        self.assertEqual(sorted(distances), distances)
+
+        # replace an existing key
+        index.add("7", vectors[3], "replaced")
+        self.assertEqual(40, len(index))
+        results = index.query(vectors[3], k=2)
+        self.assertEqual({"3", "7"}, {r["key"] for r in results})
+
+        file_path = "test_feature_index.npz"
+        index.save(file_path)
+        loaded = similarity.FeatureIndex(file_path)
+        unlink(file_path)
+        self.assertEqual(index.keys, loaded.keys)
+        self.assertEqual(index.labels, loaded.labels)
+        assert_array_almost_equal(index.features, loaded.features)
+        loaded.add("new", vectors[0])
+        self.assertEqual(41, len(loaded))
+
+        self.assertEqual([], similarity.FeatureIndex().query(vectors[0]))
+
+    def test_plan_set_features(self):
+        """Test PlanSet with features"""
+        for processes in [1, 2]:
+            plan_set = mlc_analyzer.PlanSet(
+                [example_file_path], processes=processes, features=True
+            )
+            self.assertEqual(3, len(plan_set.features))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_synthetic.py
+"""unittest cases for synthetic."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+import json
+from tempfile import TemporaryDirectory
+from mlca import mlc_analyzer, synthetic, benchmark, utilities
+from numpy.testing import assert_array_equal
+
+
+class TestSynthetic(unittest.TestCase):
+    """Unit tests for synthetic and benchmark."""
+
+    def test_get_leaf_boundaries(self):
+        """Test get_leaf_boundaries"""
+        self.assertEqual([-10, 0, 10], synthetic.get_leaf_boundaries(2))
+        boundaries = synthetic.get_leaf_boundaries(60)
+        self.assertEqual(61, len(boundaries))
+        self.assertEqual(150, boundaries[-1])
+
+    def test_create_rt_plan(self):
+        """Test create_rt_plan"""
+        for leaf_type in ["mlcx", "mlcy", None]:
+            for jaws in synthetic.JAW_BEHAVIORS:
+                ds = synthetic.create_rt_plan(
+                    beam_count=2,
+                    cp_count=5,
+                    leaf_count=20,
+                    leaf_type=leaf_type,
+                    jaws=jaws,
+                    arc=True,
+                    fx_group_count=2,
+                    seed=1,
+                )
+                plan = mlc_analyzer.Plan(ds)
+                self.assertEqual(2, len(plan.fx_group))
+                beam = plan.fx_group[1].beam[1]
+                self.assertEqual("Beam 4", beam.name)
+                self.assertEqual(5, beam.cp_count)
+                self.assertEqual(leaf_type, beam.leaf_type)
+                self.assertEqual(100, plan.fx_group[0].beam_mu[0])
+                if leaf_type is not None:
+                    self.assertEqual((5, 2, 20), beam.leaf_positions.shape)
+                cp_seq = ds.BeamSequence[0].ControlPointSequence
+                devices = [
+                    len(cp.BeamLimitingDevicePositionSequence) for cp in cp_seq
+                ]
+                mlc = int(leaf_type is not None)
+                if jaws == "dynamic":
+                    self.assertEqual([2 + mlc] * 5, devices)
+                elif jaws == "static" or not mlc:
+                    self.assertEqual([2 + mlc] + [mlc] * 4, devices)
+                else:
+                    self.assertEqual([1] * 5, devices)
+
+        # reproducible with a seed
+        a = mlc_analyzer.Plan(synthetic.create_rt_plan(seed=3))
+        b = mlc_analyzer.Plan(synthetic.create_rt_plan(seed=3))
+        assert_array_equal(
+            a.fx_group[0].beam[0].leaf_positions,
+            b.fx_group[0].beam[0].leaf_positions,
+        )
+
+        with self.assertRaises(ValueError):
+            synthetic.create_rt_plan(jaws="other")
+
+    def test_write_corpus(self):
+        """Test write_corpus"""
+        with TemporaryDirectory() as temp_dir:
+            file_paths = synthetic.write_corpus(
+                temp_dir, 2, non_dicom_count=3, cp_count=3
+            )
+            files = utilities.get_file_paths(temp_dir)
+            self.assertEqual(5, len(files))
+            plan_files = utilities.get_dicom_files(files, modality="RTPLAN")
+            self.assertEqual(sorted(file_paths), sorted(plan_files))
+            plan = mlc_analyzer.Plan(file_paths[0])
+            self.assertEqual(3, sum(plan.fx_group[0].cp_counts))
+
+    def test_run_benchmark(self):
+        """Test run_benchmark"""
+        report = benchmark.run_benchmark(
+            plan_count=1, beam_count=1, cp_count=3, leaf_count=10
+        )
+        json.dumps(report)
+        results = report["results"]
+        self.assertEqual(benchmark.SUITES, [r["suite"] for r in results])
+        items = {r["suite"]: r["items"] for r in results}
+        self.assertEqual(benchmark.STARTUP_RUNS, items["startup"])
+        self.assertEqual(2, items["discovery"])
+        self.assertEqual(3, items["geometry"])
+        self.assertEqual(1, items["end_to_end"])
+        for result in results:
+            self.assertTrue(result["wall_time"] >= 0)
+
+    def test_build_control_points(self):
+        """Test the geometry suite with jaw-only beams"""
+        datasets = [
+            synthetic.create_rt_plan(
+                beam_count=2, cp_count=3, leaf_type=leaf_type, seed=1
+            )
+            for leaf_type in [None, "mlcx", None]
+        ]
+        self.assertEqual(18, benchmark._build_control_points(datasets))
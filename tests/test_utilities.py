@@ -13,7 +13,10 @@
 import unittest
 from os.path import join, basename
 from os import unlink
+import subprocess
+import sys
 from mlca import utilities
+from mlca._lazy import LazyModule
 from mlca.options import DEFAULT_OPTIONS
 from shapely.geometry import GeometryCollection, MultiPolygon, Polygon
 
@@ -106,6 +109,32 @@ class TestUtilities(unittest.TestCase):
                 "print_version",
                 "verbose",
                 "processes",
+                "weight_grid",
+                "metrics",
+                "max_leaf_speed",
+                "max_gantry_speed",
+                "max_dose_rate",
+                "interpolation_steps",
+                "skip_zero_mu_geometry",
+                "skip_duplicates",
+                "duplicates_file",
+                "feature_index",
+                "similar_to",
+                "neighbors",
+                "profile",
+                "profile_file",
+                "counters_file",
+                "memory_report",
+                "database",
+                "beam_summaries",
+                "aggregates",
+                "group_by",
+                "plan_name_pattern",
+                "aggregate_only",
+                "top_k",
+                "rank_by",
+                "beam_details",
+                "quiet",
             ]
         )
         self.assertEqual(keys, exp)
@@ -133,3 +162,42 @@ class TestUtilities(unittest.TestCase):
             unlink(file_path)
         except Exception:
             pass
+
+    def test_read_weight_grid(self):
+        """test read_weight_grid"""
+        file_path = "test_read_weight_grid"
+        utilities.write_csv(file_path, [["x", "y"], [1, 1], [0.5, 2]])
+        weight_grid = utilities.read_weight_grid(file_path)
+        self.assertEqual([(1.0, 1.0), (0.5, 2.0)], weight_grid)
+
+        utilities.write_csv(file_path, [[1, 1], [], ["0.5", "2,"], [2, 2]])
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            utilities.read_weight_grid(file_path)
+        utilities.write_csv(file_path, [[1, 1], [0.5]])
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            utilities.read_weight_grid(file_path)
+
+        try:
+            unlink(file_path)
+        except Exception:
+            pass
+
+    def test_lazy_imports(self):
+        """Test mlca.main does not import heavy dependencies"""
+        code = (
+            "import sys, mlca.main; "
+            "print([m for m in ('numpy', 'pydicom', 'shapely', 'tqdm') "
+            "if m in sys.modules])"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        self.assertEqual("[]", output.strip())
+
+        module = LazyModule("json")
+        self.assertIn("not loaded", repr(module))
+        self.assertEqual("[1]", module.dumps([1]))
+        self.assertNotIn("not loaded", repr(module))
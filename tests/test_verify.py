@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_verify.py
+"""unittest cases for verify."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+import io
+import json
+from os.path import join
+from tempfile import TemporaryDirectory
+from mlca import verify
+from mlca.mlc_analyzer import PlanSet
+from mlca.utilities import write_csv
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestVerify(unittest.TestCase):
+    """Unit tests for verify."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Analyze the example plan once"""
+        cls.weight_grid = [(1.0, 1.0), (0.5, 2.0)]
+        cls.metrics = ["mcs", "edge"]
+        cls.plan_set = PlanSet(
+            [example_file_path],
+            weight_grid=cls.weight_grid,
+            metrics=cls.metrics,
+        )
+        cls.table = cls.plan_set.summary_table
+
+    def get_table(self):
+        """Get a copy of the results table"""
+        return [list(row) for row in self.table]
+
+    def run_main(self, args):
+        """Call verify.main, capturing its report"""
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            return verify.main(args)
+
+    def test_get_analysis_options(self):
+        """Test get_analysis_options"""
+        options = verify.get_analysis_options(self.table[0])
+        self.assertEqual(self.weight_grid, options["weight_grid"])
+        self.assertEqual(self.metrics, options["metrics"])
+
+    def test_compare_results(self):
+        """Test compare_results"""
+        self.assertEqual(
+            [], verify.compare_results(self.get_table(), self.get_table())
+        )
+
+        table = self.get_table()
+        header = table[0]
+        score = header.index("Complexity Score(s)")
+        table[1][score] = "%0.3f" % (float(table[1][score]) + 0.01)
+        table[1][header.index("File Name")] = "moved.dcm"
+        mu = header.index("Plan MUs")
+        table[2][mu] = "%0.1f" % (float(table[2][mu]) + 0.2)
+        deviations = verify.compare_results(self.get_table(), table)
+        self.assertEqual(2, len(deviations))
+        self.assertEqual("Complexity Score(s)", deviations[0]["Column"])
+        self.assertAlmostEqual(0.01, deviations[0]["Deviation"])
+        self.assertEqual("Plan MUs", deviations[1]["Column"])
+
+        # CSV values may also differ by their rounding, 0.05 MU here
+        deviations = verify.compare_results(
+            self.get_table(), table, {"score": 0.1, "meter_set": 0.15}
+        )
+        self.assertEqual([], deviations)
+        deviations = verify.compare_results(
+            self.get_table(), table, {"score": 0.1, "meter_set": 0.05}
+        )
+        self.assertEqual(["Plan MUs"], [d["Column"] for d in deviations])
+
+        deviations = verify.compare_results(self.get_table(), table[:-1])
+        self.assertIn("Row", [d["Column"] for d in deviations])
+
+    def test_compare_duplicates(self):
+        """Test compare_results reports plans with more than one row"""
+        table = self.get_table()
+        copy = list(table[1])
+        copy[table[0].index("File Name")] = "copy.dcm"
+        deviations = verify.compare_results(table + [copy], self.get_table())
+        self.assertEqual(1, len(deviations))
+        self.assertEqual("Duplicate", deviations[0]["Column"])
+        self.assertEqual(
+            (2, 1), (deviations[0]["Baseline"], deviations[0]["Value"])
+        )
+
+        # each row of a duplicate plan is compared
+        score = table[0].index("Complexity Score(s)")
+        changed = list(copy)
+        changed[score] = "%0.3f" % (float(changed[score]) + 0.01)
+        deviations = verify.compare_results(table + [copy], table + [changed])
+        self.assertEqual(
+            ["Duplicate", "Complexity Score(s)"],
+            [d["Column"] for d in deviations],
+        )
+
+    def test_compare_typed_results(self):
+        """Test compare_results of typed values allows baseline rounding"""
+        typed = [self.plan_set.columns] + self.plan_set.results.rows
+        self.assertEqual([], verify.compare_results(self.get_table(), typed))
+
+        baseline = self.get_table()
+        score = baseline[0].index("Complexity Score(s)")
+        baseline[1][score] = "0.124"
+        typed = [list(row) for row in typed]
+        typed[1][score] = 0.1246
+        self.assertEqual([], verify.compare_results(baseline, typed))
+
+        typed[1][score] = 0.1256
+        deviations = verify.compare_results(baseline, typed)
+        self.assertEqual(1, len(deviations))
+
+    def test_compare_profiles(self):
+        """Test compare_profiles"""
+        baseline = {
+            "plan_count": 2,
+            "stages": {
+                "parse": {"count": 2, "wall_time": 1.0, "cpu_time": 1.0},
+                "geometry": {"count": 2, "wall_time": 2.0, "cpu_time": 2.0},
+                "output": {"count": 1, "wall_time": 0.001, "cpu_time": 0.0},
+            },
+        }
+        profile = {
+            "plan_count": 4,
+            "stages": {
+                "parse": {"count": 4, "wall_time": 2.2, "cpu_time": 2.2},
+                "geometry": {"count": 4, "wall_time": 6.0, "cpu_time": 6.0},
+                "output": {"count": 1, "wall_time": 1.0, "cpu_time": 1.0},
+                "scoring": {"count": 4, "wall_time": 1.0, "cpu_time": 1.0},
+            },
+        }
+        comparisons = verify.compare_profiles(baseline, profile, 0.25)
+        self.assertEqual(
+            ["parse", "geometry"], [c["stage"] for c in comparisons]
+        )
+        self.assertAlmostEqual(0.1, comparisons[0]["change"])
+        self.assertFalse(comparisons[0]["regression"])
+        self.assertAlmostEqual(0.5, comparisons[1]["change"])
+        self.assertTrue(comparisons[1]["regression"])
+
+    def test_verify(self):
+        """Test verify exit codes"""
+        with TemporaryDirectory() as temp_dir:
+            baseline = join(temp_dir, "baseline.csv")
+            write_csv(baseline, self.get_table())
+            self.assertEqual(verify.EXIT_PASSED, self.run_main([baseline]))
+
+            # analysis options of the baseline are passed as flags
+            report_file = join(temp_dir, "report.csv")
+            code = self.run_main([baseline, "-xw", "2", "-rf", report_file])
+            self.assertEqual(verify.EXIT_DEVIATIONS, code)
+            with open(report_file, "r") as f:
+                self.assertIn("Complexity Score(s)", f.read())
+
+            profile_file = join(temp_dir, "profile.json")
+            stages = ["parse", "fingerprint", "geometry", "scoring"]
+            with open(profile_file, "w") as f:
+                json.dump(
+                    {
+                        "plan_count": 100,
+                        "stages": {
+                            name: {
+                                "count": 100,
+                                "wall_time": 0.05,
+                                "cpu_time": 0.05,
+                            }
+                            for name in stages
+                        },
+                    },
+                    f,
+                )
+            self.assertEqual(
+                verify.EXIT_TIMING,
+                self.run_main([baseline, "-bp", profile_file]),
+            )
+
+            table = self.get_table()
+            table[1][table[0].index("Fractions")] = "99"
+            write_csv(baseline, table)
+            code = self.run_main(
+                [baseline, "-bp", profile_file, "-rf", report_file]
+            )
+            self.assertEqual(verify.EXIT_DEVIATIONS, code)
+            with open(report_file, "r") as f:
+                self.assertEqual(2, len(f.readlines()))
+
+            table = self.get_table()
+            write_csv(baseline, table + [table[1]])
+            self.assertEqual(verify.EXIT_DEVIATIONS, self.run_main([baseline]))
+
+            missing = join(temp_dir, "missing.csv")
+            self.assertEqual(verify.EXIT_ERROR, self.run_main([missing]))
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_watch.py
+"""unittest cases for watch."""
+#
+# Copyright (c) 2021 Dan Cutright
+# This file is part of DVHA-MLCA, released under a MIT license.
+#    See the file LICENSE included with this distribution, also
+#    available at https://github.com/cutright/DVHA-MLCA
+
+
+import unittest
+import os
+from os.path import join
+from shutil import copyfile, rmtree
+import sys
+from tempfile import mkdtemp
+import threading
+import time
+from mlca import watch
+from mlca.watch import FolderWatcher
+from mlca.utilities import read_csv
+
+test_dir = "tests"
+basedata_dir = join(test_dir, "testdata")
+example_file_name = "rtplan.dcm"
+example_file_path = join(basedata_dir, example_file_name)
+
+
+class TestWatch(unittest.TestCase):
+    """Unit tests for watch."""
+
+    def setUp(self):
+        """Create an export directory with a plan and a non-DICOM file"""
+        self.temp_dir = mkdtemp()
+        self.export_dir = join(self.temp_dir, "export")
+        os.makedirs(join(self.export_dir, "sub"))
+        copyfile(example_file_path, join(self.export_dir, "sub", "a.dcm"))
+        with open(join(self.export_dir, "notes.txt"), "w") as f:
+            f.write("not a plan")
+        self.output_file = join(self.temp_dir, "results.csv")
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        rmtree(self.temp_dir)
+
+    def get_watcher(self, **kwargs):
+        """Get a polling FolderWatcher of the export directory"""
+        kwargs.setdefault("settle", 0.0)
+        return FolderWatcher(
+            self.export_dir, self.output_file, use_inotify=False, **kwargs
+        )
+
+    def test_folder_watcher(self):
+        """Test FolderWatcher processes settled files once"""
+        watcher = self.get_watcher()
+        self.assertEqual([], watcher.run_once())
+        self.assertEqual(2, len(watcher.run_once()))
+        results = read_csv(self.output_file)
+        self.assertEqual("Patient Name", results[0][0])
+        self.assertEqual(4, len(results))
+
+        # restarts do not reprocess files in the state file
+        watcher = self.get_watcher()
+        self.assertEqual(2, len(watcher.processed))
+        self.assertEqual([], watcher.run_once())
+        self.assertEqual([], watcher.run_once())
+
+        # modified files are processed again, their rows are replaced
+        copyfile(example_file_path, join(self.export_dir, "b.dcm"))
+        watcher.run_once()
+        watcher.run_once()
+        file_path = os.path.abspath(join(self.export_dir, "sub", "a.dcm"))
+        mtime = os.stat(file_path).st_mtime - 10
+        os.utime(file_path, (mtime, mtime))
+        watcher.run_once()
+        self.assertEqual([file_path], watcher.run_once())
+        results = read_csv(self.output_file)
+        self.assertEqual(7, len(results))
+        file_names = [row[results[0].index("File Name")] for row in results]
+        self.assertEqual(3, file_names.count(file_path))
+        self.assertEqual([file_path] * 3, file_names[-3:])
+        self.assertEqual(0, watcher.remove_rows(["unknown.dcm"]))
+
+    def test_settle(self):
+        """Test files are not processed until they settle"""
+        watcher = self.get_watcher(settle=60.0)
+        self.assertEqual([], watcher.get_ready_files())
+        self.assertEqual([], watcher.get_ready_files())
+        self.assertEqual(2, len(watcher.get_ready_files(time.time() + 120)))
+
+        # a file that changed since the previous scan is not ready
+        watcher = self.get_watcher()
+        watcher.get_ready_files()
+        with open(join(self.export_dir, "notes.txt"), "a") as f:
+            f.write(", still writing")
+        ready = watcher.get_ready_files()
+        self.assertEqual(1, len(ready))
+        self.assertNotIn("notes.txt", ready[0])
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify")
+    def test_inotify(self):
+        """Test the inotify waiter wakes on writes"""
+        inotify = watch.get_inotify()
+        self.assertIsNotNone(inotify)
+        try:
+            inotify.watch(self.export_dir)
+            self.assertFalse(inotify.wait(0.0))
+            with open(join(self.export_dir, "new.txt"), "w") as f:
+                f.write("new")
+            self.assertTrue(inotify.wait(5.0))
+            self.assertFalse(inotify.wait(0.0))
+        finally:
+            inotify.close()
+
+    def test_run(self):
+        """Test FolderWatcher.run picks up new files until stopped"""
+        watcher = FolderWatcher(
+            self.export_dir, self.output_file, interval=0.05, settle=0.0
+        )
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        try:
+            copyfile(example_file_path, join(self.export_dir, "b.dcm"))
+            start = time.time()
+            while time.time() - start < 30:
+                if len(watcher.processed) == 3:
+                    break
+                time.sleep(0.05)
+        finally:
+            watcher.stop()
+            thread.join(timeout=30)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(3, len(watcher.processed))
+        self.assertEqual(7, len(read_csv(self.output_file)))
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(unittest.main())